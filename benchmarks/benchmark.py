@@ -0,0 +1,291 @@
+"""
+Benchmarks des chemins critiques de la simulation (physique, radar, intersections, chargement, population).
+
+Les résultats sont écrits en JSON et peuvent être comparés à une référence enregistrée
+(benchmarks/baseline.json par défaut, versionnée avec le code) :
+    python -m benchmarks.benchmark --output results.json
+    python -m benchmarks.benchmark --save-baseline
+    python -m benchmarks.benchmark --baseline --tolerance 0.2
+Le code de sortie vaut 1 si un résultat est moins bon que la référence au-delà de la tolérance.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+from src.car import Car
+from src.genetic import GeneticTrainer
+from src.network import get_layer_sizes, get_genome_size
+from src.policy import PopulationPolicy
+from src.population import Population
+from src.radar import Radar
+from src.raycast import cast_rays
+from src.track import Track, ROOT_DIR, DEFAULT_TRACK_PATH, read_track_file
+from src.track_format import convert_text_track, load_binary_track
+from src.utils import get_segments_intersection_point
+
+# Référence utilisée par --baseline et --save-baseline sans chemin
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+RADAR_SEGMENT_COUNTS = (20, 200, 2000, 20000)
+# Circuit de grande taille chargé en plus des sauvegardes (quelques dizaines de segments chacune)
+LARGE_TRACK_SEGMENT_COUNT = 20000
+# Voitures d'une population dont les radars sont mesurés ensemble
+RADAR_POPULATION_SIZE = 1000
+POPULATION_SIZES = (10, 100, 1000)
+# Évaluation d'une génération sur un seul processus puis sur tous les cœurs
+GENETIC_WORKER_COUNTS = sorted({1, os.cpu_count() or 1})
+GENETIC_POPULATION_SIZE = 32
+GENETIC_MAX_STEPS = 300
+
+
+def measure(function, operations=1, min_time=0.2, repeat=3):
+    """
+    Appelle function en boucle pendant au moins min_time secondes, repeat fois,
+    et retourne le meilleur débit en opérations par seconde
+    """
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = max(best, calls * operations / elapsed)
+    return best
+
+
+def random_segments(count, seed=0, width=800, height=610):
+    """
+    Segments aléatoires dont la longueur diminue avec leur nombre, pour garder une densité comparable
+    à un circuit dessiné à la main
+    """
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform((0, 0), (width, height), (count, 2))
+    angles = rng.uniform(0, 2 * np.pi, count)
+    lengths = rng.uniform(5, 3000 / np.sqrt(count), count)
+    ends = starts + np.column_stack((np.cos(angles), np.sin(angles))) * lengths[:, None]
+    return np.hstack((starts, ends))
+
+
+def bench_car_move(min_time):
+    car = Car(track=Track.from_file(DEFAULT_TRACK_PATH))
+
+    def step():
+        if car.crashed:
+            car.reset()
+        car.apply_controls(-0.2, 0.3)
+        car.update()
+
+    return {'car_move': {'value': measure(step, min_time=min_time), 'unit': 'steps/s'}}
+
+
+def bench_radar(min_time):
+    results = {}
+    radar = Radar()
+    for count in RADAR_SEGMENT_COUNTS:
+        track = Track(segments=random_segments(count))
+        track.compile()
+        results['radar_{count}_segments'.format(count=count)] = {
+            'value': measure(lambda: radar.sense((400, 300), 30, track), min_time=min_time),
+            'unit': 'scans/s',
+        }
+        rng = np.random.default_rng(0)
+        origins = rng.uniform((0, 0), (track.width, track.height), (RADAR_POPULATION_SIZE, 2))
+        angles = rng.uniform(0, 360, RADAR_POPULATION_SIZE)
+        results['radar_population_{count}_segments'.format(count=count)] = {
+            'value': measure(lambda: radar.sense(origins, angles, track), RADAR_POPULATION_SIZE, min_time),
+            'unit': 'car-scans/s',
+        }
+    return results
+
+
+def bench_intersections(min_time):
+    segments = random_segments(20)
+    rays = random_segments(5, seed=1)
+    pairs = len(rays) * len(segments)
+
+    def shapely_pairs():
+        for ray in rays:
+            for segment in segments:
+                get_segments_intersection_point(ray, segment)
+
+    return {
+        'segments_intersection_shapely': {'value': measure(shapely_pairs, pairs, min_time), 'unit': 'pairs/s'},
+        'segments_intersection_numpy': {'value': measure(lambda: cast_rays(rays, segments), pairs, min_time),
+                                        'unit': 'pairs/s'},
+    }
+
+
+def bench_track_loading(min_time):
+    text_paths = sorted(glob.glob(os.path.join(ROOT_DIR, 'saves', '*.txt')))
+    with tempfile.TemporaryDirectory() as directory:
+        # Sur les petites sauvegardes, l'ouverture du fichier domine : l'écart se voit sur un grand circuit
+        large_text_path = os.path.join(directory, 'large.txt')
+        np.savetxt(large_text_path, random_segments(LARGE_TRACK_SEGMENT_COUNT), fmt='%.6g', delimiter=', ')
+        large_binary_path = convert_text_track(large_text_path)
+        binary_paths = [convert_text_track(path, os.path.join(directory, os.path.basename(path) + '.trk'))
+                        for path in text_paths]
+
+        def load_text():
+            for path in text_paths:
+                read_track_file(path)
+
+        def load_binary():
+            for path in binary_paths:
+                load_binary_track(path)
+
+        large_name = 'track_loading_{count}_segments'.format(count=LARGE_TRACK_SEGMENT_COUNT)
+        return {
+            'track_loading_text': {'value': measure(load_text, len(text_paths), min_time), 'unit': 'tracks/s'},
+            'track_loading_binary': {'value': measure(load_binary, len(binary_paths), min_time), 'unit': 'tracks/s'},
+            large_name + '_text': {'value': measure(lambda: read_track_file(large_text_path), min_time=min_time),
+                                   'unit': 'tracks/s'},
+            large_name + '_binary': {'value': measure(lambda: load_binary_track(large_binary_path),
+                                                      min_time=min_time),
+                                     'unit': 'tracks/s'},
+        }
+
+
+def bench_population(min_time):
+    results = {}
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    radar = Radar()
+    layer_sizes = get_layer_sizes(radar.beam_count)
+    rng = np.random.default_rng(0)
+    for size in POPULATION_SIZES:
+        population = Population(size, track)
+        policy = PopulationPolicy(layer_sizes, rng.normal(0, 1, (size, get_genome_size(layer_sizes))))
+
+        def step():
+            if population.crashed.all():
+                population.reset()
+            policy.drive(population, radar)
+            population.step()
+
+        results['population_{size}'.format(size=size)] = {
+            'value': measure(step, size, min_time), 'unit': 'car-steps/s'}
+    return results
+
+
+def bench_genetic(min_time):
+    results = {}
+    for workers in GENETIC_WORKER_COUNTS:
+        with GeneticTrainer(GENETIC_POPULATION_SIZE, max_steps=GENETIC_MAX_STEPS, workers=workers,
+                            seed=0) as trainer:
+            # Première génération hors mesure : démarrage des processus et chargement du circuit
+            trainer.evaluate()
+            results['genetic_{workers}_workers'.format(workers=workers)] = {
+                'value': measure(trainer.evaluate, GENETIC_POPULATION_SIZE, min_time), 'unit': 'genomes/s'}
+    if len(GENETIC_WORKER_COUNTS) > 1:
+        workers = GENETIC_WORKER_COUNTS[-1]
+        results['genetic_speedup'] = {
+            'value': results['genetic_{workers}_workers'.format(workers=workers)]['value']
+            / results['genetic_1_workers']['value'],
+            'unit': 'x ({workers} workers)'.format(workers=workers),
+        }
+    return results
+
+
+BENCHMARKS = {
+    'car_move': bench_car_move,
+    'radar': bench_radar,
+    'intersections': bench_intersections,
+    'track_loading': bench_track_loading,
+    'population': bench_population,
+    'genetic': bench_genetic,
+}
+
+
+def run_benchmarks(names=None, min_time=0.2):
+    results = {}
+    for name, benchmark in BENCHMARKS.items():
+        if names is None or name in names:
+            results.update(benchmark(min_time))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Retourne la liste des régressions : débits inférieurs à (1 - tolerance) fois la référence.
+    Les résultats sans référence ont une référence nulle (None) : ils ne sont pas comparés
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            result['baseline'] = None
+            continue
+        ratio = result['value'] / reference['value']
+        result['baseline'] = reference['value']
+        result['ratio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def find_missing_entries(report, baseline, complete=True):
+    """
+    Retourne (résultats absents de la référence, références non mesurées) ; les références ne sont attendues
+    que si tous les benchmarks ont été lancés (complete)
+    """
+    measured = set(report['results'])
+    expected = set(baseline['results'])
+    return sorted(measured - expected), sorted(expected - measured) if complete else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques de la simulation")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks à lancer")
+    parser.add_argument('--min-time', type=float, default=0.2, help="durée minimale d'une mesure, en secondes")
+    parser.add_argument('--output', help="fichier JSON des résultats (sortie standard par défaut)")
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE_PATH,
+                        help="fichier JSON de référence à comparer (benchmarks/baseline.json sans chemin)")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="baisse de débit tolérée (0.2 = 20 %%)")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE_PATH,
+                        help="enregistre les résultats comme référence (benchmarks/baseline.json sans chemin)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.min_time)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        report['regressions'] = regressions
+        report['unreferenced'], report['unmeasured'] = find_missing_entries(report, baseline, args.only is None)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            file.write(text)
+
+    if args.baseline and report['unreferenced']:
+        print("Sans référence (non comparés) : " + ", ".join(report['unreferenced']), file=sys.stderr)
+    if args.baseline and report['unmeasured']:
+        print("Références non mesurées : " + ", ".join(report['unmeasured']), file=sys.stderr)
+    if regressions:
+        print("Régressions : " + ", ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,16 @@
 from tkinter import *
 from src.utils import *
+import logging
 from datetime import datetime
 from src.car import Car
+from src.track import Track
+from src.track_format import load_track_file
+from src.game_loop import FixedTimestepLoop, UncappedLoop
+from src.population_view import PopulationWatcher
+from src.profiler import profiler, StatsOverlay
+from src.replay import Replay
+from src.track import DEFAULT_TRACK_PATH, DEFAULT_START_POSITION
+from src.training_process import TrainingProcess, ChampionDriver, POLL_INTERVAL
 from shapely.geometry import LineString, Point
 import os
 
@@ -9,6 +18,8 @@ ROOT_DIR = os.path.abspath(os.curdir)
 saves_dir = ROOT_DIR + '/saves'
 now = datetime.now()
 
+logger = logging.getLogger(__name__)
+
 
 class App:
     """Application principale"""
@@ -23,6 +34,17 @@ class App:
         self.is_drawing_line = False
         self.line_start_x = None
         self.line_start_y = None
+        self.replay = None
+        self.population_watcher = None
+        self.population_loop = None
+        self.training = None
+        # Entraînements arrêtés dont le processus n'est pas encore terminé
+        self.stopping_trainings = []
+        self.closing = False
+        self.champion_driver = None
+        self.training_status_item = None
+        # Dernier circuit chargé depuis un fichier, sur lequel l'entraînement en arrière-plan est lancé
+        self.track_path = None
 
     def setup_window(self):
         width = 800
@@ -38,14 +60,38 @@ class App:
         self.canvas.bind("<Button-1>", self.start_line)
         self.canvas.bind("<B1-Motion>", self.drawing_line)
         self.canvas.bind("<ButtonRelease-1>", self.draw_line)
-        self.car = Car(self.canvas)
-        # Car Control
+        self.track = Track(width, height - 40)
+        self.car = Car(self.canvas, self.track)
+        # La physique avance par pas fixes, indépendamment du rythme d'affichage
+        self.loop = FixedTimestepLoop(self.window, self.update_simulation, self.render)
+        # Statistiques de performance, affichées avec F3
+        self.stats_overlay = StatsOverlay(self.canvas, profiler, self.loop)
+        self.window.bind("<F3>", self.stats_overlay.toggle)
+        # Relecture d'une trajectoire enregistrée (.traj)
+        self.window.bind("<F5>", self.choose_and_replay)
+        self.window.bind("<Escape>", self.stop_replay)
+        # Population entière conduite par des réseaux, simulée sans limite de vitesse
+        self.window.bind("<F6>", self.toggle_population_view)
+        # Entraînement dans un processus séparé, la voiture étant conduite par le dernier champion
+        self.window.bind("<F7>", self.toggle_training)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.bind_car_controls()
+        self.canvas.pack(side=BOTTOM)
+
+    def bind_car_controls(self):
         self.window.bind("<KeyPress-Up>", self.car.up)
         self.window.bind("<KeyPress-Down>", self.car.down)
         self.window.bind("<KeyPress-Left>", self.car.turn_left)
         self.window.bind("<KeyPress-Right>", self.car.turn_right)
         self.window.bind("<space>", self.car.stop)
-        self.canvas.pack(side=BOTTOM)
+
+    def bind_replay_controls(self):
+        self.window.bind("<KeyPress-Up>", self.replay.faster)
+        self.window.bind("<KeyPress-Down>", self.replay.slower)
+        self.window.bind("<KeyPress-Left>", self.replay.backward)
+        self.window.bind("<KeyPress-Right>", self.replay.forward)
+        self.window.bind("<space>", self.replay.toggle_pause)
+        self.window.bind("<Home>", self.replay.restart)
 
     def setup_window_components(self):
         self.draw_line_btn = Button(self.window)
@@ -76,14 +122,164 @@ class App:
     def reset(self):
         self.car.reset()
 
+    def update_simulation(self, step_dt):
+        # Les méthodes de la voiture sont appelées ici (et non passées directement à la boucle)
+        # pour que l'instrumentation du profiler s'applique dès qu'il est activé
+        if self.replay is not None:
+            self.replay.update(step_dt)
+        elif self.champion_driver is not None:
+            self.champion_driver.update(step_dt)
+        else:
+            self.car.update(step_dt)
+
+    def render(self, alpha):
+        if self.replay is not None:
+            self.replay.render(alpha)
+        elif self.champion_driver is not None:
+            self.champion_driver.render(alpha)
+        else:
+            self.car.render(alpha)
+
+    def choose_and_replay(self, event=None):
+        file_path = choose_file(saves_dir)
+        if file_path:
+            self.start_replay(file_path)
+
+    def start_replay(self, file_path):
+        """
+        Relit une trajectoire : la voiture est placée à chaque pas sans physique ni radar.
+        Haut/Bas : vitesse, Gauche/Droite : recul/avance rapide, Espace : pause, Début : au départ, Échap : quitter
+        """
+        self.stop_replay()
+        self.stop_population_view()
+        self.stop_training()
+        self.replay = Replay.from_file(self.car, file_path, self.canvas)
+        self.bind_replay_controls()
+        self.loop.start()
+
+    def toggle_population_view(self, event=None):
+        if self.population_watcher is None:
+            self.start_population_view()
+        else:
+            self.stop_population_view()
+
+    def start_population_view(self, genomes=None):
+        """
+        Remplace la voiture de l'App par une population conduite par les génomes donnés (aléatoires par défaut)
+        """
+        self.stop_replay()
+        self.stop_population_view()
+        self.stop_training()
+        self.loop.stop()
+        self.car.erase_old_forms()
+        self.population_watcher = PopulationWatcher(self.canvas, self.track, genomes)
+        self.population_loop = UncappedLoop(self.window, self.population_watcher.update,
+                                            self.population_watcher.render)
+        self.stats_overlay.loop = self.population_loop
+        self.population_loop.start()
+
+    def stop_population_view(self):
+        if self.population_watcher is None:
+            return
+        self.population_loop.stop()
+        self.population_watcher.destroy()
+        self.population_watcher = None
+        self.population_loop = None
+        self.stats_overlay.loop = self.loop
+        self.loop.start()
+
+    def toggle_training(self, event=None):
+        if self.training is None:
+            self.start_training()
+        else:
+            self.stop_training()
+
+    def start_training(self):
+        """
+        Lance l'entraînement génétique dans un processus séparé : la fenêtre reste réactive,
+        et la voiture est conduite par le meilleur génome de la dernière génération
+        """
+        self.stop_replay()
+        self.stop_population_view()
+        self.training = TrainingProcess(track_path=self.track_path or DEFAULT_TRACK_PATH)
+        self.training.start()
+        self.champion_driver = ChampionDriver(self.car)
+        self.car.reset()
+        self.draw_training_status("Entraînement : première génération en cours")
+        self.window.after(POLL_INTERVAL, self.poll_training)
+
+    def poll_training(self):
+        if self.training is None:
+            return
+        if self.training.poll():
+            stats = self.training.last_stats
+            self.champion_driver.set_genome(self.training.layer_sizes, self.training.champion)
+            self.draw_training_status(
+                "Génération {generation} : meilleure {best:.0f}, moyenne {mean:.0f} ({elapsed:.1f} s)".format(
+                    generation=stats['generation'], best=stats['best_fitness'], mean=stats['mean_fitness'],
+                    elapsed=stats['elapsed']))
+        if self.training.error is not None:
+            logger.error("Erreur dans le processus d'entraînement :\n%s", self.training.error)
+            self.draw_training_status("Entraînement interrompu : {error}".format(
+                error=self.training.error.strip().splitlines()[-1]))
+        elif self.training.finished or not self.training.is_running:
+            self.draw_training_status("Entraînement terminé")
+        else:
+            self.window.after(POLL_INTERVAL, self.poll_training)
+
+    def draw_training_status(self, text):
+        if self.training_status_item is None:
+            # En bas à gauche : les statistiques (F3) sont en haut à gauche, la relecture en haut à droite
+            self.training_status_item = self.canvas.create_text(8, self.track.height - 8, anchor='sw', fill='#A9ACAB',
+                                                                font=('Courier', 9), tags="training_status")
+        self.canvas.itemconfig(self.training_status_item, text=text)
+
+    def stop_training(self):
+        """
+        L'App n'attend pas la fin du processus d'entraînement : elle la vérifie régulièrement (after())
+        """
+        if self.training is None:
+            return
+        self.training.stop()
+        self.stopping_trainings.append(self.training)
+        self.window.after(POLL_INTERVAL, self.poll_stopping_trainings)
+        self.training = None
+        self.champion_driver = None
+        self.canvas.delete("training_status")
+        self.training_status_item = None
+        self.car.reset()
+
+    def poll_stopping_trainings(self):
+        self.stopping_trainings = [training for training in self.stopping_trainings if not training.poll_stop()]
+        if self.stopping_trainings:
+            self.window.after(POLL_INTERVAL, self.poll_stopping_trainings)
+        elif self.closing:
+            self.window.destroy()
+
+    def close(self):
+        # La fenêtre est cachée tout de suite, et détruite une fois l'entraînement arrêté
+        self.closing = True
+        self.stop_training()
+        self.window.withdraw()
+        if not self.stopping_trainings:
+            self.window.destroy()
+
+    def stop_replay(self, event=None):
+        if self.replay is None:
+            return
+        self.replay.close()
+        self.replay = None
+        self.window.unbind("<Home>")
+        self.bind_car_controls()
+        self.car.reset()
+
     def run(self, creative_mode=False):
         if creative_mode is False:
             circuit01_path = ROOT_DIR + "/saves/circuit01.txt"
             if os.path.exists(circuit01_path):
                 self.draw_from_file(circuit01_path)
 
-            self.car.draw()
-            self.car.move()
+            self.loop.start()
         self.window.mainloop()
 
     def active_drawing_mode(self):
@@ -133,6 +329,9 @@ class App:
             line = self.canvas.create_line(*line_coord, width=3, fill="#A9ACAB")
             self.canvas.itemconfig(line, tags="track_segment")
             self.forms.append(line)
+            self.track.add_segment(line_coord)
+            # Le circuit ne correspond plus au fichier chargé
+            self.track_path = None
 
     def draw_point(self, point):
         self.canvas.create_oval(point[0] - 3, point[1] - 3, point[0], point[1], outline='red', fill='red')
@@ -141,9 +340,8 @@ class App:
         if len(self.forms) == 0:
             print("Il n'y a rien à sauvegarder")
         else:
-            positions = ""
-            for form in self.forms:
-                positions += str(self.canvas.coords(form)).replace("[", "").replace("]", "") + "\n"
+            positions = "".join("{0}, {1}, {2}, {3}\n".format(*segment)
+                                for segment in self.track.get_segments_array().tolist())
             save_text_in_file(positions, saves_dir, "save_" + now.strftime("%Y%d%m-%H%M%S"))
 
     def choose_and_draw_from_file(self):
@@ -152,13 +350,20 @@ class App:
         self.draw_from_file(file_path)
 
     def draw_from_file(self, file_path):
-        with open(file_path, 'r') as file:
-            for line in file:
-                coords = line.replace(" ", "").rstrip().split(",")
-                line_form = self.canvas.create_line(coords[0], coords[1], coords[2], coords[3], width=3, fill="#A9ACAB")
-                self.canvas.itemconfig(line_form, tags="track_segment")
-                self.forms.append(line_form)
+        self.track_path = file_path
+        segments, start_position = load_track_file(file_path)
+        for coords in segments:
+            line_form = self.canvas.create_line(*coords, width=3, fill="#A9ACAB")
+            self.canvas.itemconfig(line_form, tags="track_segment")
+            self.forms.append(line_form)
+        self.track.extend(segments)
+        # Les circuits générés enregistrent leur propre départ : la voiture y est replacée
+        self.track.start_position = start_position
+        self.car.reset()
 
     def erase(self):
+        self.track_path = None
         self.canvas.delete("track_segment")
         self.forms = []
+        self.track.clear()
+        self.track.start_position = DEFAULT_START_POSITION
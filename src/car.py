@@ -2,16 +2,12 @@ import tkinter as tk
 from math import sin, radians, degrees
 from pygame.math import Vector2
 import math
-from src.utils import get_equation_line_by_segment, get_segments_intersection_point
-from mathutils.geometry import intersect_point_line
-
-
-class RadarDirection:
-    CENTER = 'CENTER'
-    LEFT = 'LEFT'
-    RIGHT = 'RIGHT'
-    LEFT_DIAGONAL = 'LEFT_DIAGONAL'
-    RIGHT_DIAGONAL = 'RIGHT_DIAGONAL'
+import numpy as np
+from src.track import Track
+from src.radar import Radar
+from src.radar_cache import RadarCache
+from src.collision import find_collision
+from src.raycast import cast_rays, find_intersections
 
 
 # Les fonctions move et show sont réappelés toutes les 20ms
@@ -22,15 +18,17 @@ dt = 0.2
 
 class Car:
 
-    def __init__(self, canvas):
+    def __init__(self, canvas=None, track=None, radar=None):
+        # Le canvas n'est utilisé que pour l'affichage : sans canvas, la voiture tourne en mode headless
         self.canvas = canvas
+        self.track = track if track is not None else Track()
 
         # Dimensions de la voiture
         self.length = 24
         self.width = 12
 
         # On initialise la position de la voiture en fonction de sa taille
-        self.init_car_position(self.length, self.width, 125, 300)
+        self.init_car_position(self.length, self.width, *self.track.start_position)
 
         self.center = self.get_center_coordinates()
 
@@ -54,8 +52,21 @@ class Car:
         self.brake_deceleration = 10
         self.free_deceleration = 8
 
+        # Le radar mesure la distance au circuit dans plusieurs directions devant la voiture
+        self.radar = radar if radar is not None else Radar()
+        # D'un pas à l'autre, chaque faisceau ne reteste que le voisinage du segment touché au pas précédent
+        self.radar_cache = RadarCache(self.radar)
+        self.radar_distances = [self.radar.max_range] * self.radar.beam_count
         self.radar_segments = []
 
+        # Passe à True dès que la voiture touche un segment du circuit, jusqu'au prochain reset()
+        self.crashed = False
+        self.contact_point = None
+
+        # Position au pas précédent, pour interpoler l'affichage entre deux pas de physique
+        self.previous_center = Vector2(self.center)
+        self.previous_angle = self.angle
+
         # La propriété car correspond à son polygone dans le canvas
         self.car = None
 
@@ -74,33 +85,52 @@ class Car:
 
     def move(self):
         """
-        Fonction permettant de mettre à jour la position de la voiture en fonction de sa vélocité et de son accélération
+        Fonction permettant de mettre à jour la position de la voiture en continu dans le canvas
+        """
+        self.update()
+        self.canvas.after(delay, self.move)
+
+    def update(self, step_dt=dt):
+        """
+        Met à jour la position de la voiture en fonction de sa vélocité et de son accélération,
+        sans dépendre du canvas
         """
-        self.velocity += (0, self.acceleration * dt)
+        self.previous_center = Vector2(self.center)
+        self.previous_angle = self.angle
+
+        self.velocity += (0, self.acceleration * step_dt)
         self.velocity.y = max(-self.max_velocity, min(self.velocity.y, self.max_velocity))
 
         if self.has_reach_window_limit():
             self.velocity = self.velocity * -20
 
-        self.upper_left_corner += self.velocity.rotate(self.angle) * dt
-        self.upper_right_corner += self.velocity.rotate(self.angle) * dt
-        self.bottom_left_corner += self.velocity.rotate(self.angle) * dt
-        self.bottom_right_corner += self.velocity.rotate(self.angle) * dt
-
-        self.get_radar_segment()
+        displacement = self.velocity.rotate(self.angle) * step_dt
+        self.upper_left_corner += displacement
+        self.upper_right_corner += displacement
+        self.bottom_left_corner += displacement
+        self.bottom_right_corner += displacement
 
         self.center = self.get_center_coordinates()
-        self.angle = self.compute_car_angle()
+        self.angle = self.compute_car_angle(step_dt)
+        self.update_rotated_coordinates(self.get_rotated_coordinates())
+        # Le radar mesure la nouvelle pose, comme Population : la commande du pas suivant en dépend
+        self.get_radar_segment()
+        self.check_collision()
 
-        self.canvas.after(delay, self.move)
+    def check_collision(self):
+        crashed, contact_point = find_collision(self.get_rotated_coordinates(), self.track)
+        if crashed:
+            self.crashed = True
+            self.contact_point = contact_point
+        return crashed
 
-    def compute_car_angle(self):
+    def compute_car_angle(self, step_dt=dt):
         if self.steering:
             turning_radius = self.length / sin(radians(self.steering))
             angular_velocity = self.velocity.y / turning_radius
         else:
             angular_velocity = 0
-        angle = self.bound_angle(self.angle + degrees(angular_velocity) * dt)
+        angle = self.bound_angle(self.angle + degrees(angular_velocity) * step_dt)
         self.steering = 0
         return angle
 
@@ -120,22 +150,55 @@ class Car:
         return False
 
     def is_position_out_of_bound(self, coord):
-        if coord[0] < 0 or coord[0] > self.canvas.winfo_width() or \
-                coord[1] < 0 or coord[1] > self.canvas.winfo_height():
-            return True
-        return False
+        return self.track.is_position_out_of_bound(coord)
 
     def stop_car(self):
         self.velocity.y = 0
         self.acceleration = 0
 
     def reset(self):
-        self.init_car_position(self.length, self.width, 125, 300)
+        self.init_car_position(self.length, self.width, *self.track.start_position)
         self.velocity.x = 0
         self.velocity.y = 0
         self.steering = 0
         self.angle = 0
         self.acceleration = 0
+        self.center = self.get_center_coordinates()
+        self.crashed = False
+        self.contact_point = None
+        self.previous_center = Vector2(self.center)
+        self.previous_angle = self.angle
+
+    def set_pose(self, center, angle, radar_distances, crashed=False, interpolate=True):
+        """
+        Place directement la voiture (relecture d'une trajectoire) : ni physique, ni lancer de rayons,
+        les faisceaux du radar sont reconstruits à partir des distances enregistrées.
+        Sans interpolation, la position précédente est confondue avec la nouvelle (saut dans la trajectoire)
+        """
+        previous_center, previous_angle = Vector2(self.center), self.angle
+        offset = Vector2(float(center[0]), float(center[1])) - self.center
+        self.upper_left_corner += offset
+        self.upper_right_corner += offset
+        self.bottom_left_corner += offset
+        self.bottom_right_corner += offset
+        self.center = self.get_center_coordinates()
+        self.angle = float(angle)
+        if interpolate:
+            self.previous_center, self.previous_angle = previous_center, previous_angle
+        else:
+            self.previous_center, self.previous_angle = Vector2(self.center), self.angle
+        self.update_rotated_coordinates(self.get_rotated_coordinates())
+
+        self.radar_distances = [float(distance) for distance in radar_distances]
+        rays = self.radar.get_rays(self.center, self.angle)[0]
+        self.radar_segments = []
+        for ray, distance in zip(rays, self.radar_distances):
+            if distance < self.radar.max_range:
+                ratio = distance / self.radar.max_range
+                self.radar_segments.append((self.center.x, self.center.y, ray[0] + (ray[2] - ray[0]) * ratio,
+                                            ray[1] + (ray[3] - ray[1]) * ratio))
+        self.crashed = bool(crashed)
+        self.contact_point = None
 
     def rotate(self, points, angle, center):
         """
@@ -157,90 +220,25 @@ class Car:
     # =========================== Radar Lines ===========================
 
     def get_radar_segment(self):
-        radar_lines = self.get_radar_lines()
         self.radar_segments = []
-        for radar_line in radar_lines:
-            intersection_point = self.get_track_intersection_point_by_radar_line(radar_line)
-            if intersection_point:
-                segment_coord = self.center.x, self.center.y, intersection_point[0], intersection_point[1]
+        # Tous les faisceaux sont testés en une fois ; le cache ne relance la recherche complète (segments des
+        # cellules traversées) que pour les faisceaux dont le résultat précédent ne suffit plus
+        distances, intersection_points, indices = self.radar_cache.sense(self.center, self.angle, self.track)
+        self.radar_distances = distances[0].tolist()
+        for intersection_point, index in zip(intersection_points[0], indices[0]):
+            if index >= 0:
+                segment_coord = self.center.x, self.center.y, float(intersection_point[0]), float(intersection_point[1])
                 self.radar_segments.append(segment_coord)
-                # point = self.draw_point([intersection_point[0], intersection_point[1]])
-                # self.canvas.itemconfig(point, tags="track_intersection")
 
     def get_track_intersection_point_by_radar_line(self, line_coord):
-        closest_intersection_point = None
-        track_segments_ids = list(self.canvas.find_withtag("track_segment"))
-        for track_segment_id in track_segments_ids:
-            track_segment_coord = self.canvas.coords(track_segment_id)
-            intersection_point = get_segments_intersection_point(line_coord, track_segment_coord)
-            if intersection_point:
-                if closest_intersection_point is None:
-                    closest_intersection_point = intersection_point
-                else:
-                    closest_intersection_point = self.get_closest_intersection_point_to_center(closest_intersection_point, intersection_point, line_coord)
-        return closest_intersection_point
-
-    def get_closest_intersection_point_to_center(self, closest_intersection_point, intersection_point, line_coord):
-        line_coord_vec = ((line_coord[0], line_coord[1]), (line_coord[2], line_coord[3]))
-        intersect_point_proximity = intersect_point_line((intersection_point[0], intersection_point[1]), line_coord_vec[0], line_coord_vec[1])[1]
-        closest_intersection_point_proximity = intersect_point_line((closest_intersection_point[0], closest_intersection_point[1]), line_coord_vec[0], line_coord_vec[1])[1]
-        if intersect_point_proximity > closest_intersection_point_proximity:
-            return closest_intersection_point
-        elif intersect_point_proximity < closest_intersection_point_proximity:
-            return intersection_point
-        else:
-            return closest_intersection_point
+        candidates = self.track.get_spatial_index().query_rays([line_coord])
+        distances, intersection_points, _ = cast_rays([line_coord], self.track.get_segments_array()[candidates])
+        if distances[0] == math.inf:
+            return None
+        return list(intersection_points[0])
 
     def get_radar_lines(self):
-        radar_directions = [a for a in dir(RadarDirection) if not a.startswith('__')]
-        return list(map(lambda direction: self.get_radar_line_coord_by_direction(direction), radar_directions))
-
-    def get_radar_line_coord_by_direction(self, radar_direction):
-        equation_line = self.get_equation_line_by_direction(radar_direction)
-        return self.get_line_coord_by_equation_line_and_direction(equation_line, radar_direction)
-
-    def get_equation_line_by_direction(self, radar_direction):
-        if radar_direction == RadarDirection.CENTER:
-            segment_coord = self.center.x, self.center.y, \
-                            (self.rotated_upper_left_corner.x + self.rotated_upper_right_corner.x) / 2, \
-                            (self.rotated_upper_left_corner.y + self.rotated_upper_right_corner.y) / 2
-        elif radar_direction == RadarDirection.LEFT or radar_direction == RadarDirection.RIGHT:
-            segment_coord = self.center.x, self.center.y, \
-                            (self.rotated_bottom_right_corner.x + self.rotated_upper_right_corner.x) / 2, \
-                            (self.rotated_bottom_right_corner.y + self.rotated_upper_right_corner.y) / 2
-        elif radar_direction == RadarDirection.LEFT_DIAGONAL:
-            rotated_diagonal_point = self.rotate(
-                [Vector2(self.center.x - (self.length / 2), self.upper_left_corner.y)], self.angle, self.center)
-            segment_coord = self.center.x, self.center.y, rotated_diagonal_point[0][0], rotated_diagonal_point[0][1]
-        elif radar_direction == RadarDirection.RIGHT_DIAGONAL:
-            rotated_diagonal_point = self.rotate(
-                [Vector2(self.center.x + (self.length / 2), self.upper_left_corner.y)], self.angle, self.center)
-            segment_coord = self.center.x, self.center.y, rotated_diagonal_point[0][0], rotated_diagonal_point[0][1]
-        return get_equation_line_by_segment(*segment_coord)
-
-    def get_line_coord_by_equation_line_and_direction(self, equation_line, radar_direction):
-        if radar_direction == RadarDirection.CENTER:
-            x = 0
-            if 0 <= self.angle < 180:
-                x = self.canvas.winfo_width()
-        elif radar_direction == RadarDirection.LEFT:
-            x = 0
-            if 90 <= self.angle < 270:
-                x = self.canvas.winfo_width()
-        elif radar_direction == RadarDirection.RIGHT:
-            x = self.canvas.winfo_width()
-            if 90 <= self.angle < 270:
-                x = 0
-        elif radar_direction == RadarDirection.LEFT_DIAGONAL:
-            x = 0
-            if 45 <= self.angle < 225:
-                x = self.canvas.winfo_width()
-        elif radar_direction == RadarDirection.RIGHT_DIAGONAL:
-            x = self.canvas.winfo_width()
-            if 135 <= self.angle < 315:
-                x = 0
-        y = x * equation_line[0] + equation_line[1]
-        return self.center.x, self.center.y, x, y
+        return [tuple(ray) for ray in self.radar.get_rays(self.center, self.angle)[0]]
 
     # =========================== Getters & Setters ===========================
 
@@ -252,6 +250,18 @@ class Car:
             [self.bottom_left_corner.x, self.bottom_left_corner.y]
         ]
 
+    def get_rotated_coordinates(self):
+        """
+        Retourne les coins de la voiture pivotés autour de son centre
+        """
+        center = self.get_center_coordinates()
+        return self.rotate([
+            self.upper_left_corner,
+            self.upper_right_corner,
+            self.bottom_right_corner,
+            self.bottom_left_corner,
+        ], self.angle, (center.x, center.y))
+
     def get_center_coordinates(self):
         return Vector2(
             (self.upper_left_corner.x + self.bottom_right_corner.x) / 2,
@@ -288,36 +298,72 @@ class Car:
     def stop(self, event):
         self.stop_car()
 
+    def apply_controls(self, acceleration, steering):
+        """
+        Commandes continues (entre -1 et 1), par exemple issues d'un réseau de neurones,
+        avec les mêmes bornes que les callbacks clavier
+        """
+        self.acceleration = max(-self.max_acceleration, min(acceleration * self.max_acceleration, self.max_acceleration))
+        self.steering = max(-self.max_steering, min(steering * self.max_steering, self.max_steering))
+
     # =========================== Drawing Functions ===========================
 
     def draw(self):
         """
         Fonction permettant d'afficher la position actuelle de la voiture de manière continue
         """
-        # Efface les précédentes formes
-        self.erase_old_forms()
-
-        center = self.get_center_coordinates()
+        self.render()
+        self.canvas.after(delay, self.draw)
 
-        # Récupère la nouvelle position pivotée
-        rotated_positions = self.rotate([
-            self.upper_left_corner,
-            self.upper_right_corner,
-            self.bottom_right_corner,
-            self.bottom_left_corner,
-        ], self.angle, (center.x, center.y))
+    def render(self, alpha=1.0):
+        """
+        Affiche la voiture une fois, à une position interpolée entre le pas précédent (alpha = 0)
+        et le pas courant (alpha = 1).
+        Les formes sont créées au premier affichage puis seulement déplacées : le nombre d'objets du canvas
+        reste constant quelle que soit la durée d'exécution
+        """
+        self.create_canvas_items()
 
-        # Met à jour la position pivotée
-        self.update_rotated_coordinates(rotated_positions)
+        center, rotated_positions = self.get_interpolated_pose(alpha)
 
         # Dessin de la voiture
-        self.car = self.canvas.create_polygon(rotated_positions, outline='green', fill='')
+        self.canvas.coords(self.car, *[coord for position in rotated_positions for coord in position])
+        self.canvas.itemconfig(self.car, state='normal')
         self.draw_track_intersection_with_car_points(rotated_positions)
-        self.draw_center()
-        self.draw_direction_arrow()
-        self.draw_radar_lines()
+        self.draw_center(center)
+        self.draw_direction_arrow(center, rotated_positions)
+        self.draw_radar_lines(center - self.center)
 
-        self.canvas.after(delay, self.draw)
+    def create_canvas_items(self):
+        """
+        Crée une seule fois les formes permanentes de la voiture
+        """
+        if self.car is not None:
+            return
+        self.car = self.canvas.create_polygon(0, 0, 0, 0, 0, 0, outline='green', fill='')
+        self.center_item = self.canvas.create_oval(0, 0, 0, 0, fill='#FFFF00', tags="center")
+        self.arrow_item = self.canvas.create_line(0, 0, 0, 0, arrow=tk.LAST, tags="arrow")
+        self.radar_line_items = [self.canvas.create_line(0, 0, 0, 0, tags="radar_line", state='hidden')
+                                 for _ in range(self.radar.beam_count)]
+        # Réserve de marqueurs pour les points d'intersection, agrandie seulement si nécessaire
+        self.intersection_markers = []
+
+    def get_interpolated_pose(self, alpha):
+        """
+        Retourne le centre et les coins pivotés de la voiture interpolés entre le pas précédent et le pas courant
+        """
+        center = self.previous_center.lerp(self.center, alpha)
+        # Interpole l'angle par le plus court chemin, pour gérer le passage de 360 à 0
+        angle_delta = (self.angle - self.previous_angle + 180) % 360 - 180
+        angle = self.previous_angle + angle_delta * alpha
+        offset = center - self.center
+        rotated_positions = self.rotate([
+            self.upper_left_corner + offset,
+            self.upper_right_corner + offset,
+            self.bottom_right_corner + offset,
+            self.bottom_left_corner + offset,
+        ], angle, (center.x, center.y))
+        return center, rotated_positions
 
     def draw_track_intersection_with_car_points(self, car_corner_positions):
         front_car_segment = [car_corner_positions[0][0], car_corner_positions[0][1], car_corner_positions[1][0],
@@ -328,45 +374,62 @@ class Car:
                             car_corner_positions[3][1]]
         left_car_segment = [car_corner_positions[3][0], car_corner_positions[3][1], car_corner_positions[0][0],
                             car_corner_positions[0][1]]
-        self.draw_track_intersection_points(front_car_segment, 'yellow')
-        self.draw_track_intersection_points(right_car_segment, 'yellow')
-        self.draw_track_intersection_points(back_car_segment, 'yellow')
-        self.draw_track_intersection_points(left_car_segment, 'yellow')
-
-    def draw_track_intersection_points(self, line_coord, color='red'):
-        track_segments_ids = list(self.canvas.find_withtag("track_segment"))
-        for track_segment_id in track_segments_ids:
-            track_segment_coord = self.canvas.coords(track_segment_id)
-            intersection_point = get_segments_intersection_point(line_coord, track_segment_coord)
-            if intersection_point:
-                point = self.draw_point([intersection_point[0], intersection_point[1]], color)
-                self.canvas.itemconfig(point, tags="track_intersection")
-
-    def draw_radar_lines(self):
-        for segment_coord in self.radar_segments:
-            self.draw_radar_line(segment_coord)
-
-    def draw_radar_line(self, line_coord):
-        line = self.canvas.create_line(*line_coord)
-        self.canvas.itemconfig(line, tags="radar_line")
+        self.draw_track_intersection_points([front_car_segment, right_car_segment, back_car_segment,
+                                             left_car_segment], 'yellow')
+
+    def draw_track_intersection_points(self, lines_coord, color='red'):
+        # Seuls les segments des cellules couvertes par la boîte englobante des lignes sont testés
+        lines = np.asarray(lines_coord, dtype=float).reshape(-1, 4)
+        x_coords, y_coords = lines[:, [0, 2]], lines[:, [1, 3]]
+        candidates = self.track.get_spatial_index().query_box(x_coords.min(), y_coords.min(),
+                                                              x_coords.max(), y_coords.max())
+        intersection_points = find_intersections(lines, self.track.get_segments_array()[candidates])
+        while len(self.intersection_markers) < len(intersection_points):
+            marker = self.draw_point([0, 0], color)
+            self.canvas.itemconfig(marker, tags="track_intersection")
+            self.intersection_markers.append(marker)
+        for marker, intersection_point in zip(self.intersection_markers, intersection_points):
+            self.move_point(marker, intersection_point)
+            self.canvas.itemconfig(marker, state='normal')
+        # Les marqueurs en trop sont cachés, pas supprimés
+        for marker in self.intersection_markers[len(intersection_points):]:
+            self.canvas.itemconfig(marker, state='hidden')
+
+    def draw_radar_lines(self, offset=(0, 0)):
+        for index, line in enumerate(self.radar_line_items):
+            if index < len(self.radar_segments):
+                segment_coord = self.radar_segments[index]
+                self.draw_radar_line(line, (segment_coord[0] + offset[0], segment_coord[1] + offset[1],
+                                            segment_coord[2] + offset[0], segment_coord[3] + offset[1]))
+            else:
+                self.canvas.itemconfig(line, state='hidden')
+
+    def draw_radar_line(self, line, line_coord):
+        self.canvas.coords(line, *line_coord)
+        self.canvas.itemconfig(line, state='normal')
 
     def erase_old_forms(self):
-        self.canvas.delete(self.car)
-        self.canvas.delete("center")
-        self.canvas.delete("arrow")
+        """
+        Cache toutes les formes de la voiture sans les supprimer
+        """
+        if self.car is None:
+            return
+        for item in [self.car, self.center_item, self.arrow_item] + self.radar_line_items + self.intersection_markers:
+            self.canvas.itemconfig(item, state='hidden')
         self.canvas.delete("real_car")
-        self.canvas.delete("radar_line")
-        self.canvas.delete("track_intersection")
 
-    def draw_direction_arrow(self):
+    def draw_direction_arrow(self, center=None, rotated_positions=None):
         """
         Dessin de la flèche de direction
         """
-        arrow_coord = self.center.x, self.center.y, \
-                      (self.rotated_upper_left_corner.x + self.rotated_upper_right_corner.x) / 2, \
-                      (self.rotated_upper_left_corner.y + self.rotated_upper_right_corner.y) / 2
-        arrow = self.canvas.create_line(*arrow_coord, arrow=tk.LAST)
-        self.canvas.itemconfig(arrow, tags="arrow")
+        center = self.center if center is None else center
+        if rotated_positions is None:
+            rotated_positions = self.get_rotated_coordinates()
+        arrow_coord = center.x, center.y, \
+                      (rotated_positions[0][0] + rotated_positions[1][0]) / 2, \
+                      (rotated_positions[0][1] + rotated_positions[1][1]) / 2
+        self.canvas.coords(self.arrow_item, *arrow_coord)
+        self.canvas.itemconfig(self.arrow_item, state='normal')
 
     def draw_real_car(self):
         """
@@ -376,13 +439,16 @@ class Car:
         real_car = self.canvas.create_polygon(coordinates, outline='red', fill='')
         self.canvas.itemconfig(real_car, tags="real_car")
 
-    def draw_center(self):
+    def draw_center(self, center=None):
         """
         Dessin du centre de la voiture
         """
-        center_point = self.canvas.create_oval(self.center.x - 1, self.center.y - 1, self.center.x, self.center.y,
-                                               fill='#FFFF00')
-        self.canvas.itemconfig(center_point, tags="center")
+        center = self.center if center is None else center
+        self.canvas.coords(self.center_item, center.x - 1, center.y - 1, center.x, center.y)
+        self.canvas.itemconfig(self.center_item, state='normal')
 
     def draw_point(self, point, color='red'):
         return self.canvas.create_oval(point[0] - 3, point[1] - 3, point[0], point[1], outline=color, fill=color)
+
+    def move_point(self, point_item, point):
+        self.canvas.coords(point_item, point[0] - 3, point[1] - 3, point[0], point[1])
@@ -0,0 +1,127 @@
+"""
+Points de reprise de l'entraînement génétique (.ckpt), chargés par numpy.memmap sans copie.
+
+Structure du fichier :
+- en-tête fixe : signature, version du format, taille de la population, taille d'un génome, génération,
+  nombre de générations de l'historique, positions des données, taille des métadonnées
+  et empreinte SHA-256 des circuits d'entraînement
+- métadonnées JSON (utf-8) : tailles des couches, état du générateur aléatoire, réglages de l'entraînement
+- poids : tableau float32 population x génome, aligné sur DATA_ALIGNMENT octets
+- historique : tableau float32 générations x HISTORY_COLUMNS, aligné de même
+"""
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+from src.track_format import compute_segments_hash
+
+MAGIC = b'RCPOPUL\0'
+FORMAT_VERSION = 1
+CHECKPOINT_EXTENSION = '.ckpt'
+# signature, version, taille de la population, taille d'un génome, génération, générations de l'historique,
+# position des poids, position de l'historique, taille des métadonnées, empreinte des circuits
+HEADER = struct.Struct('<8sIIIIIQQI32s')
+DATA_ALIGNMENT = 64
+WEIGHT_DTYPE = np.dtype('<f4')
+# Statistiques de fitness conservées pour chaque génération évaluée
+HISTORY_COLUMNS = ('best', 'mean', 'median', 'worst')
+
+
+def compute_track_set_hash(tracks):
+    """
+    Empreinte SHA-256 d'une liste de circuits, dans l'ordre : celle des empreintes de leurs segments
+    """
+    digest = hashlib.sha256()
+    for track in tracks:
+        digest.update(compute_segments_hash(track.get_segments_array()).encode('ascii'))
+    return digest.hexdigest()
+
+
+def get_fitness_statistics(fitness):
+    return np.max(fitness), np.mean(fitness), np.median(fitness), np.min(fitness)
+
+
+def align(offset):
+    return offset + (-offset % DATA_ALIGNMENT)
+
+
+def write_checkpoint(file_path, population, generation, history, track_hash, metadata=None):
+    weights = np.ascontiguousarray(population, dtype=WEIGHT_DTYPE)
+    history = np.ascontiguousarray(np.asarray(history, dtype=WEIGHT_DTYPE).reshape(-1, len(HISTORY_COLUMNS)))
+    metadata_bytes = json.dumps(metadata or {}).encode('utf-8')
+    weights_offset = align(HEADER.size + len(metadata_bytes))
+    history_offset = align(weights_offset + weights.nbytes)
+
+    # Écriture dans un fichier temporaire puis renommage : un arrêt pendant l'écriture laisse le point précédent.
+    # Le fichier puis le dossier sont synchronisés sur le disque : après une coupure de courant, le nom désigne
+    # soit l'ancien point de reprise, soit le nouveau complet
+    temporary_path = file_path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, weights.shape[0], weights.shape[1], generation, len(history),
+                               weights_offset, history_offset, len(metadata_bytes), bytes.fromhex(track_hash)))
+        file.write(metadata_bytes)
+        file.write(b'\0' * (weights_offset - HEADER.size - len(metadata_bytes)))
+        file.write(weights.tobytes())
+        file.write(b'\0' * (history_offset - weights_offset - weights.nbytes))
+        file.write(history.tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, file_path)
+    sync_directory(os.path.dirname(os.path.abspath(file_path)))
+    return file_path
+
+
+def sync_directory(directory):
+    """
+    Synchronise un dossier pour qu'un renommage y survive à une coupure de courant (sans effet hors POSIX,
+    où un dossier ne peut pas être ouvert)
+    """
+    if os.name != 'posix':
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def read_checkpoint_header(file_path):
+    with open(file_path, 'rb') as file:
+        magic, version, population_size, genome_size, generation, history_length, weights_offset, history_offset, \
+            metadata_size, digest = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("{path} n'est pas un point de reprise".format(path=file_path))
+        if version != FORMAT_VERSION:
+            raise ValueError("Version de format {version} non supportée".format(version=version))
+        metadata = json.loads(file.read(metadata_size).decode('utf-8'))
+    return {
+        'population_size': population_size,
+        'genome_size': genome_size,
+        'generation': generation,
+        'history_length': history_length,
+        'weights_offset': weights_offset,
+        'history_offset': history_offset,
+        'track_hash': digest.hex(),
+        'metadata': metadata,
+    }
+
+
+def load_checkpoint(file_path):
+    """
+    Retourne (poids, historique, en-tête) ; poids et historique sont des vues numpy.memmap en lecture seule :
+    la reprise ne lit que l'en-tête, et les processus d'évaluation qui ouvrent le même fichier
+    partagent les mêmes pages mémoire
+    """
+    header = read_checkpoint_header(file_path)
+    shape = (header['population_size'], header['genome_size'])
+    if shape[0] * shape[1] == 0:
+        weights = np.empty(shape, dtype=WEIGHT_DTYPE)
+    else:
+        weights = np.memmap(file_path, dtype=WEIGHT_DTYPE, mode='r', offset=header['weights_offset'], shape=shape)
+    if header['history_length'] == 0:
+        history = np.empty((0, len(HISTORY_COLUMNS)), dtype=WEIGHT_DTYPE)
+    else:
+        history = np.memmap(file_path, dtype=WEIGHT_DTYPE, mode='r', offset=header['history_offset'],
+                            shape=(header['history_length'], len(HISTORY_COLUMNS)))
+    return weights, history, header
@@ -0,0 +1,93 @@
+"""
+Détection des collisions entre les voitures et le circuit
+"""
+import numpy as np
+from src.raycast import get_pairwise_intersection_parameters
+
+# Nombre de segments testés à la fois pour une seule voiture, avant de vérifier si une collision a été trouvée
+CHUNK_SIZE = 8
+
+
+def get_car_edges(corners):
+    """
+    Retourne les 4 côtés (ax, ay, bx, by) de N voitures à partir de leurs coins N x 4 x 2, tableau N x 4 x 4
+    """
+    corners = np.asarray(corners, dtype=float).reshape(-1, 4, 2)
+    return np.concatenate((corners, np.roll(corners, -1, axis=1)), axis=2)
+
+
+def get_bounding_boxes(corners):
+    corners = np.asarray(corners, dtype=float).reshape(-1, 4, 2)
+    return np.concatenate((corners.min(axis=1), corners.max(axis=1)), axis=1)
+
+
+def get_overlapping_pairs(boxes, box_indices, segment_bounding_boxes, segment_indices):
+    """
+    Phase large : ne garde que les couples voiture / segment dont les boîtes englobantes se chevauchent
+    """
+    car_boxes = boxes[box_indices]
+    segment_boxes = segment_bounding_boxes[segment_indices]
+    overlap = (car_boxes[:, 0] <= segment_boxes[:, 2]) & (segment_boxes[:, 0] <= car_boxes[:, 2]) & \
+              (car_boxes[:, 1] <= segment_boxes[:, 3]) & (segment_boxes[:, 1] <= car_boxes[:, 3])
+    return box_indices[overlap], segment_indices[overlap]
+
+
+def test_edges_against_segments(edges, car_indices, segments):
+    """
+    Phase fine : teste les 4 côtés de chaque voiture car_indices[i] contre segments[i].
+    Retourne les indices des couples en collision et les points de contact
+    """
+    lines = edges[car_indices].reshape(-1, 4)
+    t, hit = get_pairwise_intersection_parameters(lines, np.repeat(segments, 4, axis=0))
+    hit_lines = np.flatnonzero(hit)
+    points = lines[hit_lines, 0:2] + t[hit_lines, None] * (lines[hit_lines, 2:4] - lines[hit_lines, 0:2])
+    return hit_lines // 4, points
+
+
+def find_collision(corners, track):
+    """
+    Teste si une voiture (coins 4 x 2) touche le circuit.
+    S'arrête au premier paquet de segments qui contient une collision.
+    Retourne (True, point de contact) ou (False, None)
+    """
+    compiled_track = track.compile()
+    edges = get_car_edges(corners)
+    boxes = get_bounding_boxes(corners)
+    candidates = compiled_track.spatial_index.query_box(*boxes[0])
+    if len(candidates) == 0:
+        return False, None
+    _, candidates = get_overlapping_pairs(boxes, np.zeros(len(candidates), dtype=np.int64),
+                                          compiled_track.bounding_boxes, candidates)
+
+    for start in range(0, len(candidates), CHUNK_SIZE):
+        chunk = candidates[start:start + CHUNK_SIZE]
+        pairs, points = test_edges_against_segments(edges, np.zeros(len(chunk), dtype=np.int64),
+                                                    compiled_track.segments[chunk])
+        if len(pairs):
+            return True, points[0]
+    return False, None
+
+
+def find_collisions(corners, track):
+    """
+    Version vectorisée de find_collision() pour N voitures (coins N x 4 x 2).
+    Retourne (crashed, points) : un booléen par voiture et le premier point de contact (nan si aucun)
+    """
+    compiled_track = track.compile()
+    edges = get_car_edges(corners)
+    boxes = get_bounding_boxes(corners)
+    crashed = np.zeros(len(edges), dtype=bool)
+    points = np.full((len(edges), 2), np.nan)
+
+    car_indices, segment_indices = compiled_track.spatial_index.query_boxes(boxes)
+    car_indices, segment_indices = get_overlapping_pairs(boxes, car_indices, compiled_track.bounding_boxes,
+                                                         segment_indices)
+    if len(car_indices) == 0:
+        return crashed, points
+
+    pairs, contact_points = test_edges_against_segments(edges, car_indices, compiled_track.segments[segment_indices])
+    # Les couples sont triés par voiture : on garde le premier point de contact de chacune
+    cars, first = np.unique(car_indices[pairs], return_index=True)
+    crashed[cars] = True
+    points[cars] = contact_points[first]
+    return crashed, points
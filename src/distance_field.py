@@ -0,0 +1,257 @@
+"""
+Champ de distance du circuit : distance au segment le plus proche, précalculée aux nœuds d'une grille régulière.
+
+Une fois le champ construit, la distance au circuit en un point coûte une interpolation bilinéaire,
+quel que soit le nombre de segments :
+- le radar avance le long de chaque faisceau par bonds égaux à la distance lue (sphere tracing),
+  puis calcule l'impact exact contre les segments les plus proches de l'endroit où il s'arrête ;
+- une voiture dont le centre est plus loin du circuit que son rayon englobant ne peut pas le toucher.
+Le champ n'est pas signé : il ne distingue pas l'intérieur de la piste de l'extérieur, ce dont ni le radar
+ni les collisions n'ont besoin. Le lancer de rayons exact reste la référence.
+
+Le champ ne dépend que des segments : il est mis en cache à côté du fichier du circuit (.npz).
+"""
+import math
+import os
+import numpy as np
+from src.collision import find_collisions
+from src.radar import cast_rays_indexed
+from src.raycast import cast_rays, get_pairwise_intersection_parameters
+from src.spatial_index import UniformGrid
+from src.track_format import compute_segments_hash
+
+# Distance entre deux nœuds de la grille, en pixels
+DEFAULT_RESOLUTION = 2.0
+# Côté des blocs de nœuds calculés ensemble lors de la construction
+TILE_SIZE = 16
+# Nombre maximal de bonds d'un faisceau
+MAX_TRACE_STEPS = 128
+CACHE_EXTENSION = '.npz'
+
+
+def get_point_segment_distances(points, segments):
+    """
+    Distances entre P points et S segments, tableau P x S
+    """
+    starts = segments[:, 0:2]
+    directions = segments[:, 2:4] - starts
+    squared_lengths = np.maximum((directions ** 2).sum(axis=1), 1e-12)
+    offsets = points[:, None, :] - starts
+    t = np.clip((offsets * directions).sum(axis=2) / squared_lengths, 0, 1)
+    differences = offsets - t[:, :, None] * directions
+    return np.sqrt((differences ** 2).sum(axis=2))
+
+
+def compute_distance_field(compiled_track, width, height, resolution=DEFAULT_RESOLUTION):
+    """
+    Distance de chaque nœud de la grille au segment le plus proche, et indice de ce segment.
+    Les nœuds sont traités par blocs : seuls les segments de l'index spatial proches du bloc sont testés,
+    la zone de recherche étant agrandie tant qu'elle ne garantit pas d'avoir trouvé le plus proche
+    """
+    columns = int(math.ceil(width / resolution)) + 1
+    rows = int(math.ceil(height / resolution)) + 1
+    distances = np.full((rows, columns), np.inf, dtype=np.float32)
+    nearest = np.full((rows, columns), -1, dtype=np.int32)
+    segments = compiled_track.segments
+    if len(segments) == 0:
+        return distances, nearest
+
+    spatial_index = compiled_track.spatial_index
+    if spatial_index.is_trivial:
+        # Des milliers de nœuds par segment : la grille est rentable même pour un petit circuit
+        spatial_index = UniformGrid(segments, width, height, brute_force_threshold=0)
+    max_radius = math.hypot(spatial_index.max_x - spatial_index.min_x, spatial_index.max_y - spatial_index.min_y) + \
+        math.hypot(width, height)
+    for first_row in range(0, rows, TILE_SIZE):
+        for first_column in range(0, columns, TILE_SIZE):
+            row_indices = np.arange(first_row, min(first_row + TILE_SIZE, rows))
+            column_indices = np.arange(first_column, min(first_column + TILE_SIZE, columns))
+            node_x, node_y = np.meshgrid(column_indices * resolution, row_indices * resolution)
+            nodes = np.column_stack((node_x.ravel(), node_y.ravel()))
+            min_x, min_y = nodes.min(axis=0)
+            max_x, max_y = nodes.max(axis=0)
+
+            # Tout segment hors de la boîte agrandie de radius est à plus de radius de chaque nœud du bloc
+            radius = TILE_SIZE * resolution
+            while True:
+                candidates = spatial_index.query_box(min_x - radius, min_y - radius, max_x + radius, max_y + radius)
+                if len(candidates):
+                    tile_distances = get_point_segment_distances(nodes, segments[candidates])
+                    closest = tile_distances.argmin(axis=1)
+                    closest_distances = tile_distances[np.arange(len(nodes)), closest]
+                    if closest_distances.max() <= radius or radius >= max_radius:
+                        break
+                    radius = max(radius * 2, float(closest_distances.max()))
+                else:
+                    radius *= 2
+            shape = (len(row_indices), len(column_indices))
+            distances[np.ix_(row_indices, column_indices)] = closest_distances.reshape(shape)
+            nearest[np.ix_(row_indices, column_indices)] = candidates[closest].reshape(shape)
+    return distances, nearest
+
+
+def get_cache_path(track_path, resolution):
+    return '{path}.field{resolution:g}{extension}'.format(path=track_path, resolution=resolution,
+                                                          extension=CACHE_EXTENSION)
+
+
+class DistanceField:
+
+    def __init__(self, distances, nearest, resolution, segments, spatial_index=None):
+        self.distances = distances
+        self.nearest = nearest
+        self.resolution = float(resolution)
+        self.segments = segments
+        # Index des segments pour finir exactement les faisceaux que le sphere tracing n'a pas conclus
+        self.spatial_index = spatial_index
+        self.rows, self.columns = distances.shape
+        # Écart maximal entre la distance interpolée et la distance exacte (la distance est 1-lipschitzienne)
+        self.max_error = self.resolution * math.sqrt(2)
+
+    @classmethod
+    def build(cls, track, resolution=DEFAULT_RESOLUTION, cache_path=None):
+        """
+        Construit le champ d'un circuit, ou le relit depuis cache_path s'il correspond aux mêmes segments
+        """
+        compiled_track = track.compile()
+        segments_hash = compute_segments_hash(compiled_track.segments)
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                if str(data['hash']) == segments_hash and float(data['resolution']) == resolution and \
+                        tuple(data['size']) == (track.width, track.height):
+                    return cls(data['distances'], data['nearest'], resolution, compiled_track.segments,
+                               compiled_track.spatial_index)
+
+        distances, nearest = compute_distance_field(compiled_track, track.width, track.height, resolution)
+        if cache_path is not None:
+            # Écriture dans un fichier temporaire puis renommage, comme pour les circuits binaires
+            temporary_path = cache_path + '.tmp' + CACHE_EXTENSION
+            np.savez(temporary_path, distances=distances, nearest=nearest, resolution=resolution,
+                     size=(track.width, track.height), hash=segments_hash)
+            os.replace(temporary_path, cache_path)
+        return cls(distances, nearest, resolution, compiled_track.segments, compiled_track.spatial_index)
+
+    def get_grid_coordinates(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        x = np.clip(points[:, 0] / self.resolution, 0, self.columns - 1)
+        y = np.clip(points[:, 1] / self.resolution, 0, self.rows - 1)
+        return x, y
+
+    def sample(self, points):
+        """
+        Distance au circuit de P points, par interpolation bilinéaire (les points hors de la grille sont ramenés
+        sur son bord)
+        """
+        x, y = self.get_grid_coordinates(points)
+        column = np.minimum(x.astype(np.int64), self.columns - 2)
+        row = np.minimum(y.astype(np.int64), self.rows - 2)
+        fx = x - column
+        fy = y - row
+        grid = self.distances
+        top = grid[row, column] * (1 - fx) + grid[row, column + 1] * fx
+        bottom = grid[row + 1, column] * (1 - fx) + grid[row + 1, column + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def get_nearest_segments(self, points):
+        """
+        Segments les plus proches des quatre nœuds qui entourent chaque point, tableau P x 4
+        """
+        x, y = self.get_grid_coordinates(points)
+        column = np.minimum(x.astype(np.int64), self.columns - 2)
+        row = np.minimum(y.astype(np.int64), self.rows - 2)
+        return np.stack((self.nearest[row, column], self.nearest[row, column + 1],
+                         self.nearest[row + 1, column], self.nearest[row + 1, column + 1]), axis=1)
+
+    def intersect(self, rays, candidates):
+        """
+        Impact exact de chaque faisceau sur ses segments candidats (tableau R x C d'indices) :
+        paramètres du plus proche le long du faisceau (inf si aucun) et indices des segments touchés
+        """
+        pairs = np.repeat(rays, candidates.shape[1], axis=0)
+        t, hit = get_pairwise_intersection_parameters(pairs, self.segments[candidates.ravel()])
+        t = np.where(hit, t, np.inf).reshape(candidates.shape)
+        closest = t.argmin(axis=1)
+        rows = np.arange(len(rays))
+        return t[rows, closest], candidates[rows, closest]
+
+    def trace(self, rays):
+        """
+        Sphere tracing de R faisceaux (ox, oy, ex, ey) : chaque faisceau avance de la distance lue au point courant.
+        À moins d'une résolution du circuit, l'impact est cherché exactement parmi les segments les plus proches
+        des nœuds autour du point courant et un peu plus loin ; un faisceau qui ne fait que frôler un mur
+        repart d'une résolution. Les faisceaux encore en cours après MAX_TRACE_STEPS bonds (longeant un mur)
+        sont finis par un lancer de rayons exact. Même contrat que cast_rays() : (distances, points, indices),
+        inf et -1 pour les faisceaux sans impact
+        """
+        rays = np.asarray(rays, dtype=float).reshape(-1, 4)
+        origins = rays[:, 0:2]
+        directions = rays[:, 2:4] - origins
+        lengths = np.hypot(directions[:, 0], directions[:, 1])
+        directions = directions / np.maximum(lengths, 1e-12)[:, None]
+
+        t = np.zeros(len(rays))
+        hit_parameters = np.full(len(rays), np.inf)
+        indices = np.full(len(rays), -1)
+        active = np.arange(len(rays))
+        for _ in range(MAX_TRACE_STEPS):
+            if len(active) == 0:
+                break
+            positions = origins[active] + t[active, None] * directions[active]
+            distances = self.sample(positions)
+            close = np.flatnonzero(distances < self.resolution)
+            if len(close):
+                near = active[close]
+                ahead = positions[close] + 2 * self.resolution * directions[near]
+                nearest = np.hstack((self.get_nearest_segments(positions[close]), self.get_nearest_segments(ahead)))
+                # Les voisins dans l'ordre du circuit rattrapent les segments trop courts pour être les plus proches
+                # d'un nœud (coins des circuits générés)
+                segment_count = len(self.segments)
+                candidates = np.hstack((nearest, (nearest - 1) % segment_count, (nearest + 1) % segment_count))
+                parameters, hit_indices = self.intersect(rays[near], candidates)
+                # Un candidat long peut être touché bien plus loin, derrière un mur qui n'a pas encore été testé :
+                # seuls les impacts jusqu'au point testé devant le faisceau sont retenus
+                in_window = parameters * lengths[near] <= t[near] + 2 * self.resolution
+                hit_parameters[near[in_window]] = parameters[in_window]
+                indices[near[in_window]] = hit_indices[in_window]
+                distances[close] = self.resolution
+            t[active] += distances
+            done = np.isfinite(hit_parameters[active]) | (t[active] >= lengths[active])
+            active = active[~done]
+        if len(active):
+            hit_parameters[active], indices[active] = self.cast(rays[active])
+        hit_parameters[hit_parameters > 1] = np.inf
+
+        hit = np.isfinite(hit_parameters)
+        distances = np.where(hit, hit_parameters * lengths, np.inf)
+        points = np.full((len(rays), 2), np.nan)
+        points[hit] = origins[hit] + distances[hit, None] * directions[hit]
+        indices[~hit] = -1
+        return distances, points, indices
+
+    def cast(self, rays):
+        """
+        Lancer de rayons exact, chaque faisceau contre les segments des cellules qu'il traverse : paramètres
+        de l'impact le long des faisceaux (inf si aucun) et indices des segments touchés
+        """
+        lengths = np.hypot(rays[:, 2] - rays[:, 0], rays[:, 3] - rays[:, 1])
+        if self.spatial_index is not None:
+            distances, _, indices = cast_rays_indexed(rays, self.segments, self.spatial_index, lengths.max())
+        else:
+            distances, _, indices = cast_rays(rays, self.segments)
+        return distances / np.maximum(lengths, 1e-12), indices
+
+    def find_collisions(self, corners, track):
+        """
+        Comme collision.find_collisions(), avec une seule lecture du champ par voiture : une voiture dont le centre
+        est plus loin du circuit que son rayon englobant ne peut pas le toucher, seules les autres sont testées
+        exactement
+        """
+        corners = np.asarray(corners, dtype=float).reshape(-1, 4, 2)
+        centers = corners.mean(axis=1)
+        radii = np.hypot(*(corners[:, 0] - centers).T)
+        crashed = np.zeros(len(corners), dtype=bool)
+        points = np.full((len(corners), 2), np.nan)
+        near = np.flatnonzero(self.sample(centers) <= radii + self.max_error)
+        if len(near):
+            crashed[near], points[near] = find_collisions(corners[near], track)
+        return crashed, points
@@ -0,0 +1,223 @@
+"""
+Budgets d'évaluation adaptatifs : une évaluation s'arrête dès que la voiture s'écrase, n'avance plus
+ou a fini ses tours, et seuls les génomes prometteurs ont droit à des essais plus longs (successive halving).
+
+La plupart des génomes aléatoires s'écrasent en quelques pas : la population entière n'est simulée
+que pendant le premier échelon, puis seule une fraction des meilleurs continue jusqu'à l'échelon suivant
+"""
+import math
+from concurrent.futures import CancelledError
+import numpy as np
+from src.car import dt
+from src.policy import PopulationPolicy
+from src.population import Population
+from src.progress import find_progress_index, create_progress_tracker
+from src.radar import Radar
+from src.snapshot import capture_population, restore_population
+
+# Pas sans gain d'avancement après lesquels une voiture est arrêtée
+DEFAULT_STALL_TICKS = 50
+# Gain minimal d'avancement pour ne pas être considéré à l'arrêt, en pixels
+MIN_IMPROVEMENT = 1.0
+# Tours après lesquels une évaluation est terminée
+DEFAULT_LAPS = 1
+# Fraction des candidats promus d'un échelon au suivant
+DEFAULT_KEEP_FRACTION = 1 / 3
+DEFAULT_RUNG_COUNT = 3
+# Les voitures arrêtées sont retirées de la simulation quand elles dépassent cette fraction de la population
+COMPACT_FRACTION = 0.5
+
+# Raisons de fin d'une évaluation
+RUNNING, CRASHED, STALLED, FINISHED, OUT_OF_BUDGET, ELIMINATED = range(6)
+REASON_NAMES = ('running', 'crashed', 'stalled', 'finished', 'out_of_budget', 'eliminated')
+
+
+def get_budgets(max_steps, rung_count=DEFAULT_RUNG_COUNT, keep_fraction=DEFAULT_KEEP_FRACTION):
+    """
+    Pas cumulés à la fin de chaque échelon : chaque échelon est 1 / keep_fraction fois plus long que le précédent,
+    le dernier allant jusqu'à max_steps
+    """
+    return tuple(max(1, int(round(max_steps * keep_fraction ** (rung_count - 1 - rung))))
+                 for rung in range(rung_count))
+
+
+class TerminationRules:
+    """
+    Règles d'arrêt de N évaluations menées en parallèle : accident, absence de progrès pendant stall_ticks pas,
+    ou laps tours terminés. Sans longueur de circuit (pas de ligne médiane), les tours ne sont pas comptés
+    """
+
+    def __init__(self, size, track_length, stall_ticks=DEFAULT_STALL_TICKS, laps=DEFAULT_LAPS,
+                 min_improvement=MIN_IMPROVEMENT):
+        self.track_length = track_length
+        self.stall_ticks = stall_ticks
+        self.laps = laps
+        self.min_improvement = min_improvement
+        self.reference_progress = np.zeros(size)
+        self.last_improvement = np.zeros(size, dtype=np.int64)
+
+    @property
+    def max_progress(self):
+        """
+        Avancement qui termine une évaluation (infini si les tours ne sont pas comptés)
+        """
+        if self.laps is None or self.track_length is None:
+            return np.inf
+        return self.laps * self.track_length
+
+    def reset(self, progress, tick=0):
+        self.reference_progress = np.array(progress, dtype=float)
+        self.last_improvement = np.full(len(self.reference_progress), tick, dtype=np.int64)
+
+    def select(self, indices):
+        self.reference_progress = self.reference_progress[indices]
+        self.last_improvement = self.last_improvement[indices]
+
+    def update(self, progress, crashed, tick):
+        """
+        Retourne la raison d'arrêt de chaque évaluation (RUNNING pour celles qui continuent)
+        """
+        improved = progress > self.reference_progress + self.min_improvement
+        self.reference_progress[improved] = progress[improved]
+        self.last_improvement[improved] = tick
+        reasons = np.full(len(progress), RUNNING)
+        reasons[tick - self.last_improvement >= self.stall_ticks] = STALLED
+        reasons[progress >= self.max_progress] = FINISHED
+        reasons[crashed] = CRASHED
+        return reasons
+
+
+class EvaluationScheduler:
+    """
+    Évalue une matrice de génomes par échelons (budgets : pas cumulés à la fin de chaque échelon).
+    À la fin d'un échelon, seuls les candidats classés dans la fraction keep_fraction des meilleurs et encore
+    en course continuent ; les voitures sont simulées ensemble (Population), les voitures arrêtées étant
+    régulièrement retirées de la simulation. Les candidats du dernier échelon sont aussi évalués sur les autres
+    circuits de tracks, leurs avancements s'additionnant.
+
+    La fitness est l'avancement le long du circuit, comme evaluate_genome() ; à avancement égal,
+    la voiture qui a fini ses tours le plus vite est devant
+    """
+
+    def __init__(self, layer_sizes, tracks, budgets=None, keep_fraction=DEFAULT_KEEP_FRACTION,
+                 stall_ticks=DEFAULT_STALL_TICKS, laps=DEFAULT_LAPS, radar=None, step_dt=dt):
+        self.layer_sizes = tuple(layer_sizes)
+        self.tracks = list(tracks)
+        self.budgets = tuple(budgets) if budgets is not None else get_budgets(1000)
+        self.keep_fraction = keep_fraction
+        self.stall_ticks = stall_ticks
+        self.laps = laps
+        self.radar = radar if radar is not None else Radar()
+        self.step_dt = step_dt
+        self.stats = {}
+        # Levé depuis un autre thread (GeneticTrainer.cancel()) : l'évaluation en cours lève CancelledError
+        self.cancelled = False
+
+    def evaluate(self, genomes):
+        genomes = np.asarray(genomes, dtype=float)
+        count = len(genomes)
+        fitness = np.zeros(count)
+        reasons = np.full(count, RUNNING)
+        self.stats = {'steps': 0, 'full_steps': count * self.budgets[-1] * len(self.tracks)}
+
+        batch = EvaluationBatch(self, self.tracks[0], genomes, np.arange(count))
+        for rung, budget in enumerate(self.budgets):
+            batch.run(budget, fitness, reasons)
+            if rung == len(self.budgets) - 1 or len(batch) == 0:
+                break
+            # Promotion : parmi les keep_fraction meilleurs de tous les candidats, ceux qui roulent encore
+            keep_count = max(1, int(math.ceil(count * self.keep_fraction ** (rung + 1))))
+            promoted = np.zeros(count, dtype=bool)
+            promoted[np.argsort(-fitness, kind='stable')[:keep_count]] = True
+            eliminated = ~promoted[batch.candidates]
+            reasons[batch.candidates[eliminated]] = ELIMINATED
+            batch.keep(np.flatnonzero(~eliminated))
+        reasons[batch.candidates] = OUT_OF_BUDGET
+        finalists = batch.finalists
+
+        for track in self.tracks[1:]:
+            extra_fitness = np.zeros(count)
+            batch = EvaluationBatch(self, track, genomes[finalists], finalists)
+            batch.run(self.budgets[-1], extra_fitness, np.full(count, RUNNING))
+            fitness[finalists] += extra_fitness[finalists]
+
+        for reason, name in enumerate(REASON_NAMES[1:], start=1):
+            self.stats[name] = int((reasons == reason).sum())
+        return fitness
+
+
+class EvaluationBatch:
+    """
+    Candidats simulés ensemble sur un circuit : candidates donne l'indice du génome de chaque voiture
+    """
+
+    def __init__(self, scheduler, track, genomes, candidates):
+        self.scheduler = scheduler
+        self.track = track
+        self.genomes = genomes
+        self.candidates = np.asarray(candidates)
+        # Candidats ayant participé au dernier échelon, arrêtés ou non
+        self.finalists = self.candidates
+        # Sans ligne médiane, l'avancement est la distance parcourue
+        self.index = find_progress_index(track)
+        self.tick = 0
+        self.population = Population(len(genomes), track)
+        self.policy = PopulationPolicy(scheduler.layer_sizes, genomes)
+        self.progress = create_progress_tracker(self.index, len(genomes))
+        self.progress.reset(self.population.centers)
+        track_length = self.index.length if self.index is not None else None
+        self.rules = TerminationRules(len(genomes), track_length, scheduler.stall_ticks, scheduler.laps)
+        self.rules.reset(self.progress.progress)
+        self.running = np.ones(len(genomes), dtype=bool)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def keep(self, indices):
+        """
+        Ne garde que les voitures d'indices donnés : leur état est recopié dans une population plus petite
+        """
+        state = capture_population(self.population, self.progress).select(indices)
+        self.candidates = self.candidates[indices]
+        self.genomes = self.genomes[indices]
+        self.population = Population(len(indices), self.track)
+        self.progress = create_progress_tracker(self.index, len(indices))
+        restore_population(self.population, state, self.progress)
+        self.policy.set_genomes(self.genomes)
+        self.rules.select(indices)
+        self.running = self.running[indices]
+
+    def run(self, budget, fitness, reasons):
+        """
+        Simule jusqu'au pas budget ou jusqu'à l'arrêt de toutes les voitures ; fitness et reasons
+        (indexés par génome) sont mis à jour au fur et à mesure. Les voitures arrêtées sont immobilisées,
+        puis retirées quand elles sont assez nombreuses ; à la fin, il ne reste que les voitures en course
+        """
+        scheduler = self.scheduler
+        max_progress = self.rules.max_progress
+        self.finalists = self.candidates
+        while self.tick < budget and self.running.any():
+            if scheduler.cancelled:
+                raise CancelledError()
+            self.policy.drive(self.population, scheduler.radar)
+            self.population.step(scheduler.step_dt)
+            self.progress.update(self.population.centers)
+            self.tick += 1
+            scheduler.stats['steps'] += len(self.candidates)
+
+            step_reasons = self.rules.update(self.progress.progress, self.population.crashed, self.tick)
+            active = np.flatnonzero(self.running)
+            fitness[self.candidates[active]] = np.minimum(self.progress.progress[active], max_progress)
+            stopped = active[step_reasons[active] != RUNNING]
+            if len(stopped) == 0:
+                continue
+            finished = stopped[step_reasons[stopped] == FINISHED]
+            # Départage des voitures arrivées : moins d'un pixel, pour ne pas fausser l'avancement
+            fitness[self.candidates[finished]] += 1 - self.tick / scheduler.budgets[-1]
+            reasons[self.candidates[stopped]] = step_reasons[stopped]
+            self.running[stopped] = False
+            self.population.crashed[stopped] = True
+            if 1 - self.running.mean() >= COMPACT_FRACTION:
+                self.keep(np.flatnonzero(self.running))
+        if not self.running.all():
+            self.keep(np.flatnonzero(self.running))
@@ -0,0 +1,139 @@
+"""
+Boucle à pas de temps fixe : la physique avance toujours par pas de dt, quel que soit le rythme d'affichage
+"""
+import time
+from src.car import delay, dt
+
+# Durée réelle d'un pas de physique, en secondes : un pas de dt toutes les 20ms comme l'ancienne boucle
+TICK_DURATION = delay / 1000
+# Délai entre deux images, en millisecondes
+FRAME_DELAY = 16
+# Nombre maximal de pas de physique rattrapés par image : au-delà, le retard est abandonné
+MAX_SUBSTEPS = 5
+
+
+class FixedTimestepLoop:
+    """
+    Accumule le temps réel écoulé entre deux images et le consomme par pas de physique fixes.
+    update(step_dt) est appelé autant de fois que nécessaire, puis render(alpha) une seule fois
+    avec alpha dans [0, 1] : la fraction de pas restante, pour interpoler la position affichée
+    """
+
+    def __init__(self, widget, update, render, step_dt=dt, tick_duration=TICK_DURATION, frame_delay=FRAME_DELAY,
+                 max_substeps=MAX_SUBSTEPS, clock=time.perf_counter):
+        self.widget = widget
+        self.update = update
+        self.render = render
+        self.step_dt = step_dt
+        self.tick_duration = tick_duration
+        self.frame_delay = frame_delay
+        self.max_substeps = max_substeps
+        self.clock = clock
+
+        self.accumulator = 0.0
+        self.last_time = None
+        self.running = False
+        self.after_id = None
+
+        # Compteurs consultables pour le suivi des performances
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.last_time = self.clock()
+            self.accumulator = 0.0
+            self.after_id = self.widget.after(self.frame_delay, self.frame)
+
+    def stop(self):
+        self.running = False
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def frame(self):
+        if not self.running:
+            return
+        now = self.clock()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        substeps = 0
+        while self.accumulator >= self.tick_duration and substeps < self.max_substeps:
+            self.update(self.step_dt)
+            self.accumulator -= self.tick_duration
+            substeps += 1
+        self.ticks += substeps
+
+        if self.accumulator >= self.tick_duration:
+            # Trop de retard : on abandonne le temps non rattrapable et on saute cette image
+            # pour laisser la physique reprendre son rythme
+            self.accumulator %= self.tick_duration
+            self.dropped_frames += 1
+        else:
+            self.render(self.accumulator / self.tick_duration)
+            self.frames += 1
+
+        self.after_id = self.widget.after(self.frame_delay, self.frame)
+
+
+# Nombre d'images par seconde visé par défaut quand la simulation tourne sans limite
+TARGET_FPS = 30
+
+
+class UncappedLoop:
+    """
+    La simulation avance aussi vite que possible, et l'affichage est limité à target_fps images par seconde.
+    Chaque appel de frame() enchaîne des pas de physique jusqu'à l'image suivante, affiche une fois, puis rend
+    la main à Tk (after) pour que la fenêtre reste réactive
+    """
+
+    def __init__(self, widget, update, render, step_dt=dt, target_fps=TARGET_FPS, clock=time.perf_counter):
+        self.widget = widget
+        self.update = update
+        self.render = render
+        self.step_dt = step_dt
+        self.frame_duration = 1 / target_fps
+        self.clock = clock
+
+        self.running = False
+        self.after_id = None
+        self.next_render = None
+
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.next_render = self.clock() + self.frame_duration
+            self.after_id = self.widget.after(1, self.frame)
+
+    def stop(self):
+        self.running = False
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def frame(self):
+        if not self.running:
+            return
+        # Au moins un pas par appel, même si l'affichage a pris tout le temps de l'image
+        while True:
+            self.update(self.step_dt)
+            self.ticks += 1
+            if self.clock() >= self.next_render:
+                break
+
+        self.render(1.0)
+        self.frames += 1
+        now = self.clock()
+        self.next_render += self.frame_duration
+        if self.next_render < now:
+            # L'affichage est plus lent que target_fps : on repart de maintenant plutôt que d'accumuler du retard
+            self.next_render = now + self.frame_duration
+            self.dropped_frames += 1
+        self.after_id = self.widget.after(1, self.frame)
@@ -0,0 +1,368 @@
+"""
+Entraînement par algorithme génétique des réseaux de neurones qui conduisent la voiture.
+Les évaluations sont réparties sur un pool de processus, chacun faisant tourner des simulations headless ;
+avec --halving, toute la population est simulée ensemble et seuls les meilleurs génomes roulent longtemps.
+
+Usage : python -m src.genetic --generations 50 --workers 4
+"""
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, CancelledError, wait
+from multiprocessing.connection import wait as wait_for_objects
+import numpy as np
+from src.checkpoint import write_checkpoint, load_checkpoint, compute_track_set_hash, get_fitness_statistics
+from src.evaluation import EvaluationScheduler, TerminationRules, get_budgets, DEFAULT_STALL_TICKS, DEFAULT_LAPS, \
+    RUNNING
+from src.network import NeuralNetwork, get_layer_sizes, get_genome_size, DEFAULT_HIDDEN_LAYERS
+from src.progress import find_progress_index, create_progress_tracker
+from src.radar import Radar
+from src.simulation import Simulation
+from src.track import Track, DEFAULT_TRACK_PATH
+from src.trajectory import TrajectoryRecorder
+
+# Nombre maximal de pas de simulation par évaluation
+DEFAULT_MAX_STEPS = 1000
+# Générations entre deux points de reprise
+DEFAULT_CHECKPOINT_INTERVAL = 10
+# Intervalle auquel une évaluation en cours vérifie si elle a été annulée, en secondes
+CANCEL_POLL_INTERVAL = 0.1
+
+# Circuit chargé une seule fois par processus d'évaluation
+_worker_track = None
+# Point de reprise ouvert par le processus d'évaluation : (chemin, génération, poids en numpy.memmap)
+_worker_checkpoint = None
+
+
+def init_worker(track_path):
+    global _worker_track
+    _worker_track = Track.from_file(track_path)
+    threading.Thread(target=exit_with_parent, daemon=True).start()
+
+
+def exit_with_parent():
+    """
+    Termine le processus d'évaluation dès que le processus qui a créé le pool disparaît : un entraînement tué
+    (TrainingProcess.poll_stop()) ne laisse pas ses processus d'évaluation derrière lui
+    """
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        wait_for_objects([parent.sentinel])
+        os._exit(1)
+
+
+def get_checkpoint_weights(checkpoint_path, generation):
+    """
+    Poids du point de reprise de cette génération, ouvert une seule fois par processus d'évaluation :
+    tous les processus lisent les mêmes pages du fichier, sans copie
+    """
+    global _worker_checkpoint
+    if _worker_checkpoint is None or _worker_checkpoint[:2] != (checkpoint_path, generation):
+        weights, _, header = load_checkpoint(checkpoint_path)
+        if header['generation'] != generation:
+            raise ValueError("Le point de reprise {path} n'est plus celui de la génération {generation}".format(
+                path=checkpoint_path, generation=generation))
+        _worker_checkpoint = (checkpoint_path, generation, weights)
+    return _worker_checkpoint[2]
+
+
+def evaluate_checkpoint_rows(checkpoint_path, generation, start, end, layer_sizes, max_steps=DEFAULT_MAX_STEPS):
+    """
+    Évalue les génomes start à end (exclu) du point de reprise : seuls le chemin et les bornes transitent
+    entre processus
+    """
+    weights = get_checkpoint_weights(checkpoint_path, generation)
+    return evaluate_genomes(weights[start:end], layer_sizes, max_steps)
+
+
+def evaluate_genomes(genomes, layer_sizes, max_steps=DEFAULT_MAX_STEPS):
+    return [evaluate_genome(genome, layer_sizes, max_steps) for genome in genomes]
+
+
+def evaluate_genome(genome, layer_sizes, max_steps=DEFAULT_MAX_STEPS, track=None, recorder=None,
+                    stall_ticks=DEFAULT_STALL_TICKS, laps=DEFAULT_LAPS):
+    """
+    Fait conduire une voiture par le réseau décrit par le génome, jusqu'à ce qu'elle s'écrase, n'avance plus
+    pendant stall_ticks pas, termine laps tours ou atteigne max_steps. La fitness est l'avancement le long
+    du circuit (tours compris) : tourner en rond ou rouler à contresens ne rapporte rien. Sur un circuit
+    sans ligne médiane (pas exactement deux bords fermés), c'est la distance parcourue.
+    Avec un TrajectoryRecorder, la position de départ puis chaque pas sont enregistrés pour être relus dans l'App
+    """
+    track = track if track is not None else _worker_track
+    network = NeuralNetwork(layer_sizes, genome)
+    simulation = Simulation(track)
+    car = simulation.add_car()
+    car.get_radar_segment()
+    if recorder is not None:
+        # Première ligne : la pose de départ, avant toute commande
+        recorder.record_car(car, 0, 0)
+    index = find_progress_index(track)
+    progress = create_progress_tracker(index, 1)
+    progress.reset(car.center)
+    rules = TerminationRules(1, index.length if index is not None else None, stall_ticks, laps)
+    rules.reset(progress.progress)
+
+    for tick in range(1, max_steps + 1):
+        inputs = np.asarray(car.radar_distances) / car.radar.max_range
+        acceleration, steering = network.forward(inputs)
+        car.apply_controls(acceleration, steering)
+        simulation.step()
+        progress.update(car.center)
+        if recorder is not None:
+            recorder.record_car(car, acceleration, steering)
+        if rules.update(progress.progress, [car.crashed], tick)[0] != RUNNING:
+            break
+    return float(progress.progress[0])
+
+
+class GeneticTrainer:
+
+    def __init__(self, population_size=50, hidden_layers=DEFAULT_HIDDEN_LAYERS, elite_count=2, tournament_size=3,
+                 mutation_rate=0.1, mutation_scale=0.3, max_steps=DEFAULT_MAX_STEPS, workers=None,
+                 track_path=DEFAULT_TRACK_PATH, seed=None, halving=False, checkpoint_path=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, start_method=None):
+        self.population_size = population_size
+        self.layer_sizes = get_layer_sizes(Radar().beam_count, hidden_layers)
+        self.genome_size = get_genome_size(self.layer_sizes)
+        self.elite_count = elite_count
+        self.tournament_size = tournament_size
+        self.mutation_rate = mutation_rate
+        self.mutation_scale = mutation_scale
+        self.max_steps = max_steps
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.track_path = track_path
+        # Démarrage des processus du pool (None : celui de la plateforme). 'spawn' est nécessaire si d'autres
+        # threads tournent déjà : un processus créé par fork pourrait hériter d'un verrou qu'ils détiennent
+        self.start_method = start_method
+
+        self.rng = np.random.default_rng(seed)
+        self.population = self.rng.normal(0, 1, (population_size, self.genome_size))
+        self.fitness = np.zeros(population_size)
+        self.generation = 0
+        # Meilleure, moyenne, médiane et pire fitness de chaque génération évaluée
+        self.history = []
+        self.executor = None
+        # Levé par cancel(), depuis un autre thread, pour interrompre l'évaluation en cours
+        self.cancelled = False
+        # Un point de reprise est écrit toutes les checkpoint_interval générations
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        # Point de reprise contenant exactement la population à évaluer : les processus d'évaluation y lisent
+        # les génomes au lieu de les recevoir
+        self.population_checkpoint = None
+        # Avec halving, toute la population est évaluée ensemble dans ce processus, par échelons de budget
+        self.scheduler = None
+        if halving:
+            self.scheduler = EvaluationScheduler(self.layer_sizes, [Track.from_file(track_path)],
+                                                 get_budgets(max_steps))
+
+    # =========================== Process pool ===========================
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """
+        Démarre le pool de processus une fois pour toutes les générations : chaque processus charge le circuit
+        à son démarrage, seuls les génomes et les fitness transitent ensuite entre processus. Une population
+        tout juste écrite ou relue dans un point de reprise n'est pas envoyée : les processus la lisent
+        dans le fichier
+        """
+        if self.executor is None and self.scheduler is None:
+            context = multiprocessing.get_context(self.start_method) if self.start_method is not None else None
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=init_worker,
+                                                initargs=(self.track_path,))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def cancel(self):
+        """
+        Interrompt l'évaluation en cours, depuis un autre thread : evaluate() annule les paquets de génomes
+        pas encore commencés et lève CancelledError. Le trainer ne peut plus évaluer ensuite.
+        Le pool n'est arrêté que par close(), dans le thread du trainer
+        """
+        self.cancelled = True
+        if self.scheduler is not None:
+            self.scheduler.cancelled = True
+
+    # =========================== Training ===========================
+
+    def evaluate(self):
+        if self.cancelled:
+            raise CancelledError()
+        if self.scheduler is not None:
+            self.fitness = self.scheduler.evaluate(self.population)
+        else:
+            self.start()
+            count = len(self.population)
+            # Quelques paquets par processus : assez pour équilibrer la charge sans multiplier les échanges
+            chunksize = max(1, math.ceil(count / (self.workers * 4)))
+            futures = []
+            for start in range(0, count, chunksize):
+                end = min(start + chunksize, count)
+                if self.population_checkpoint is not None:
+                    # Les processus lisent chacun leurs lignes du point de reprise
+                    futures.append(self.executor.submit(evaluate_checkpoint_rows, self.population_checkpoint,
+                                                        self.generation, start, end, self.layer_sizes,
+                                                        self.max_steps))
+                else:
+                    futures.append(self.executor.submit(evaluate_genomes, self.population[start:end],
+                                                        self.layer_sizes, self.max_steps))
+            while wait(futures, CANCEL_POLL_INTERVAL).not_done:
+                if self.cancelled:
+                    for future in futures:
+                        future.cancel()
+                    raise CancelledError()
+            results = itertools.chain.from_iterable(future.result() for future in futures)
+            self.fitness = np.fromiter(results, dtype=float, count=count)
+        self.history.append(get_fitness_statistics(self.fitness))
+        return self.fitness
+
+    def select(self):
+        """
+        Sélection par tournoi : retourne l'indice du meilleur parmi tournament_size individus tirés au hasard
+        """
+        contestants = self.rng.integers(0, len(self.population), self.tournament_size)
+        return contestants[np.argmax(self.fitness[contestants])]
+
+    def crossover(self, parent_a, parent_b):
+        """
+        Croisement uniforme : chaque gène vient de l'un ou l'autre parent
+        """
+        mask = self.rng.random(self.genome_size) < 0.5
+        return np.where(mask, parent_a, parent_b)
+
+    def mutate(self, genome):
+        mask = self.rng.random(self.genome_size) < self.mutation_rate
+        return genome + mask * self.rng.normal(0, self.mutation_scale, self.genome_size)
+
+    def next_generation(self):
+        order = np.argsort(self.fitness)[::-1]
+        children = [self.population[index] for index in order[:self.elite_count]]
+        while len(children) < self.population_size:
+            parent_a = self.population[self.select()]
+            parent_b = self.population[self.select()]
+            children.append(self.mutate(self.crossover(parent_a, parent_b)))
+        self.population = np.array(children)
+        self.population_checkpoint = None
+        self.generation += 1
+        if self.checkpoint_path is not None and self.generation % self.checkpoint_interval == 0:
+            self.save_checkpoint()
+            # La génération est évaluée depuis le fichier, comme après une reprise : même résultat
+            # dans les deux cas
+            self.population, _, _ = load_checkpoint(self.checkpoint_path)
+            self.population_checkpoint = self.checkpoint_path
+
+    # =========================== Checkpoints ===========================
+
+    def get_track_hash(self):
+        return compute_track_set_hash([Track.from_file(self.track_path)])
+
+    def save_checkpoint(self, file_path=None):
+        """
+        Écrit la population de la génération à évaluer, l'historique des fitness et l'état du générateur
+        aléatoire : la reprise continue exactement où l'entraînement s'est arrêté (aux poids float32 près)
+        """
+        metadata = {
+            'layer_sizes': self.layer_sizes,
+            'rng_state': self.rng.bit_generator.state,
+            'track': os.path.basename(self.track_path),
+            'max_steps': self.max_steps,
+        }
+        return write_checkpoint(file_path or self.checkpoint_path, self.population, self.generation, self.history,
+                                self.get_track_hash(), metadata)
+
+    def resume(self, file_path):
+        """
+        Reprend depuis un point de reprise : les poids restent dans le fichier (numpy.memmap) jusqu'à
+        la génération suivante, et les processus d'évaluation les y lisent directement
+        """
+        weights, history, header = load_checkpoint(file_path)
+        if tuple(header['metadata']['layer_sizes']) != self.layer_sizes:
+            raise ValueError("Le point de reprise {path} a été écrit pour un autre réseau".format(path=file_path))
+        if header['track_hash'] != self.get_track_hash():
+            raise ValueError("Le point de reprise {path} a été écrit pour un autre circuit".format(path=file_path))
+        self.population = weights
+        self.population_checkpoint = file_path
+        self.population_size = len(weights)
+        self.fitness = np.zeros(len(weights))
+        self.generation = header['generation']
+        self.history = [tuple(row) for row in history.tolist()]
+        self.rng.bit_generator.state = header['metadata']['rng_state']
+
+    def get_best_genome(self):
+        return self.population[np.argmax(self.fitness)]
+
+    def train(self, generations, callback=None):
+        """
+        Enchaîne évaluation et reproduction ; callback(trainer) est appelé après chaque évaluation.
+        Retourne le champion de la dernière génération évaluée, copié avant que next_generation()
+        ne remplace la population
+        """
+        best_genome = None
+        for _ in range(generations):
+            self.evaluate()
+            if callback is not None:
+                callback(self)
+            best_genome = np.array(self.get_best_genome())
+            self.next_generation()
+        return best_genome
+
+
+def print_generation(trainer):
+    print("Génération {generation} : meilleure fitness {best:.1f}, moyenne {mean:.1f}".format(
+        generation=trainer.generation, best=trainer.fitness.max(), mean=trainer.fitness.mean()))
+    if trainer.scheduler is not None:
+        stats = trainer.scheduler.stats
+        print("  {steps} pas simulés sur {full_steps} ({crashed} accidents, {stalled} à l'arrêt, "
+              "{finished} arrivées, {eliminated} éliminés)".format(**stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraîne les réseaux de neurones par algorithme génétique")
+    parser.add_argument('--generations', type=int, default=50)
+    parser.add_argument('--population', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=None, help="nombre de processus d'évaluation")
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS)
+    parser.add_argument('--track', default=DEFAULT_TRACK_PATH)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--halving', action='store_true',
+                        help="évaluation par échelons : seuls les meilleurs génomes roulent jusqu'à max-steps")
+    parser.add_argument('--checkpoint', help="point de reprise (.ckpt) écrit régulièrement pendant l'entraînement")
+    parser.add_argument('--checkpoint-interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL)
+    parser.add_argument('--resume', action='store_true',
+                        help="reprend depuis le point de reprise s'il existe, jusqu'à --generations au total")
+    parser.add_argument('--record', help="enregistre la conduite du meilleur génome dans ce fichier .traj")
+    args = parser.parse_args()
+
+    with GeneticTrainer(population_size=args.population, max_steps=args.max_steps, workers=args.workers,
+                        track_path=args.track, seed=args.seed, halving=args.halving,
+                        checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval) as trainer:
+        if args.resume and args.checkpoint and os.path.exists(args.checkpoint):
+            trainer.resume(args.checkpoint)
+            print("Reprise à la génération {generation}".format(generation=trainer.generation))
+        best_genome = trainer.train(max(0, args.generations - trainer.generation), callback=print_generation)
+        if best_genome is None and args.record:
+            # Aucune génération entraînée : la population courante est évaluée une fois pour en enregistrer
+            # le meilleur génome
+            trainer.evaluate()
+            best_genome = np.array(trainer.get_best_genome())
+
+    if args.record:
+        metadata = {'track': os.path.basename(args.track), 'generation': trainer.generation}
+        with TrajectoryRecorder(args.record, Radar().beam_count, metadata=metadata) as recorder:
+            evaluate_genome(best_genome, trainer.layer_sizes, args.max_steps, Track.from_file(args.track), recorder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Réseau de neurones qui conduit la voiture : distances du radar -> (accélération, direction)
+"""
+import numpy as np
+
+# Une couche cachée de 8 neurones par défaut
+DEFAULT_HIDDEN_LAYERS = (8,)
+# Sorties : accélération et direction, dans [-1, 1]
+OUTPUT_SIZE = 2
+
+
+def get_layer_sizes(input_size, hidden_layers=DEFAULT_HIDDEN_LAYERS):
+    return (input_size,) + tuple(hidden_layers) + (OUTPUT_SIZE,)
+
+
+def get_genome_size(layer_sizes):
+    """
+    Nombre de paramètres (poids et biais) du réseau, c'est-à-dire la taille d'un génome
+    """
+    return sum((inputs + 1) * outputs for inputs, outputs in zip(layer_sizes[:-1], layer_sizes[1:]))
+
+
+class NeuralNetwork:
+    """
+    Perceptron multicouche à activation tanh, dont tous les paramètres tiennent dans un vecteur plat (le génome).
+    Pour chaque couche, le génome contient la matrice des poids (entrées x sorties) puis le vecteur des biais
+    """
+
+    def __init__(self, layer_sizes, genome):
+        self.layer_sizes = tuple(layer_sizes)
+        self.genome = np.asarray(genome, dtype=float)
+        self.layers = []
+        offset = 0
+        for inputs, outputs in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            weights = self.genome[offset:offset + inputs * outputs].reshape(inputs, outputs)
+            offset += inputs * outputs
+            biases = self.genome[offset:offset + outputs]
+            offset += outputs
+            self.layers.append((weights, biases))
+
+    def forward(self, inputs):
+        values = np.asarray(inputs, dtype=float)
+        for weights, biases in self.layers:
+            values = np.tanh(values @ weights + biases)
+        return values
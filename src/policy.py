@@ -0,0 +1,66 @@
+"""
+Passe avant de toute une population de réseaux en une multiplication matricielle par couche
+"""
+import numpy as np
+from src.network import get_genome_size
+
+
+class PopulationPolicy:
+    """
+    Les poids des P individus sont empilés par couche (P x entrées x sorties) : les actions de toute
+    la population pour un pas de simulation sont calculées sans boucle Python par individu.
+    Utilise la même disposition de génome que NeuralNetwork
+    """
+
+    def __init__(self, layer_sizes, genomes):
+        self.layer_sizes = tuple(layer_sizes)
+        self.genome_size = get_genome_size(self.layer_sizes)
+        self.weights = []
+        self.biases = []
+        self.set_genomes(genomes)
+
+    def set_genomes(self, genomes):
+        """
+        Remplace les poids de la population à partir d'une matrice P x taille du génome
+        """
+        genomes = np.asarray(genomes, dtype=float).reshape(-1, self.genome_size)
+        self.size = len(genomes)
+        self.weights = []
+        self.biases = []
+        self.buffers = []
+        offset = 0
+        for inputs, outputs in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            weights = genomes[:, offset:offset + inputs * outputs].reshape(self.size, inputs, outputs)
+            offset += inputs * outputs
+            biases = genomes[:, offset:offset + outputs]
+            offset += outputs
+            self.weights.append(np.ascontiguousarray(weights))
+            # Les biais sont stockés en P x 1 x sorties pour s'ajouter directement au résultat de matmul
+            self.biases.append(np.ascontiguousarray(biases)[:, None, :])
+            self.buffers.append(np.empty((self.size, 1, outputs)))
+        # Tampon des actions (accélération, direction) de chaque individu
+        self.actions = np.empty((self.size, self.layer_sizes[-1]))
+
+    def act(self, observations, out=None):
+        """
+        Calcule les actions de la population à partir de la matrice P x entrées des observations.
+        Le résultat est écrit dans out (ou dans le tampon self.actions) et retourné
+        """
+        values = np.asarray(observations, dtype=float).reshape(self.size, 1, self.layer_sizes[0])
+        for weights, biases, buffer in zip(self.weights, self.biases, self.buffers):
+            np.matmul(values, weights, out=buffer)
+            buffer += biases
+            np.tanh(buffer, out=buffer)
+            values = buffer
+        out = self.actions if out is None else out
+        out[:] = values[:, 0, :]
+        return out
+
+    def drive(self, population, radar):
+        """
+        Un pas de contrôle pour toute la population : radar -> réseaux -> accélération et direction
+        """
+        distances = population.get_radar_distances(radar)
+        self.act(distances / radar.max_range)
+        population.apply_controls(self.actions)
+        return self.actions
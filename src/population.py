@@ -0,0 +1,198 @@
+"""
+Simulation vectorisée d'une population de voitures (structure de tableaux NumPy)
+"""
+import numpy as np
+from src.car import dt
+from src.track import Track
+from src.collision import find_collisions
+
+
+class Population:
+    """
+    Fait avancer N voitures en même temps avec le même modèle bicyclette que Car :
+    chaque propriété de la voiture est un tableau de taille N au lieu d'un attribut d'objet
+    """
+
+    def __init__(self, size, track=None, length=24, width=12, detect_collisions=True, field_resolution=None):
+        self.size = size
+        self.track = track if track is not None else Track()
+
+        # Dimensions de la voiture (identiques pour toute la population)
+        self.length = length
+        self.width = width
+
+        # Mêmes limites que Car
+        self.max_velocity = 20
+        self.max_acceleration = 5.0
+        self.max_steering = 100
+
+        self.centers = np.zeros((size, 2))
+        # Seule la composante y de la vélocité de Car est utilisée, on ne stocke donc qu'un scalaire par voiture
+        self.velocities = np.zeros(size)
+        self.angles = np.zeros(size)
+        self.steering = np.zeros(size)
+        self.accelerations = np.zeros(size)
+        # Une voiture qui touche le circuit reste immobile jusqu'à son reset
+        self.detect_collisions = detect_collisions
+        # Avec une résolution, le champ de distance du circuit écarte d'abord les voitures loin du circuit
+        self.field_resolution = field_resolution
+        self.crashed = np.zeros(size, dtype=bool)
+        self.contact_points = np.full((size, 2), np.nan)
+
+        # Décalage des 4 coins par rapport au centre, dans l'ordre haut gauche, haut droit, bas droit, bas gauche
+        half_width, half_length = width / 2, length / 2
+        self.corner_offsets = np.array([
+            [-half_width, -half_length],
+            [half_width, -half_length],
+            [half_width, half_length],
+            [-half_width, half_length],
+        ])
+
+        # Rayon du cercle englobant la voiture : si le centre est à plus de cette distance des bords,
+        # aucun coin ne peut sortir de la zone de jeu
+        self.bounding_radius = np.hypot(half_width, half_length)
+
+        # Tampons réutilisés à chaque pas pour éviter les allocations
+        self._sin = np.empty(size)
+        self._cos = np.empty(size)
+        self._buffer = np.empty(size)
+
+        self.reset()
+
+    def reset(self, indices=None):
+        """
+        Replace les voitures (toutes, ou seulement celles d'indices donnés) à la position de départ
+        """
+        if indices is None:
+            indices = slice(None)
+        start_x, start_y = self.track.start_position
+        self.centers[indices] = (start_x + self.width / 2, start_y + self.length / 2)
+        self.velocities[indices] = 0
+        self.angles[indices] = 0
+        self.steering[indices] = 0
+        self.accelerations[indices] = 0
+        self.crashed[indices] = False
+        self.contact_points[indices] = np.nan
+
+    def step(self, step_dt=dt):
+        """
+        Équivalent vectorisé de Car.update() sans le radar
+        """
+        buffer = self._buffer
+        np.multiply(self.accelerations, step_dt, out=buffer)
+        self.velocities += buffer
+        np.clip(self.velocities, -self.max_velocity, self.max_velocity, out=self.velocities)
+        self.velocities[self.crashed] = 0
+
+        out_of_bound = self.has_reach_window_limit()
+        if out_of_bound is not None:
+            self.velocities[out_of_bound] *= -20
+
+        # Vector2(0, v).rotate(angle)
+        np.radians(self.angles, out=buffer)
+        np.sin(buffer, out=self._sin)
+        np.cos(buffer, out=self._cos)
+        np.multiply(self.velocities, step_dt, out=buffer)
+        self.centers[:, 0] -= buffer * self._sin
+        self.centers[:, 1] += buffer * self._cos
+
+        self.compute_car_angles(step_dt)
+        if self.detect_collisions:
+            self.check_collisions()
+
+    def check_collisions(self):
+        """
+        Met à jour l'état crashed des voitures encore en course
+        """
+        running = np.flatnonzero(~self.crashed)
+        if len(running) == 0:
+            return
+        corners = self.get_corners()[running]
+        if self.field_resolution is not None:
+            crashed, points = self.track.get_distance_field(self.field_resolution).find_collisions(corners, self.track)
+        else:
+            crashed, points = find_collisions(corners, self.track)
+        self.crashed[running[crashed]] = True
+        self.contact_points[running[crashed]] = points[crashed]
+
+    def compute_car_angles(self, step_dt=dt):
+        """
+        Met à jour les angles en place ; v / (length / sin(steering)) vaut 0 quand steering est nul,
+        comme dans Car.compute_car_angle()
+        """
+        angles = np.radians(self.steering)
+        np.sin(angles, out=angles)
+        angles *= self.velocities
+        angles *= np.degrees(step_dt / self.length)
+        angles += self.angles
+        self.steering[:] = 0
+        self.bound_angles(angles)
+
+    def bound_angles(self, angles):
+        # Reproduit Car.bound_angle(), qui repart de l'angle précédent
+        above = angles > 360
+        below = angles < 0
+        if above.any() or below.any():
+            angles = np.where(above, self.angles - 360, np.where(below, 360 + self.angles, angles))
+        self.angles[:] = angles
+
+    def get_corners(self):
+        """
+        Retourne les coins pivotés de chaque voiture, tableau N x 4 x 2
+        """
+        angles_rad = np.radians(self.angles)
+        cos_val = np.cos(angles_rad)[:, None]
+        sin_val = np.sin(angles_rad)[:, None]
+        offset_x = self.corner_offsets[:, 0]
+        offset_y = self.corner_offsets[:, 1]
+        corners = np.empty((self.size, 4, 2))
+        corners[:, :, 0] = self.centers[:, 0:1] + offset_x * cos_val - offset_y * sin_val
+        corners[:, :, 1] = self.centers[:, 1:2] + offset_x * sin_val + offset_y * cos_val
+        return corners
+
+    def has_reach_window_limit(self):
+        """
+        Retourne les indices des voitures dont un coin est hors de la zone de jeu, ou None s'il n'y en a aucune
+        """
+        radius = self.bounding_radius
+        x = self.centers[:, 0]
+        y = self.centers[:, 1]
+        near_border = (x < radius) | (x > self.track.width - radius) | (y < radius) | (y > self.track.height - radius)
+        if not near_border.any():
+            return None
+        candidates = np.flatnonzero(near_border)
+        corners = self.get_corners()[candidates]
+        corners_x = corners[:, :, 0]
+        corners_y = corners[:, :, 1]
+        out_of_bound = ((corners_x < 0) | (corners_x > self.track.width) |
+                        (corners_y < 0) | (corners_y > self.track.height)).any(axis=1)
+        return candidates[out_of_bound]
+
+    # =========================== Controls ===========================
+
+    def set_controls(self, accelerations, steering):
+        """
+        Applique d'un coup l'accélération et la direction de toutes les voitures,
+        avec les mêmes bornes que les callbacks up()/down()/turn_left()/turn_right() de Car
+        """
+        np.clip(accelerations, -self.max_acceleration, self.max_acceleration, out=self.accelerations)
+        np.clip(steering, -self.max_steering, self.max_steering, out=self.steering)
+
+    def apply_controls(self, actions):
+        """
+        Équivalent vectorisé de Car.apply_controls() : actions est un tableau N x 2 de commandes
+        (accélération, direction) entre -1 et 1
+        """
+        np.multiply(actions[:, 0], self.max_acceleration, out=self.accelerations)
+        np.multiply(actions[:, 1], self.max_steering, out=self.steering)
+        np.clip(self.accelerations, -self.max_acceleration, self.max_acceleration, out=self.accelerations)
+        np.clip(self.steering, -self.max_steering, self.max_steering, out=self.steering)
+
+    # =========================== Radar ===========================
+
+    def get_radar_distances(self, radar):
+        """
+        Distances mesurées par le radar pour toutes les voitures, tableau N x B
+        """
+        distances, _, _ = radar.sense(self.centers, self.angles, self.track)
+        return distances
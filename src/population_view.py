@@ -0,0 +1,172 @@
+"""
+Affichage d'une population entière dans le canvas : un polygone par voiture, déplacé à chaque image,
+et le radar complet seulement pour les meilleures voitures
+"""
+import numpy as np
+from src.evaluation import TerminationRules, DEFAULT_STALL_TICKS, DEFAULT_LAPS, RUNNING
+from src.network import get_layer_sizes, get_genome_size, DEFAULT_HIDDEN_LAYERS
+from src.policy import PopulationPolicy
+from src.population import Population
+from src.progress import find_progress_index, create_progress_tracker
+from src.radar import Radar
+from src.radar_cache import RadarCache
+
+# Taille de la population regardée quand aucun génome n'est fourni
+DEFAULT_WATCHED_SIZE = 200
+# Nombre de voitures dont le radar et les points d'impact sont affichés
+DEFAULT_TOP_K = 3
+# Pas de simulation avant de remettre la population au départ, même si des voitures roulent encore
+DEFAULT_MAX_STEPS = 1000
+CAR_COLOR = '#3C8D5A'
+CRASHED_COLOR = '#5A3030'
+TOP_COLOR = '#7CFC00'
+RADAR_COLOR = '#A9ACAB'
+HIT_COLOR = 'red'
+
+
+class PopulationView:
+    """
+    Les formes sont créées une seule fois : à chaque image, seules leurs coordonnées changent,
+    et la couleur d'une voiture n'est modifiée que lorsque son état (accidentée, parmi les meilleures) change
+    """
+
+    def __init__(self, canvas, population, radar=None, top_k=DEFAULT_TOP_K):
+        self.canvas = canvas
+        self.population = population
+        self.radar = radar if radar is not None else Radar()
+        self.top_k = min(top_k, population.size)
+        self.car_items = []
+        self.radar_items = []
+        self.hit_items = []
+        # Dernier état affiché de chaque voiture : 0 normale, 1 accidentée, 2 parmi les meilleures
+        self.drawn_states = np.full(population.size, -1)
+
+    def create_canvas_items(self):
+        if self.car_items:
+            return
+        self.car_items = [self.canvas.create_polygon(0, 0, 0, 0, 0, 0, outline=CAR_COLOR, fill='',
+                                                     tags="population_car")
+                          for _ in range(self.population.size)]
+        beam_count = self.radar.beam_count
+        self.radar_items = [[self.canvas.create_line(0, 0, 0, 0, fill=RADAR_COLOR, tags="population_radar",
+                                                     state='hidden') for _ in range(beam_count)]
+                            for _ in range(self.top_k)]
+        self.hit_items = [[self.canvas.create_oval(0, 0, 0, 0, outline=HIT_COLOR, fill=HIT_COLOR,
+                                                   tags="population_radar", state='hidden')
+                           for _ in range(beam_count)] for _ in range(self.top_k)]
+
+    def get_top_indices(self, fitness):
+        """
+        Indices des top_k meilleures voitures encore en course, de la meilleure à la moins bonne
+        """
+        if fitness is None or self.top_k == 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.flatnonzero(~self.population.crashed)
+        if len(candidates) > self.top_k:
+            scores = fitness[candidates]
+            candidates = candidates[np.argpartition(-scores, self.top_k - 1)[:self.top_k]]
+        return candidates[np.argsort(-fitness[candidates])]
+
+    def render(self, fitness=None):
+        self.create_canvas_items()
+        corners = self.population.get_corners().reshape(self.population.size, 8).tolist()
+        coords = self.canvas.coords
+        for item, car_corners in zip(self.car_items, corners):
+            coords(item, *car_corners)
+
+        top_indices = self.get_top_indices(fitness)
+        states = self.population.crashed.astype(np.int64)
+        states[top_indices] = 2
+        for index in np.flatnonzero(states != self.drawn_states):
+            state = states[index]
+            color = (CAR_COLOR, CRASHED_COLOR, TOP_COLOR)[state]
+            self.canvas.itemconfig(self.car_items[index], outline=color, width=2 if state == 2 else 1)
+            if state == 2:
+                self.canvas.tag_raise(self.car_items[index])
+        self.drawn_states = states
+
+        self.draw_overlays(top_indices)
+
+    def draw_overlays(self, top_indices):
+        """
+        Radar et points d'impact des meilleures voitures ; les formes des emplacements inutilisés sont cachées
+        """
+        if len(top_indices):
+            origins = self.population.centers[top_indices]
+            distances, points, _ = self.radar.sense(origins, self.population.angles[top_indices],
+                                                    self.population.track)
+        for rank, (line_items, hit_items) in enumerate(zip(self.radar_items, self.hit_items)):
+            if rank >= len(top_indices):
+                for item in line_items + hit_items:
+                    self.canvas.itemconfig(item, state='hidden')
+                continue
+            origin_x, origin_y = origins[rank]
+            for beam, (line_item, hit_item) in enumerate(zip(line_items, hit_items)):
+                x, y = points[rank, beam]
+                self.canvas.coords(line_item, origin_x, origin_y, x, y)
+                self.canvas.itemconfig(line_item, state='normal')
+                if distances[rank, beam] < self.radar.max_range:
+                    self.canvas.coords(hit_item, x - 2, y - 2, x + 2, y + 2)
+                    self.canvas.itemconfig(hit_item, state='normal')
+                else:
+                    self.canvas.itemconfig(hit_item, state='hidden')
+
+    def destroy(self):
+        self.canvas.delete("population_car", "population_radar")
+        self.car_items = []
+        self.radar_items = []
+        self.hit_items = []
+        self.drawn_states[:] = -1
+
+
+class PopulationWatcher:
+    """
+    Fait conduire une population par ses génomes et l'affiche : update() et render() sont les deux fonctions
+    d'une boucle de l'App (UncappedLoop). La population repart du départ quand toutes les voitures ont fini
+    selon les règles de l'évaluation (accident, à l'arrêt, tours terminés), ou après max_steps pas :
+    une voiture qui tourne en rond sans s'écraser ne bloque pas l'affichage
+    """
+
+    def __init__(self, canvas, track, genomes=None, radar=None, hidden_layers=DEFAULT_HIDDEN_LAYERS, top_k=DEFAULT_TOP_K,
+                 seed=None, max_steps=DEFAULT_MAX_STEPS, stall_ticks=DEFAULT_STALL_TICKS, laps=DEFAULT_LAPS):
+        self.radar = radar if radar is not None else Radar()
+        layer_sizes = get_layer_sizes(self.radar.beam_count, hidden_layers)
+        if genomes is None:
+            rng = np.random.default_rng(seed)
+            genomes = rng.normal(0, 1, (DEFAULT_WATCHED_SIZE, get_genome_size(layer_sizes)))
+        self.population = Population(len(genomes), track)
+        self.policy = PopulationPolicy(layer_sizes, genomes)
+        # Cache propre à la conduite : l'affichage du radar des meilleures voitures interroge d'autres faisceaux
+        self.radar_cache = RadarCache(self.radar)
+        # Sans ligne médiane (circuit dessiné sans deux bords fermés), les voitures sont classées
+        # à la distance parcourue
+        index = find_progress_index(track)
+        self.progress = create_progress_tracker(index, len(genomes))
+        self.rules = TerminationRules(len(genomes), index.length if index is not None else None, stall_ticks, laps)
+        self.max_steps = max_steps
+        self.tick = 0
+        self.finished = np.zeros(len(genomes), dtype=bool)
+        self.view = PopulationView(canvas, self.population, self.radar, top_k)
+        self.reset()
+
+    def reset(self):
+        self.population.reset()
+        self.progress.reset(self.population.centers)
+        self.rules.reset(self.progress.progress)
+        self.tick = 0
+        self.finished[:] = False
+
+    def update(self, step_dt):
+        if self.finished.all() or self.tick >= self.max_steps:
+            self.reset()
+        self.policy.drive(self.population, self.radar_cache)
+        self.population.step(step_dt)
+        self.progress.update(self.population.centers)
+        self.tick += 1
+        self.finished |= self.rules.update(self.progress.progress, self.population.crashed, self.tick) != RUNNING
+
+    def render(self, alpha=1.0):
+        self.view.render(self.progress.progress)
+
+    def destroy(self):
+        self.view.destroy()
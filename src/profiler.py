@@ -0,0 +1,186 @@
+"""
+Mesure du temps passé dans chaque phase d'un pas de simulation, et affichage optionnel dans le canvas.
+
+Les phases sont instrumentées en remplaçant les méthodes concernées par des versions chronométrées
+au moment de enable() ; disable() remet les méthodes d'origine : désactivé, le profiler ne coûte rien.
+Le remplacement se fait sur les classes : toutes les instances de Car et de Radar du processus sont mesurées.
+
+Les phases s'appellent les unes les autres (Car.update appelle le radar et la détection de collision) :
+chaque phase ne compte que son temps propre, celui des phases qu'elle appelle en est retiré,
+et la somme des phases ne dépasse jamais le temps réellement écoulé.
+"""
+import functools
+import json
+import time
+from collections import deque
+import numpy as np
+from src.car import Car
+from src.radar import Radar
+
+# Nombre de mesures conservées par phase pour les percentiles
+DEFAULT_WINDOW = 500
+# Phases instrumentées : nom -> (classe, méthode). 'move' ne garde que la cinématique de Car.update,
+# 'radar_intersection' la recherche des impacts (cache compris) sans la construction des faisceaux
+PHASES = {
+    'move': (Car, 'update'),
+    'radar_rays': (Radar, 'get_rays'),
+    'radar_intersection': (Car, 'get_radar_segment'),
+    'collision': (Car, 'check_collision'),
+    'draw': (Car, 'render'),
+    'erase': (Car, 'erase_old_forms'),
+}
+# Rafraîchissement de l'affichage des statistiques, en millisecondes
+OVERLAY_INTERVAL = 500
+
+
+class Profiler:
+
+    def __init__(self, phases=None, window=DEFAULT_WINDOW):
+        self.phases = dict(PHASES if phases is None else phases)
+        self.window = window
+        self.enabled = False
+        self.originals = {}
+        # Temps passé dans les phases appelées par chacune des phases en cours, de la plus ancienne à la dernière
+        self.children_times = []
+        self.reset()
+
+    def reset(self):
+        # Pour chaque phase : les dernières durées (en secondes), le nombre d'appels et le temps total
+        self.durations = {name: deque(maxlen=self.window) for name in self.phases}
+        self.counts = dict.fromkeys(self.phases, 0)
+        self.totals = dict.fromkeys(self.phases, 0.0)
+
+    def record(self, name, duration):
+        self.durations[name].append(duration)
+        self.counts[name] += 1
+        self.totals[name] += duration
+
+    def enable(self):
+        if self.enabled:
+            return
+        for name, (owner, method_name) in self.phases.items():
+            original = owner.__dict__[method_name]
+            self.originals[name] = original
+            setattr(owner, method_name, self.wrap(name, original))
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for name, (owner, method_name) in self.phases.items():
+            setattr(owner, method_name, self.originals.pop(name))
+        self.enabled = False
+
+    def wrap(self, name, function):
+        record = self.record
+        clock = time.perf_counter
+        children_times = self.children_times
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            children_times.append(0.0)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                record(name, elapsed - children_times.pop())
+                if children_times:
+                    children_times[-1] += elapsed
+
+        return timed
+
+    def snapshot(self):
+        """
+        Statistiques par phase, en millisecondes (les percentiles portent sur les dernières mesures)
+        """
+        stats = {}
+        for name, durations in self.durations.items():
+            if not durations:
+                continue
+            values = np.array(durations) * 1000
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            stats[name] = {
+                'count': self.counts[name],
+                'total_ms': self.totals[name] * 1000,
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max()),
+            }
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+
+# Instance partagée par l'App
+profiler = Profiler()
+
+
+class StatsOverlay:
+    """
+    Petit texte dans un coin du canvas : images par seconde de la boucle d'affichage et temps par phase
+    """
+
+    def __init__(self, canvas, profiler, loop=None, interval=OVERLAY_INTERVAL):
+        self.canvas = canvas
+        self.profiler = profiler
+        self.loop = loop
+        self.interval = interval
+        self.text = None
+        self.after_id = None
+        self.last_time = None
+        self.last_frames = 0
+        self.last_ticks = 0
+
+    @property
+    def visible(self):
+        return self.after_id is not None
+
+    def show(self):
+        if self.visible:
+            return
+        self.profiler.enable()
+        if self.text is None:
+            self.text = self.canvas.create_text(8, 8, anchor='nw', fill='#A9ACAB', font=('Courier', 9),
+                                                tags="stats_overlay")
+        self.canvas.itemconfig(self.text, state='normal')
+        self.last_time = time.perf_counter()
+        self.last_frames = self.loop.frames if self.loop else 0
+        self.last_ticks = self.loop.ticks if self.loop else 0
+        self.after_id = self.canvas.after(self.interval, self.refresh)
+
+    def hide(self):
+        if not self.visible:
+            return
+        self.canvas.after_cancel(self.after_id)
+        self.after_id = None
+        self.canvas.itemconfig(self.text, state='hidden')
+        self.profiler.disable()
+
+    def toggle(self, event=None):
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def refresh(self):
+        now = time.perf_counter()
+        elapsed = now - self.last_time
+        lines = []
+        if self.loop is not None:
+            fps = (self.loop.frames - self.last_frames) / elapsed
+            tps = (self.loop.ticks - self.last_ticks) / elapsed
+            lines.append("{fps:5.1f} fps  {tps:5.1f} ticks/s  {dropped} dropped".format(
+                fps=fps, tps=tps, dropped=self.loop.dropped_frames))
+            self.last_frames = self.loop.frames
+            self.last_ticks = self.loop.ticks
+        self.last_time = now
+        for name, stats in self.profiler.snapshot().items():
+            lines.append("{name:<18} {mean:6.2f} ms  p95 {p95:6.2f} ms".format(
+                name=name, mean=stats['mean_ms'], p95=stats['p95_ms']))
+        self.canvas.itemconfig(self.text, text="\n".join(lines))
+        self.canvas.tag_raise(self.text)
+        self.after_id = self.canvas.after(self.interval, self.refresh)
@@ -0,0 +1,286 @@
+"""
+Avancement le long du circuit : une ligne médiane est déduite des deux bords (intérieur et extérieur),
+et la position de chaque voiture est projetée dessus pour obtenir la distance parcourue le long de la piste
+"""
+import numpy as np
+
+# Distance entre deux points de la ligne médiane, en pixels
+SAMPLE_SPACING = 5.0
+# Taille des cellules de la grille de recherche, en pixels
+LOOKUP_CELL_SIZE = 8.0
+# Écart maximal toléré entre la ligne médiane simplifiée et la ligne échantillonnée, en pixels
+SIMPLIFY_TOLERANCE = 1.0
+# Écart maximal entre la fin d'un segment et le début du suivant pour les considérer reliés
+LOOP_TOLERANCE = 5.0
+# Sens de déplacement de la voiture au départ (angle 0)
+START_DIRECTION = (0.0, -1.0)
+
+
+def split_loops(segments, tolerance=LOOP_TOLERANCE):
+    """
+    Découpe les segments en boucles fermées de segments consécutifs.
+    Retourne la liste des points de chaque boucle (sans répéter le premier à la fin)
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    loops = []
+    first = 0
+    for index in range(len(segments)):
+        end = segments[index, 2:4]
+        is_last = index == len(segments) - 1
+        if is_last or np.hypot(*(segments[index + 1, 0:2] - end)) > tolerance:
+            if np.hypot(*(segments[first, 0:2] - end)) > tolerance:
+                raise ValueError("Les segments {first} à {last} ne forment pas une boucle fermée".format(
+                    first=first, last=index))
+            loops.append(segments[first:index + 1, 0:2])
+            first = index + 1
+    return loops
+
+
+def resample_loop(points, spacing):
+    """
+    Points régulièrement espacés le long d'une boucle fermée
+    """
+    closed = np.vstack((points, points[:1]))
+    lengths = np.hypot(*np.diff(closed, axis=0).T)
+    cumulative = np.concatenate(([0], np.cumsum(lengths)))
+    count = max(3, int(round(cumulative[-1] / spacing)))
+    distances = np.linspace(0, cumulative[-1], count, endpoint=False)
+    return np.column_stack((np.interp(distances, cumulative, closed[:, 0]),
+                            np.interp(distances, cumulative, closed[:, 1])))
+
+
+def simplify_loop(points, tolerance):
+    """
+    Douglas-Peucker sur une boucle fermée : retire les points à moins de tolerance de la ligne
+    qui joint les points conservés autour d'eux
+    """
+    closed = np.vstack((points, points[:1]))
+    # La boucle est coupée en deux au point le plus éloigné du premier
+    farthest = int(np.hypot(*(closed - closed[0]).T).argmax())
+    keep = np.zeros(len(closed), dtype=bool)
+    keep[[0, farthest, len(closed) - 1]] = True
+    stack = [(0, farthest), (farthest, len(closed) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, direction = closed[first], closed[last] - closed[first]
+        offsets = closed[first + 1:last] - start
+        norm = np.hypot(*direction)
+        if norm > 0:
+            distances = np.abs(offsets[:, 0] * direction[1] - offsets[:, 1] * direction[0]) / norm
+        else:
+            distances = np.hypot(*offsets.T)
+        index = int(distances.argmax())
+        if distances[index] > tolerance:
+            middle = first + 1 + index
+            keep[middle] = True
+            stack.extend(((first, middle), (middle, last)))
+    return closed[:-1][keep[:-1]]
+
+
+def get_closest_points(points, polyline_starts, polyline_ends):
+    """
+    Pour chacun des P points, le point le plus proche sur un ensemble de S segments (P x S calculs)
+    """
+    directions = polyline_ends - polyline_starts
+    squared_lengths = np.maximum((directions ** 2).sum(axis=1), 1e-12)
+    offsets = points[:, None, :] - polyline_starts[None, :, :]
+    t = np.clip((offsets * directions).sum(axis=2) / squared_lengths, 0, 1)
+    closest = polyline_starts + t[:, :, None] * directions
+    distances = ((points[:, None, :] - closest) ** 2).sum(axis=2)
+    nearest = distances.argmin(axis=1)
+    return closest[np.arange(len(points)), nearest]
+
+
+class ProgressIndex:
+    """
+    Ligne médiane fermée d'un circuit à deux bords, avec sa longueur cumulée.
+    project() retourne pour chaque position la distance le long de la ligne médiane depuis le point de départ,
+    entre 0 et length : une grille précalculée donne les quelques segments qui peuvent être les plus proches
+    d'un point de chaque cellule, seuls ceux-ci sont testés, en O(1) par voiture
+    """
+
+    def __init__(self, segments, width, height, start_position, spacing=SAMPLE_SPACING,
+                 cell_size=LOOKUP_CELL_SIZE, simplify_tolerance=SIMPLIFY_TOLERANCE):
+        loops = split_loops(segments)
+        if len(loops) != 2:
+            raise ValueError("Le circuit doit avoir exactement deux bords, {count} trouvés".format(count=len(loops)))
+
+        # Milieu entre chaque point du premier bord et le point le plus proche du second
+        first, second = (resample_loop(loop, spacing) for loop in loops)
+        points = (first + get_closest_points(first, second, np.roll(second, -1, axis=0))) / 2
+        points = simplify_loop(points, simplify_tolerance)
+
+        # La ligne médiane est orientée dans le sens de départ de la voiture
+        start_position = np.asarray(start_position, dtype=float)
+        nearest = np.hypot(*(points - start_position).T).argmin()
+        tangent = points[(nearest + 1) % len(points)] - points[nearest - 1]
+        if np.dot(tangent, START_DIRECTION) < 0:
+            points = points[::-1]
+        self.points = points
+        self.directions = np.roll(points, -1, axis=0) - points
+        self.lengths = np.hypot(*self.directions.T)
+        self.squared_lengths = np.maximum(self.lengths ** 2, 1e-12)
+        self.cumulative = np.concatenate(([0], np.cumsum(self.lengths)))
+        self.length = self.cumulative[-1]
+        self.start_offset = 0.0
+
+        # Pour chaque cellule de la grille, les segments qui peuvent être les plus proches d'un point de la cellule :
+        # ceux à moins de (distance minimale depuis le centre + diagonale de la cellule) de son centre.
+        # Les listes sont complétées en répétant le segment le plus proche, pour former un tableau rectangulaire
+        self.cell_size = float(cell_size)
+        self.columns = int(np.ceil(width / self.cell_size))
+        self.rows = int(np.ceil(height / self.cell_size))
+        column_centers = (np.arange(self.columns) + 0.5) * self.cell_size
+        row_centers = (np.arange(self.rows) + 0.5) * self.cell_size
+        centers = np.stack(np.meshgrid(column_centers, row_centers), axis=-1).reshape(-1, 2)
+        all_segments = np.arange(len(points))
+        chunks = []
+        for chunk in np.array_split(centers, max(1, len(centers) // 1024)):
+            _, distances = self.get_segment_projections(chunk, np.broadcast_to(all_segments, (len(chunk), len(points))))
+            distances = np.sqrt(distances)
+            nearest = distances.argmin(axis=1)
+            reachable = distances <= distances.min(axis=1, keepdims=True) + self.cell_size * np.sqrt(2)
+            # Les segments atteignables d'abord, par distance croissante
+            order = np.argsort(np.where(reachable, distances, np.inf), axis=1, kind='stable')
+            chunks.append((order, reachable.sum(axis=1), nearest))
+        width = max(count.max() for _, count, _ in chunks)
+        self.candidate_counts = np.concatenate([count for _, count, _ in chunks])
+        self.cell_candidates = np.concatenate([
+            np.where(np.arange(width) < count[:, None], order[:, :width], nearest[:, None])
+            for order, count, nearest in chunks])
+
+        self.start_offset = self.project(start_position)[0][0]
+
+    def get_segment_projections(self, positions, candidates):
+        """
+        Projection de chaque position sur ses segments candidats (tableau P x C d'indices) :
+        retourne les paramètres t dans [0, 1] et les carrés des distances
+        """
+        starts = self.points[candidates]
+        directions = self.directions[candidates]
+        offsets = positions[:, None, :] - starts
+        t = np.clip((offsets * directions).sum(axis=2) / self.squared_lengths[candidates], 0, 1)
+        differences = offsets - t[:, :, None] * directions
+        return t, (differences ** 2).sum(axis=2)
+
+    def project(self, positions):
+        """
+        Retourne (distances le long de la ligne médiane depuis le départ, distances à la ligne médiane)
+        pour un tableau de positions P x 2
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        columns = np.clip((positions[:, 0] // self.cell_size).astype(np.int64), 0, self.columns - 1)
+        rows = np.clip((positions[:, 1] // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        cells = rows * self.columns + columns
+        # Seules les colonnes utiles aux cellules interrogées sont testées
+        candidates = self.cell_candidates[cells, :self.candidate_counts[cells].max(initial=1)]
+        t, distances = self.get_segment_projections(positions, candidates)
+        best = distances.argmin(axis=1)
+        rows_index = np.arange(len(positions))
+        segments = candidates[rows_index, best]
+        arc = self.cumulative[segments] + t[rows_index, best] * self.lengths[segments]
+        return (arc - self.start_offset) % self.length, np.sqrt(distances[rows_index, best])
+
+    def get_points(self, distances):
+        """
+        Inverse de project() : positions sur la ligne médiane aux distances données depuis le départ
+        (recherche dichotomique dans les longueurs cumulées)
+        """
+        arc = (np.asarray(distances, dtype=float) + self.start_offset) % self.length
+        segments = np.clip(np.searchsorted(self.cumulative, arc, side='right') - 1, 0, len(self.points) - 1)
+        t = (arc - self.cumulative[segments]) / np.maximum(self.lengths[segments], 1e-12)
+        return self.points[segments] + t[..., None] * self.directions[segments]
+
+
+class ProgressTracker:
+    """
+    Avancement cumulé de N voitures, tours compris : la distance le long de la piste est « déroulée »
+    d'un pas à l'autre, un passage par la ligne de départ ajoutant ou retirant un tour
+    """
+
+    def __init__(self, index, size):
+        self.index = index
+        self.size = size
+        self.progress = np.zeros(size)
+        self.best_progress = np.zeros(size)
+        self.positions = np.zeros(size)
+
+    def reset(self, centers, indices=None):
+        if indices is None:
+            indices = slice(None)
+        self.positions[indices] = self.index.project(centers)[0]
+        # Une voiture qui démarre un peu en avant ou en arrière de la ligne a un avancement proche de 0
+        half = self.index.length / 2
+        self.progress[indices] = (self.positions[indices] + half) % self.index.length - half
+        self.best_progress[indices] = self.progress[indices]
+
+    def update(self, centers):
+        """
+        Met à jour l'avancement à partir des nouvelles positions ; une voiture ne parcourt jamais
+        plus d'une demi-longueur de circuit en un pas
+        """
+        positions, _ = self.index.project(centers)
+        half = self.index.length / 2
+        self.progress += (positions - self.positions + half) % self.index.length - half
+        self.positions = positions
+        np.maximum(self.best_progress, self.progress, out=self.best_progress)
+        return self.progress
+
+    @property
+    def laps(self):
+        return np.floor_divide(self.progress, self.index.length).astype(np.int64)
+
+
+class DistanceTracker:
+    """
+    Même interface que ProgressTracker pour les circuits sans ligne médiane (pas exactement deux bords fermés) :
+    l'avancement est la distance parcourue, comme avant la ligne médiane. Les positions le long de la piste
+    n'ont pas de sens et restent à 0 ; les centres du pas précédent sont gardés dans centers
+    """
+
+    def __init__(self, size):
+        self.index = None
+        self.size = size
+        self.progress = np.zeros(size)
+        self.best_progress = np.zeros(size)
+        self.positions = np.zeros(size)
+        self.centers = np.zeros((size, 2))
+
+    def reset(self, centers, indices=None):
+        if indices is None:
+            indices = slice(None)
+        self.centers[indices] = np.asarray(centers, dtype=float).reshape(-1, 2)
+        self.progress[indices] = 0
+        self.best_progress[indices] = 0
+
+    def update(self, centers):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        self.progress += np.hypot(*(centers - self.centers).T)
+        self.centers[:] = centers
+        np.maximum(self.best_progress, self.progress, out=self.best_progress)
+        return self.progress
+
+    @property
+    def laps(self):
+        return np.zeros(self.size, dtype=np.int64)
+
+
+def find_progress_index(track):
+    """
+    Ligne médiane du circuit, ou None s'il n'a pas exactement deux bords fermés (circuit dessiné à la main)
+    """
+    try:
+        return track.get_progress_index()
+    except ValueError:
+        return None
+
+
+def create_progress_tracker(index, size):
+    """
+    ProgressTracker le long de la ligne médiane index, ou DistanceTracker si le circuit n'en a pas (index None)
+    """
+    if index is None:
+        return DistanceTracker(size)
+    return ProgressTracker(index, size)
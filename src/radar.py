@@ -0,0 +1,96 @@
+"""
+Radar de la voiture : un ensemble de faisceaux définis par leur angle et une portée maximale
+"""
+import numpy as np
+from src.raycast import cast_rays, cast_ray_pairs
+
+# Angles des faisceaux, en degrés par rapport à l'avant de la voiture (négatif = à gauche), de gauche à droite :
+# gauche, diagonale gauche, centre, diagonale droite, droite
+DEFAULT_BEAM_ANGLES = (-90, -45, 0, 45, 90)
+# Portée maximale d'un faisceau, en pixels
+DEFAULT_MAX_RANGE = 400
+# Nombre de couples rayon x segment visé par paquet de rayons, pour borner la mémoire
+MAX_PAIRS_PER_CHUNK = 1000000
+
+
+class Radar:
+    """
+    Par défaut, les distances sont calculées par lancer de rayons contre les segments des cellules traversées.
+    Avec field_resolution, les faisceaux avancent dans le champ de distance du circuit à cette résolution :
+    coût presque indépendant du nombre de segments, rentable pour les circuits de plusieurs milliers de segments ;
+    un impact dans un coin plus étroit que la résolution peut être manqué
+    """
+
+    def __init__(self, beam_angles=DEFAULT_BEAM_ANGLES, max_range=DEFAULT_MAX_RANGE, field_resolution=None):
+        self.beam_angles = np.asarray(beam_angles, dtype=float)
+        self.max_range = float(max_range)
+        self.field_resolution = field_resolution
+
+    @property
+    def beam_count(self):
+        return len(self.beam_angles)
+
+    def get_rays(self, origins, angles):
+        """
+        Construit les faisceaux (ox, oy, ex, ey) de N voitures à partir de leur centre et de leur angle.
+        L'avant d'une voiture d'angle a pointe vers Vector2(0, -1).rotate(a) = (sin a, -cos a).
+        Retourne un tableau N x B x 4
+        """
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        angles = np.asarray(angles, dtype=float).reshape(-1)
+        beam_angles = np.radians(angles[:, None] + self.beam_angles)
+        rays = np.empty((len(origins), self.beam_count, 4))
+        rays[:, :, 0] = origins[:, 0:1]
+        rays[:, :, 1] = origins[:, 1:2]
+        rays[:, :, 2] = origins[:, 0:1] + self.max_range * np.sin(beam_angles)
+        rays[:, :, 3] = origins[:, 1:2] - self.max_range * np.cos(beam_angles)
+        return rays
+
+    def sense(self, origins, angles, track):
+        """
+        Mesure les distances au circuit de chaque faisceau, pour N voitures à la fois.
+        Un faisceau qui ne touche rien renvoie la portée maximale et son extrémité.
+        Retourne (distances N x B, points N x B x 2, indices N x B des segments touchés ou -1)
+        """
+        rays = self.get_rays(origins, angles)
+        shape = rays.shape[:2]
+        rays = rays.reshape(-1, 4)
+        if self.field_resolution is not None:
+            distances, points, indices = track.get_distance_field(self.field_resolution).trace(rays)
+        else:
+            distances, points, indices = self.cast(rays, track)
+
+        missed = indices < 0
+        distances[missed] = self.max_range
+        points[missed] = rays[missed, 2:4]
+        return distances.reshape(shape), points.reshape(shape + (2,)), indices.reshape(shape)
+
+    def cast(self, rays, track):
+        """
+        Lancer de rayons exact : chaque faisceau n'est testé que contre les segments des cellules
+        qu'il traverse lui-même
+        """
+        compiled_track = track.compile()
+        return cast_rays_indexed(rays, compiled_track.segments, compiled_track.spatial_index, self.max_range,
+                                 compiled_track.directions)
+
+
+def cast_rays_indexed(rays, segments, spatial_index, max_length, segment_directions=None):
+    """
+    cast_rays() restreint, rayon par rayon, aux couples (rayon, segment) candidats de l'index spatial,
+    ou contre tous les segments pour les petites requêtes. Les rayons sont traités par paquets
+    d'environ MAX_PAIRS_PER_CHUNK couples
+    """
+    distances = np.empty(len(rays))
+    points = np.empty((len(rays), 2))
+    indices = np.empty(len(rays), dtype=np.int64)
+    chunk = max(1, MAX_PAIRS_PER_CHUNK // max(spatial_index.estimate_ray_candidates(max_length), 1))
+    for start in range(0, len(rays), chunk):
+        chunk_rays = rays[start:start + chunk]
+        if spatial_index.is_brute_force(len(chunk_rays)):
+            results = cast_rays(chunk_rays, segments, segment_directions)
+        else:
+            ray_indices, segment_indices = spatial_index.query_ray_pairs(chunk_rays)
+            results = cast_ray_pairs(chunk_rays, ray_indices, segments[segment_indices], segment_indices)
+        distances[start:start + chunk], points[start:start + chunk], indices[start:start + chunk] = results
+    return distances, points, indices
@@ -0,0 +1,193 @@
+"""
+Cache de cohérence temporelle du radar : d'un pas à l'autre, la voiture ne bouge que de quelques pixels
+et chaque faisceau touche presque toujours le même segment (ou l'un de ses voisins).
+
+Lors d'une recherche complète, on retient pour chaque faisceau son segment touché et son « dégagement » :
+la distance entre le tronçon utile du faisceau (de l'origine au point d'impact, ou jusqu'à sa portée)
+et tous les autres segments, hors voisinage. Aux pas suivants, seul le voisinage est testé ; le résultat
+est prouvé exact si les deux extrémités du nouveau tronçon sont à moins du dégagement de celles du tronçon
+de référence : tout point du nouveau tronçon est alors à moins du dégagement de l'ancien, aucun autre segment
+ne peut le couper. Sinon, le faisceau repasse par la recherche complète
+"""
+import numpy as np
+from src.raycast import get_pairwise_intersection_parameters
+from src.spatial_index import UniformGrid
+
+# Segments testés de part et d'autre du segment touché (les segments consécutifs d'un circuit sont reliés)
+NEIGHBORHOOD = 1
+# Dégagement maximal recherché autour d'un faisceau, en pixels : au-delà, la recherche coûterait plus
+# qu'elle ne ferait gagner de pas
+MAX_CLEARANCE = 16.0
+# En dessous, tester tous les segments coûte moins cher que de tenir le cache à jour
+MIN_CACHED_SEGMENTS = 128
+MIN_CACHED_PAIRS = 4096
+
+
+def get_point_distances(points, segments):
+    """
+    Distances entre les couples point i / segment i (tableaux K x 2 et K x 4)
+    """
+    starts = segments[:, 0:2]
+    directions = segments[:, 2:4] - starts
+    offsets = points - starts
+    t = np.clip((offsets * directions).sum(axis=1) / np.maximum((directions ** 2).sum(axis=1), 1e-12), 0, 1)
+    return np.hypot(*(offsets - t[:, None] * directions).T)
+
+
+def get_segment_distances(lines, segments):
+    """
+    Distances entre les couples ligne i / segment i (tableaux K x 4), nulles pour les couples qui se coupent
+    """
+    _, crossing = get_pairwise_intersection_parameters(lines, segments)
+    distances = np.minimum.reduce([
+        get_point_distances(lines[:, 0:2], segments),
+        get_point_distances(lines[:, 2:4], segments),
+        get_point_distances(segments[:, 0:2], lines),
+        get_point_distances(segments[:, 2:4], lines),
+    ])
+    return np.where(crossing, 0.0, distances)
+
+
+class RadarCache:
+    """
+    Même contrat que Radar.sense(), pour un nombre fixe de voitures : les N x B faisceaux gardent leur état
+    d'un appel à l'autre. Le cache est vidé quand le circuit change ou que le nombre de faisceaux change
+    """
+
+    def __init__(self, radar, neighborhood=NEIGHBORHOOD, max_clearance=MAX_CLEARANCE):
+        self.radar = radar
+        self.neighborhood = neighborhood
+        self.max_clearance = max_clearance
+        self.compiled_track = None
+        self.spatial_index = None
+        # État de référence de chaque faisceau : segment touché (-1 : aucun), extrémités du tronçon, dégagement
+        self.hit_segments = np.empty(0, dtype=np.int64)
+        self.reference_lines = np.empty((0, 4))
+        self.clearances = np.empty(0)
+        # Faisceaux résolus par le cache ou par une recherche complète, depuis la création
+        self.cache_hits = 0
+        self.full_queries = 0
+
+    def reset(self, compiled_track=None, ray_count=0, width=0, height=0):
+        if compiled_track is not self.compiled_track:
+            # Les boîtes des dégagements sont petites devant la zone de jeu : la grille est rentable
+            # même pour les circuits qu'elle laisse d'habitude tester en entier
+            self.spatial_index = UniformGrid(compiled_track.segments, width, height, brute_force_threshold=0) \
+                if compiled_track is not None else None
+        self.compiled_track = compiled_track
+        self.hit_segments = np.full(ray_count, -1, dtype=np.int64)
+        self.reference_lines = np.zeros((ray_count, 4))
+        # Dégagement négatif : aucune preuve possible avant la première recherche complète
+        self.clearances = np.full(ray_count, -1.0)
+
+    @property
+    def beam_count(self):
+        return self.radar.beam_count
+
+    @property
+    def max_range(self):
+        return self.radar.max_range
+
+    def get_neighborhoods(self, hit_segments):
+        offsets = np.arange(-self.neighborhood, self.neighborhood + 1)
+        return (hit_segments[:, None] + offsets) % len(self.compiled_track.segments)
+
+    def sense(self, origins, angles, track):
+        compiled_track = track.compile()
+        segment_count = len(compiled_track.segments)
+        ray_count = np.asarray(origins).size // 2 * self.radar.beam_count
+        # Le champ de distance a déjà un coût indépendant du circuit
+        if self.radar.field_resolution is not None or segment_count < MIN_CACHED_SEGMENTS or \
+                ray_count * segment_count < MIN_CACHED_PAIRS:
+            return self.radar.sense(origins, angles, track)
+        rays = self.radar.get_rays(origins, angles)
+        shape = rays.shape[:2]
+        rays = rays.reshape(-1, 4)
+        if compiled_track is not self.compiled_track or len(rays) != len(self.hit_segments):
+            self.reset(compiled_track, len(rays), track.width, track.height)
+
+        distances = np.full(len(rays), self.radar.max_range)
+        points = rays[:, 2:4].copy()
+        indices = np.full(len(rays), -1)
+        proven = np.zeros(len(rays), dtype=bool)
+
+        # Faisceaux qui touchaient un segment : seul son voisinage est testé
+        cached = np.flatnonzero((self.clearances >= 0) & (self.hit_segments >= 0))
+        if len(cached):
+            neighborhoods = self.get_neighborhoods(self.hit_segments[cached])
+            pairs = np.repeat(rays[cached], neighborhoods.shape[1], axis=0)
+            t, hit = get_pairwise_intersection_parameters(pairs, compiled_track.segments[neighborhoods.ravel()])
+            t = np.where(hit, t, np.inf).reshape(neighborhoods.shape)
+            closest = t.argmin(axis=1)
+            closest_t = t[np.arange(len(cached)), closest]
+            has_hit = np.isfinite(closest_t)
+            cached, closest, closest_t = cached[has_hit], closest[has_hit], closest_t[has_hit]
+            points[cached] = rays[cached, 0:2] + closest_t[:, None] * (rays[cached, 2:4] - rays[cached, 0:2])
+            distances[cached] = closest_t * self.radar.max_range
+            indices[cached] = neighborhoods[has_hit][np.arange(len(cached)), closest]
+            proven[cached] = True
+        # Faisceaux qui ne touchaient rien : le nouveau tronçon est le faisceau entier
+        proven |= (self.clearances >= 0) & (self.hit_segments < 0)
+
+        # Preuve : chaque extrémité du nouveau tronçon s'est déplacée de moins que le dégagement
+        checked = np.flatnonzero(proven)
+        lines = np.hstack((rays[checked, 0:2], points[checked]))
+        displacements = np.maximum(
+            np.hypot(*(lines[:, 0:2] - self.reference_lines[checked, 0:2]).T),
+            np.hypot(*(lines[:, 2:4] - self.reference_lines[checked, 2:4]).T))
+        proven[checked] = displacements < self.clearances[checked]
+
+        failed = np.flatnonzero(~proven)
+        self.cache_hits += len(rays) - len(failed)
+        self.full_queries += len(failed)
+        if len(failed):
+            failed_distances, failed_points, failed_indices = self.radar.cast(rays[failed], track)
+            hit = failed_indices >= 0
+            distances[failed[hit]] = failed_distances[hit]
+            points[failed[hit]] = failed_points[hit]
+            indices[failed] = failed_indices
+            self.refresh(failed, rays[failed, 0:2], points[failed], failed_indices)
+        return distances.reshape(shape), points.reshape(shape + (2,)), indices.reshape(shape)
+
+    def refresh(self, rows, origins, ends, hit_segments):
+        """
+        Nouvelle référence pour les faisceaux rows : dégagement entre leur tronçon et les segments proches
+        hors voisinage du segment touché, borné par max_clearance
+        """
+        lines = np.hstack((origins, ends))
+        self.reference_lines[rows] = lines
+        self.hit_segments[rows] = hit_segments
+        clearances = np.full(len(rows), self.max_clearance)
+
+        # Les tronçons sont découpés en morceaux de longueur au plus 2 * max_clearance : la boîte englobante
+        # d'un faisceau en diagonale couvrirait sinon une grande partie de la zone de jeu
+        margin = self.max_clearance
+        lengths = np.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1])
+        piece_counts = np.maximum(1, np.ceil(lengths / (2 * margin)).astype(np.int64))
+        piece_owners = np.repeat(np.arange(len(lines)), piece_counts)
+        piece_ranks = np.arange(len(piece_owners)) - np.repeat(np.cumsum(piece_counts) - piece_counts, piece_counts)
+        starts = piece_ranks / piece_counts[piece_owners]
+        ends = (piece_ranks + 1) / piece_counts[piece_owners]
+        directions = lines[piece_owners, 2:4] - lines[piece_owners, 0:2]
+        first = lines[piece_owners, 0:2] + starts[:, None] * directions
+        last = lines[piece_owners, 0:2] + ends[:, None] * directions
+        boxes = np.hstack((np.minimum(first, last) - margin, np.maximum(first, last) + margin))
+        pieces, segments = self.spatial_index.query_boxes(boxes)
+        owners = piece_owners[pieces]
+        # Le voisinage du segment touché est testé exactement à chaque pas : il ne compte pas dans le dégagement
+        has_hit = hit_segments[owners] >= 0
+        segment_count = len(self.compiled_track.segments)
+        gaps = np.abs(segments - hit_segments[owners])
+        in_neighborhood = has_hit & (np.minimum(gaps, segment_count - gaps) <= self.neighborhood)
+        owners, segments = owners[~in_neighborhood], segments[~in_neighborhood]
+        # Tri grossier : un segment dont le milieu est à plus de max_clearance + sa demi-longueur
+        # de la ligne ne peut pas réduire le dégagement
+        track_segments = self.compiled_track.segments[segments]
+        middles = (track_segments[:, 0:2] + track_segments[:, 2:4]) / 2
+        half_lengths = np.hypot(*(track_segments[:, 2:4] - track_segments[:, 0:2]).T) / 2
+        near = get_point_distances(middles, lines[owners]) - half_lengths < self.max_clearance
+        owners, segments = owners[near], segments[near]
+        if len(owners):
+            distances = get_segment_distances(lines[owners], self.compiled_track.segments[segments])
+            np.minimum.at(clearances, owners, distances)
+        self.clearances[rows] = clearances
@@ -0,0 +1,170 @@
+"""
+Calcul vectorisé des intersections entre des rayons et les segments du circuit
+"""
+import numpy as np
+
+
+def get_intersection_parameters(rays, segments, segment_directions=None):
+    """
+    Retourne la matrice R x S des paramètres t le long des rayons, et le masque des couples qui se coupent.
+    Les vecteurs directeurs des segments peuvent être fournis s'ils sont déjà calculés (CompiledTrack)
+    """
+    origin_x = rays[:, 0:1]
+    origin_y = rays[:, 1:2]
+    ray_dx = rays[:, 2:3] - origin_x
+    ray_dy = rays[:, 3:4] - origin_y
+    if segment_directions is None:
+        segment_directions = segments[:, 2:4] - segments[:, 0:2]
+    segment_dx = segment_directions[:, 0]
+    segment_dy = segment_directions[:, 1]
+
+    denominator = ray_dx * segment_dy - ray_dy * segment_dx
+    offset_x = segments[:, 0] - origin_x
+    offset_y = segments[:, 1] - origin_y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (offset_x * segment_dy - offset_y * segment_dx) / denominator
+        u = (offset_x * ray_dy - offset_y * ray_dx) / denominator
+
+    # Les segments parallèles (dénominateur nul) donnent des t/u infinis ou nan et sont donc exclus
+    hit = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    return t, hit
+
+
+def get_pairwise_intersection_parameters(lines, segments):
+    """
+    Comme get_intersection_parameters(), mais teste les couples ligne i / segment i (tableaux de même taille)
+    au lieu de toutes les combinaisons
+    """
+    line_dx = lines[:, 2] - lines[:, 0]
+    line_dy = lines[:, 3] - lines[:, 1]
+    segment_dx = segments[:, 2] - segments[:, 0]
+    segment_dy = segments[:, 3] - segments[:, 1]
+
+    denominator = line_dx * segment_dy - line_dy * segment_dx
+    offset_x = segments[:, 0] - lines[:, 0]
+    offset_y = segments[:, 1] - lines[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (offset_x * segment_dy - offset_y * segment_dx) / denominator
+        u = (offset_x * line_dy - offset_y * line_dx) / denominator
+
+    hit = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    return t, hit
+
+
+def cast_rays(rays, segments, segment_directions=None):
+    """
+    Pour chacun des R rayons (ox, oy, ex, ey), cherche le point d'intersection le plus proche
+    de son origine parmi les S segments (ax, ay, bx, by), en une seule passe.
+
+    Avec le rayon o + t * (e - o) et le segment a + u * (b - a), il y a intersection si
+    0 <= t <= 1 et 0 <= u <= 1 ; le point le plus proche est celui de plus petit t.
+
+    Retourne (distances, points, indices) :
+    - distances : R distances entre l'origine et le point le plus proche (inf si aucun)
+    - points : tableau R x 2 des points les plus proches (nan si aucun)
+    - indices : R indices du segment touché (-1 si aucun)
+    """
+    rays = np.asarray(rays, dtype=float).reshape(-1, 4)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    ray_count = len(rays)
+    distances = np.full(ray_count, np.inf)
+    points = np.full((ray_count, 2), np.nan)
+    indices = np.full(ray_count, -1)
+    if ray_count == 0 or len(segments) == 0:
+        return distances, points, indices
+
+    t, hit = get_intersection_parameters(rays, segments, segment_directions)
+    t = np.where(hit, t, np.inf)
+
+    closest = np.argmin(t, axis=1)
+    closest_t = t[np.arange(ray_count), closest]
+    has_hit = np.isfinite(closest_t)
+
+    ray_dx = rays[:, 2] - rays[:, 0]
+    ray_dy = rays[:, 3] - rays[:, 1]
+    distances[has_hit] = closest_t[has_hit] * np.hypot(ray_dx[has_hit], ray_dy[has_hit])
+    points[has_hit, 0] = rays[has_hit, 0] + closest_t[has_hit] * ray_dx[has_hit]
+    points[has_hit, 1] = rays[has_hit, 1] + closest_t[has_hit] * ray_dy[has_hit]
+    indices[has_hit] = closest[has_hit]
+    return distances, points, indices
+
+
+def get_run_starts(values):
+    """
+    Indices des débuts de séries de valeurs égales dans un tableau trié (ou groupé)
+    """
+    return np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+
+
+def cast_ray_pairs(rays, ray_indices, segments, segment_indices):
+    """
+    Comme cast_rays(), mais chaque rayon n'est testé que contre ses propres candidats : les couples
+    rayon ray_indices[k] / segment segment_indices[k], segments[k] étant les coordonnées de ce segment.
+    Les couples doivent être triés par rayon puis par segment : à distance égale, le segment de plus petit
+    indice l'emporte, comme avec cast_rays().
+    Retourne (distances, points, indices), les indices étant ceux de segment_indices
+    """
+    rays = np.asarray(rays, dtype=float).reshape(-1, 4)
+    ray_count = len(rays)
+    distances = np.full(ray_count, np.inf)
+    points = np.full((ray_count, 2), np.nan)
+    indices = np.full(ray_count, -1)
+    if ray_count == 0 or len(ray_indices) == 0:
+        return distances, points, indices
+
+    t, hit = get_pairwise_intersection_parameters(rays[ray_indices], segments)
+    t = np.where(hit, t, np.inf)
+    # Plus petit t de chaque rayon, puis premier couple qui l'atteint
+    starts = get_run_starts(ray_indices)
+    groups = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(t))))
+    closest_t = np.minimum.reduceat(t, starts)
+    candidates = np.flatnonzero((t == closest_t[groups]) & np.isfinite(t))
+    closest = candidates[get_run_starts(groups[candidates])]
+    hit_rays = ray_indices[closest]
+    closest_t = t[closest]
+
+    ray_dx = rays[hit_rays, 2] - rays[hit_rays, 0]
+    ray_dy = rays[hit_rays, 3] - rays[hit_rays, 1]
+    distances[hit_rays] = closest_t * np.hypot(ray_dx, ray_dy)
+    points[hit_rays, 0] = rays[hit_rays, 0] + closest_t * ray_dx
+    points[hit_rays, 1] = rays[hit_rays, 1] + closest_t * ray_dy
+    indices[hit_rays] = segment_indices[closest]
+    return distances, points, indices
+
+
+def find_intersections(lines, segments):
+    """
+    Retourne tous les points d'intersection entre des lignes et des segments (pas seulement le plus proche)
+    sous forme de tableau K x 2
+    """
+    lines = np.asarray(lines, dtype=float).reshape(-1, 4)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    if len(lines) == 0 or len(segments) == 0:
+        return np.empty((0, 2))
+    t, hit = get_intersection_parameters(lines, segments)
+    line_indices, _ = np.nonzero(hit)
+    t = t[hit]
+    origins = lines[line_indices, 0:2]
+    return origins + t[:, None] * (lines[line_indices, 2:4] - origins)
+
+
+def cast_rays_reference(rays, segments):
+    """
+    Implémentation de référence de cast_rays() basée sur shapely, segment par segment.
+    Beaucoup plus lente, elle ne sert qu'à valider le noyau vectorisé
+    """
+    from src.utils import get_segments_intersection_point
+
+    distances, points, indices = [], [], []
+    for ray in rays:
+        closest = (np.inf, [np.nan, np.nan], -1)
+        for index, segment in enumerate(segments):
+            intersection_point = get_segments_intersection_point(ray, segment)
+            if intersection_point:
+                distance = np.hypot(intersection_point[0] - ray[0], intersection_point[1] - ray[1])
+                if distance < closest[0]:
+                    closest = (distance, intersection_point, index)
+        distances.append(closest[0])
+        points.append(closest[1])
+        indices.append(closest[2])
+    return np.array(distances), np.array(points, dtype=float).reshape(-1, 2), np.array(indices)
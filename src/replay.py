@@ -0,0 +1,98 @@
+"""
+Relecture d'une trajectoire enregistrée dans le canvas, sans physique ni lancer de rayons
+"""
+from src.trajectory import load_trajectory
+
+# Vitesses de relecture disponibles, en pas enregistrés par pas de la boucle
+MIN_SPEED = 1 / 8
+MAX_SPEED = 64
+# Pas enregistrés sautés par une avance ou un retour rapide
+SEEK_STEP = 100
+
+
+class Replay:
+    """
+    Avance dans la trajectoire au rythme de la boucle de l'App et place la voiture à chaque pas (Car.set_pose).
+    La position est fractionnaire pour les vitesses inférieures à 1
+    """
+
+    def __init__(self, car, trajectory, canvas=None):
+        if len(trajectory) == 0:
+            # Par exemple un enregistrement arrêté avant le premier pas
+            raise ValueError("La trajectoire ne contient aucun pas à relire")
+        self.car = car
+        self.trajectory = trajectory
+        self.canvas = canvas
+        self.position = 0.0
+        self.speed = 1.0
+        self.paused = False
+        self.status_item = None
+        self.show(0, interpolate=False)
+
+    @classmethod
+    def from_file(cls, car, file_path, canvas=None):
+        return cls(car, load_trajectory(file_path), canvas)
+
+    @property
+    def tick(self):
+        return int(self.position)
+
+    @property
+    def is_finished(self):
+        return self.tick >= len(self.trajectory) - 1
+
+    def show(self, tick, interpolate=True):
+        row = self.trajectory.data[tick]
+        self.car.set_pose(row[0:2], row[2], self.trajectory.radar_distances[tick], self.trajectory.crashed[tick],
+                          interpolate)
+
+    def update(self, step_dt=None):
+        """
+        Appelé à chaque pas de la boucle, à la place de Car.update()
+        """
+        if self.paused or self.is_finished:
+            # La voiture reste immobile : plus rien à interpoler
+            self.show(self.tick, interpolate=False)
+            return
+        self.position = min(self.position + self.speed, len(self.trajectory) - 1)
+        self.show(self.tick)
+
+    def render(self, alpha=1.0):
+        self.car.render(alpha)
+        if self.canvas is not None:
+            self.draw_status()
+
+    def seek(self, ticks):
+        self.position = min(max(self.position + ticks, 0), len(self.trajectory) - 1)
+        self.show(self.tick, interpolate=False)
+
+    def forward(self, event=None):
+        self.seek(SEEK_STEP)
+
+    def backward(self, event=None):
+        self.seek(-SEEK_STEP)
+
+    def restart(self, event=None):
+        self.seek(-len(self.trajectory))
+
+    def faster(self, event=None):
+        self.speed = min(self.speed * 2, MAX_SPEED)
+
+    def slower(self, event=None):
+        self.speed = max(self.speed / 2, MIN_SPEED)
+
+    def toggle_pause(self, event=None):
+        self.paused = not self.paused
+
+    def draw_status(self):
+        if self.status_item is None:
+            self.status_item = self.canvas.create_text(self.car.track.width - 8, 8, anchor='ne', fill='#A9ACAB',
+                                                       font=('Courier', 9), tags="replay_status")
+        state = "pause" if self.paused else "x{speed:g}".format(speed=self.speed)
+        self.canvas.itemconfig(self.status_item, text="Relecture {tick}/{count}  {state}".format(
+            tick=self.tick + 1, count=len(self.trajectory), state=state))
+
+    def close(self):
+        if self.status_item is not None:
+            self.canvas.delete(self.status_item)
+            self.status_item = None
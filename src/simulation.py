@@ -0,0 +1,53 @@
+"""
+Boucle de simulation headless : fait avancer les voitures sur un circuit sans aucun affichage
+"""
+from src.car import Car, dt
+from src.track import Track
+
+
+class Simulation:
+
+    def __init__(self, track=None, stop_on_crash=True):
+        self.track = track if track is not None else Track()
+        # Une voiture qui a touché le circuit n'est plus mise à jour
+        self.stop_on_crash = stop_on_crash
+        self.cars = []
+        self.tick = 0
+        self.time = 0.0
+
+    def add_car(self, car=None):
+        if car is None:
+            car = Car(track=self.track)
+        self.cars.append(car)
+        return car
+
+    def step(self, step_dt=dt):
+        """
+        Fait avancer toutes les voitures d'un pas de temps
+        """
+        for car in self.cars:
+            if not (self.stop_on_crash and car.crashed):
+                car.update(step_dt)
+        self.tick += 1
+        self.time += step_dt
+
+    def run(self, steps, step_dt=dt):
+        """
+        Fait avancer la simulation d'au plus steps pas, en s'arrêtant dès que toutes les voitures se sont écrasées
+        """
+        for _ in range(steps):
+            if self.is_over():
+                break
+            self.step(step_dt)
+
+    def is_over(self):
+        """
+        La simulation est terminée quand toutes les voitures se sont écrasées
+        """
+        return self.stop_on_crash and all(car.crashed for car in self.cars)
+
+    def reset(self):
+        for car in self.cars:
+            car.reset()
+        self.tick = 0
+        self.time = 0.0
@@ -0,0 +1,219 @@
+"""
+Instantanés de l'état d'une simulation, pour la reprendre ou la dupliquer sans la rejouer depuis le départ.
+
+L'état de chaque voiture (cinématique, collision, avancement, distances du radar) est une ligne d'un tableau
+float64 N x C : capturer, restaurer ou dupliquer 1000 voitures revient à copier un bloc de mémoire.
+L'horloge (compteur de pas et temps simulé) et l'état du générateur aléatoire sont communs à toutes les lignes
+"""
+import json
+import struct
+import numpy as np
+
+MAGIC = b'RCSTATE\0'
+FORMAT_VERSION = 2
+# signature, version, nombre de voitures, nombre de faisceaux, compteur de pas, temps simulé,
+# taille de l'état aléatoire
+HEADER = struct.Struct('<8sIIIQdI')
+# Colonnes fixes d'une ligne, suivies des distances du radar
+COLUMNS = ('x', 'y', 'velocity', 'angle', 'steering', 'acceleration', 'crashed', 'contact_x', 'contact_y',
+           'progress', 'best_progress', 'track_position')
+CENTER = slice(0, 2)
+VELOCITY, ANGLE, STEERING, ACCELERATION, CRASHED = 2, 3, 4, 5, 6
+CONTACT = slice(7, 9)
+PROGRESS, BEST_PROGRESS, TRACK_POSITION = 9, 10, 11
+
+
+def get_column_count(beam_count):
+    return len(COLUMNS) + beam_count
+
+
+class SimulationState:
+    """
+    data est le tableau N x C des états des voitures. Les colonnes d'avancement valent nan si aucun
+    ProgressTracker n'a été capturé, celles du radar si les distances n'étaient pas connues (Population)
+    """
+
+    def __init__(self, data, beam_count, tick=0, rng_state=None, time=0.0):
+        self.data = data
+        self.beam_count = beam_count
+        self.tick = tick
+        self.rng_state = rng_state
+        self.time = time
+
+    @classmethod
+    def empty(cls, size, beam_count=0, tick=0, rng=None, time=0.0):
+        data = np.full((size, get_column_count(beam_count)), np.nan)
+        return cls(data, beam_count, tick, get_rng_state(rng), time)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def radar_distances(self):
+        return self.data[:, len(COLUMNS):]
+
+    def copy(self):
+        return SimulationState(self.data.copy(), self.beam_count, self.tick, self.rng_state, self.time)
+
+    def select(self, indices):
+        return SimulationState(self.data[indices], self.beam_count, self.tick, self.rng_state, self.time)
+
+    def fork(self, repeats):
+        """
+        Duplique chaque état repeats fois (un entier, ou un nombre de copies par état) : les copies de
+        l'état i sont consécutives. Toutes partagent la même horloge et le même état aléatoire
+        """
+        return SimulationState(np.repeat(self.data, repeats, axis=0), self.beam_count, self.tick, self.rng_state,
+                               self.time)
+
+    def to_bytes(self):
+        """
+        Sérialisation compacte, par exemple pour envoyer l'état à un autre processus
+        """
+        rng_bytes = json.dumps(self.rng_state).encode('utf-8') if self.rng_state is not None else b''
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(self.data), self.beam_count, self.tick, self.time,
+                             len(rng_bytes))
+        return header + rng_bytes + np.ascontiguousarray(self.data, dtype='<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, content):
+        magic, version, size, beam_count, tick, time, rng_size = HEADER.unpack_from(content)
+        if magic != MAGIC:
+            raise ValueError("Ces données ne sont pas un état de simulation")
+        if version != FORMAT_VERSION:
+            raise ValueError("Version de format {version} non supportée".format(version=version))
+        offset = HEADER.size
+        rng_state = json.loads(content[offset:offset + rng_size].decode('utf-8')) if rng_size else None
+        offset += rng_size
+        data = np.frombuffer(content, dtype='<f8', count=size * get_column_count(beam_count), offset=offset)
+        return cls(data.reshape(size, -1).copy(), beam_count, tick, rng_state, time)
+
+
+def get_rng_state(rng):
+    return rng.bit_generator.state if rng is not None else None
+
+
+def set_rng_state(rng, rng_state):
+    if rng is not None and rng_state is not None:
+        rng.bit_generator.state = rng_state
+
+
+def capture_progress(data, progress):
+    if progress is not None:
+        data[:, PROGRESS] = progress.progress
+        data[:, BEST_PROGRESS] = progress.best_progress
+        data[:, TRACK_POSITION] = progress.positions
+
+
+def restore_progress(progress, data, indices):
+    if progress is None:
+        return
+    if np.isnan(data[:, PROGRESS]).any():
+        raise ValueError("L'état ne contient pas l'avancement des voitures")
+    progress.progress[indices] = data[:, PROGRESS]
+    progress.best_progress[indices] = data[:, BEST_PROGRESS]
+    progress.positions[indices] = data[:, TRACK_POSITION]
+    if progress.index is None:
+        # DistanceTracker : la distance du prochain pas part des centres restaurés
+        progress.centers[indices] = data[:, CENTER]
+
+
+def capture_population(population, progress=None, tick=0, rng=None):
+    """
+    État de toutes les voitures d'une Population (et de leur ProgressTracker).
+    La Population mesure le radar à chaque pas : ses colonnes restent à nan
+    """
+    state = SimulationState.empty(population.size, 0, tick, rng)
+    data = state.data
+    data[:, CENTER] = population.centers
+    data[:, VELOCITY] = population.velocities
+    data[:, ANGLE] = population.angles
+    data[:, STEERING] = population.steering
+    data[:, ACCELERATION] = population.accelerations
+    data[:, CRASHED] = population.crashed
+    data[:, CONTACT] = population.contact_points
+    capture_progress(data, progress)
+    return state
+
+
+def restore_population(population, state, progress=None, rng=None, indices=None):
+    """
+    Replace les voitures (toutes, ou seulement celles d'indices donnés, une ligne de l'état par voiture)
+    dans l'état capturé. Retourne le compteur de pas de l'état
+    """
+    if indices is None:
+        indices = slice(None)
+    data = state.data
+    population.centers[indices] = data[:, CENTER]
+    population.velocities[indices] = data[:, VELOCITY]
+    population.angles[indices] = data[:, ANGLE]
+    population.steering[indices] = data[:, STEERING]
+    population.accelerations[indices] = data[:, ACCELERATION]
+    population.crashed[indices] = data[:, CRASHED] > 0
+    population.contact_points[indices] = data[:, CONTACT]
+    restore_progress(progress, data, indices)
+    set_rng_state(rng, state.rng_state)
+    return state.tick
+
+
+def capture_cars(cars, progress=None, tick=0, rng=None):
+    """
+    État d'une liste de Car, radar compris
+    """
+    beam_count = cars[0].radar.beam_count if cars else 0
+    state = SimulationState.empty(len(cars), beam_count, tick, rng)
+    data = state.data
+    for row, car in zip(data, cars):
+        contact_point = car.contact_point if car.contact_point is not None else (np.nan, np.nan)
+        row[0:len(COLUMNS) - 3] = (car.center.x, car.center.y, car.velocity.y, car.angle, car.steering,
+                                   car.acceleration, car.crashed, contact_point[0], contact_point[1])
+        row[len(COLUMNS):] = car.radar_distances
+    capture_progress(data, progress)
+    return state
+
+
+def restore_cars(cars, state, progress=None, rng=None):
+    """
+    Replace chaque voiture dans l'état de la ligne correspondante ; sans distances du radar dans l'état
+    (capturé sur une Population), le radar est mesuré à la nouvelle position
+    """
+    if len(cars) != len(state):
+        raise ValueError("{count} états pour {cars} voitures".format(count=len(state), cars=len(cars)))
+    for row, car in zip(state.data, cars):
+        radar_distances = row[len(COLUMNS):]
+        known_radar = len(radar_distances) == car.radar.beam_count and not np.isnan(radar_distances).any()
+        car.set_pose(row[CENTER], row[ANGLE], radar_distances if known_radar else car.radar_distances,
+                     row[CRASHED] > 0, interpolate=False)
+        if not known_radar:
+            car.get_radar_segment()
+        car.velocity.x = 0
+        car.velocity.y = float(row[VELOCITY])
+        car.steering = float(row[STEERING])
+        car.acceleration = float(row[ACCELERATION])
+        car.contact_point = None if np.isnan(row[CONTACT]).any() else row[CONTACT].copy()
+    restore_progress(progress, state.data, slice(None))
+    set_rng_state(rng, state.rng_state)
+    return state.tick
+
+
+def capture_simulation(simulation, progress=None, rng=None):
+    """
+    État d'une Simulation : ses voitures et son horloge (compteur de pas et temps simulé)
+    """
+    state = capture_cars(simulation.cars, progress, simulation.tick, rng)
+    state.time = simulation.time
+    return state
+
+
+def restore_simulation(simulation, state, progress=None, rng=None):
+    """
+    Replace la Simulation dans l'état capturé, horloge comprise. Des voitures sont ajoutées ou retirées
+    pour en avoir une par ligne de l'état : restaurer un état dupliqué (fork()) donne autant de voitures
+    """
+    while len(simulation.cars) < len(state):
+        simulation.add_car()
+    del simulation.cars[len(state):]
+    restore_cars(simulation.cars, state, progress, rng)
+    simulation.tick = state.tick
+    simulation.time = state.time
+    return state.tick
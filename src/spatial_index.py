@@ -0,0 +1,234 @@
+"""
+Grille uniforme indexant les segments du circuit, pour ne tester que les segments proches d'un rayon ou d'une boîte
+"""
+import math
+import numpy as np
+
+# Taille minimale d'une cellule, en pixels
+MIN_CELL_SIZE = 8
+# En dessous de ce nombre de segments, parcourir la grille coûte plus cher que de tout tester, même pour
+# une population entière (benchmarks/benchmark.py, radar_population_* : 1000 voitures)
+BRUTE_FORCE_THRESHOLD = 128
+# Une requête d'au plus ce nombre de couples rayon x segment teste aussi tous les segments : le radar
+# d'une seule voiture (5 faisceaux) n'a intérêt à passer par la grille qu'au-delà de quelques milliers de segments
+MAX_BRUTE_FORCE_PAIRS = 32768
+
+
+def get_sorted_unique(keys):
+    """
+    np.unique() pour des clés entières : un tri puis la suppression des doublons voisins,
+    plus rapide que le hachage de np.unique() sur ces tableaux
+    """
+    keys = np.sort(keys)
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+
+class UniformGrid:
+    """
+    Chaque cellule de la grille connaît les segments qui la traversent (stockage CSR :
+    les segments de la cellule i sont cell_items[cell_start[i]:cell_start[i + 1]])
+    """
+
+    def __init__(self, segments, width, height, cell_size=None, brute_force_threshold=BRUTE_FORCE_THRESHOLD):
+        self.segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+        segment_count = len(self.segments)
+        self.all_items = np.arange(segment_count)
+        self.is_trivial = segment_count <= brute_force_threshold
+
+        # La grille couvre la zone de jeu et tous les segments, même ceux qui en dépassent
+        if segment_count:
+            self.min_x = min(0.0, self.segments[:, [0, 2]].min())
+            self.min_y = min(0.0, self.segments[:, [1, 3]].min())
+            self.max_x = max(float(width), self.segments[:, [0, 2]].max())
+            self.max_y = max(float(height), self.segments[:, [1, 3]].max())
+        else:
+            self.min_x, self.min_y, self.max_x, self.max_y = 0.0, 0.0, float(width), float(height)
+
+        if cell_size is None:
+            # Environ un segment par cellule en moyenne
+            area = (self.max_x - self.min_x) * (self.max_y - self.min_y)
+            cell_size = math.sqrt(area / max(segment_count, 1))
+        self.cell_size = max(float(cell_size), MIN_CELL_SIZE)
+        self.columns = max(1, math.ceil((self.max_x - self.min_x) / self.cell_size))
+        self.rows = max(1, math.ceil((self.max_y - self.min_y) / self.cell_size))
+
+        segment_indices, cells = self.get_cells_along_segments(self.segments)
+        # Un segment n'est enregistré qu'une fois par cellule
+        keys = np.unique(cells * max(segment_count, 1) + segment_indices)
+        cells, items = np.divmod(keys, max(segment_count, 1))
+        self.cell_items = items
+        counts = np.bincount(cells, minlength=self.columns * self.rows)
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def get_cells_along_segments(self, segments):
+        """
+        Parcours DDA vectorisé sur plusieurs segments à la fois : un segment traverse la cellule de chacune
+        de ses extrémités, et les deux cellules de part et d'autre de chacun de ses croisements avec
+        une ligne verticale ou horizontale de la grille.
+        Retourne deux tableaux de même taille (avec doublons possibles) : l'indice du segment et
+        l'indice de la cellule traversée (ligne * colonnes + colonne)
+        """
+        segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+        x0, y0, x1, y1 = segments.T
+        dx, dy = x1 - x0, y1 - y0
+
+        # Découpe les segments aux bords de la grille (Liang-Barsky)
+        t_min = np.zeros(len(segments))
+        t_max = np.ones(len(segments))
+        valid = np.ones(len(segments), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start, delta, low, high in ((x0, dx, self.min_x, self.max_x), (y0, dy, self.min_y, self.max_y)):
+                parallel = delta == 0
+                valid &= ~parallel | ((start >= low) & (start <= high))
+                t_low = np.where(parallel, -np.inf, (low - start) / delta)
+                t_high = np.where(parallel, np.inf, (high - start) / delta)
+                t_min = np.maximum(t_min, np.minimum(t_low, t_high))
+                t_max = np.minimum(t_max, np.maximum(t_low, t_high))
+        valid &= t_min <= t_max
+        indices = np.flatnonzero(valid)
+        x0, y0, dx, dy = x0[indices], y0[indices], dx[indices], dy[indices]
+        t_min, t_max = t_min[indices], t_max[indices]
+
+        # Coordonnées en unités de cellules des extrémités découpées
+        grid_x0 = (x0 - self.min_x) / self.cell_size
+        grid_y0 = (y0 - self.min_y) / self.cell_size
+        grid_dx = dx / self.cell_size
+        grid_dy = dy / self.cell_size
+
+        owners = [indices, indices]
+        columns = [grid_x0 + t_min * grid_dx, grid_x0 + t_max * grid_dx]
+        rows = [grid_y0 + t_min * grid_dy, grid_y0 + t_max * grid_dy]
+        for along, across, delta_along, delta_across, along_list, across_list in (
+                (grid_x0, grid_y0, grid_dx, grid_dy, columns, rows),
+                (grid_y0, grid_x0, grid_dy, grid_dx, rows, columns)):
+            first = along + t_min * delta_along
+            last = along + t_max * delta_along
+            low_line = np.ceil(np.minimum(first, last)).astype(np.int64)
+            counts = np.maximum(np.floor(np.maximum(first, last)).astype(np.int64) - low_line + 1, 0)
+            counts[delta_along == 0] = 0
+            total = counts.sum()
+            if total == 0:
+                continue
+            owner = np.repeat(np.arange(len(indices)), counts)
+            line = np.repeat(low_line - (np.cumsum(counts) - counts), counts) + np.arange(total)
+            position = across[owner] + (line - along[owner]) / delta_along[owner] * delta_across[owner]
+            # Cellules avant et après la ligne croisée
+            owners += [indices[owner], indices[owner]]
+            along_list += [line - 0.5, line + 0.5]
+            across_list += [position, position]
+        owners = np.concatenate(owners)
+        column = np.clip(np.floor(np.concatenate(columns)).astype(np.int64), 0, self.columns - 1)
+        row = np.clip(np.floor(np.concatenate(rows)).astype(np.int64), 0, self.rows - 1)
+        return owners, row * self.columns + column
+
+    def get_cell_items(self, cells):
+        """
+        Retourne les indices (uniques, triés) des segments présents dans les cellules données
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        return np.unique(self.cell_items[positions])
+
+    def query_rays(self, rays):
+        """
+        Segments candidats pour une ou plusieurs lignes (ox, oy, ex, ey) : ceux des cellules traversées
+        """
+        if self.is_trivial:
+            return self.all_items
+        _, cells = self.get_cells_along_segments(rays)
+        return self.get_cell_items(np.unique(cells))
+
+    def is_brute_force(self, ray_count):
+        """
+        Vrai si une requête de ray_count lignes coûte moins cher en testant tous les segments
+        """
+        return self.is_trivial or ray_count * len(self.segments) <= MAX_BRUTE_FORCE_PAIRS
+
+    def estimate_ray_candidates(self, length):
+        """
+        Nombre moyen de segments candidats d'une ligne de cette longueur, pour découper les requêtes en paquets
+        """
+        segment_count = len(self.segments)
+        if self.is_trivial:
+            return segment_count
+        occupied_cells = max(np.count_nonzero(np.diff(self.cell_start)), 1)
+        crossed_cells = 2 * math.ceil(length / self.cell_size) + 2
+        return min(segment_count, math.ceil(crossed_cells * len(self.cell_items) / occupied_cells))
+
+    def query_ray_pairs(self, rays):
+        """
+        Segments candidats de chaque ligne (ox, oy, ex, ey), séparément : seules les cellules traversées par
+        une ligne comptent pour elle. Retourne deux tableaux de même taille : l'indice de la ligne et
+        l'indice du segment candidat (chaque couple n'apparaît qu'une fois, triés par ligne puis par segment)
+        """
+        rays = np.asarray(rays, dtype=float).reshape(-1, 4)
+        segment_count = len(self.segments)
+        if self.is_brute_force(len(rays)):
+            return np.repeat(np.arange(len(rays)), segment_count), np.tile(self.all_items, len(rays))
+
+        owners, cells = self.get_cells_along_segments(rays)
+        cell_count = self.columns * self.rows
+        owners, cells = np.divmod(get_sorted_unique(owners * cell_count + cells), cell_count)
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = counts.sum()
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        owners = np.repeat(owners, counts)
+        keys = get_sorted_unique(owners * max(segment_count, 1) + self.cell_items[positions])
+        return np.divmod(keys, max(segment_count, 1))
+
+    def query_box(self, min_x, min_y, max_x, max_y):
+        """
+        Segments candidats pour une boîte englobante
+        """
+        if self.is_trivial:
+            return self.all_items
+        first_column = max(0, int((min_x - self.min_x) // self.cell_size))
+        last_column = min(self.columns - 1, int((max_x - self.min_x) // self.cell_size))
+        first_row = max(0, int((min_y - self.min_y) // self.cell_size))
+        last_row = min(self.rows - 1, int((max_y - self.min_y) // self.cell_size))
+        if first_column > last_column or first_row > last_row:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(first_row, last_row + 1)
+        columns = np.arange(first_column, last_column + 1)
+        cells = (rows[:, None] * self.columns + columns).ravel()
+        return self.get_cell_items(cells)
+
+    def query_boxes(self, boxes):
+        """
+        Segments candidats pour plusieurs boîtes (min_x, min_y, max_x, max_y) à la fois.
+        Retourne deux tableaux de même taille : l'indice de la boîte et l'indice du segment candidat
+        (chaque couple n'apparaît qu'une fois)
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        segment_count = len(self.segments)
+        if self.is_trivial:
+            return np.repeat(np.arange(len(boxes)), segment_count), np.tile(self.all_items, len(boxes))
+
+        first_column = np.clip((boxes[:, 0] - self.min_x) // self.cell_size, 0, self.columns - 1).astype(np.int64)
+        last_column = np.clip((boxes[:, 2] - self.min_x) // self.cell_size, 0, self.columns - 1).astype(np.int64)
+        first_row = np.clip((boxes[:, 1] - self.min_y) // self.cell_size, 0, self.rows - 1).astype(np.int64)
+        last_row = np.clip((boxes[:, 3] - self.min_y) // self.cell_size, 0, self.rows - 1).astype(np.int64)
+        column_counts = last_column - first_column + 1
+        cell_counts = column_counts * (last_row - first_row + 1)
+
+        # Énumère toutes les cellules couvertes par chaque boîte
+        owners = np.repeat(np.arange(len(boxes)), cell_counts)
+        rank = np.arange(cell_counts.sum()) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+        rows = first_row[owners] + rank // column_counts[owners]
+        columns = first_column[owners] + rank % column_counts[owners]
+        cells = rows * self.columns + columns
+
+        # Puis tous les segments de ces cellules
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = counts.sum()
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        owners = np.repeat(owners, counts)
+        keys = np.unique(owners * max(segment_count, 1) + self.cell_items[positions])
+        return np.divmod(keys, max(segment_count, 1))
@@ -0,0 +1,170 @@
+"""
+Représentation du circuit indépendante du canvas Tk
+"""
+import os
+import numpy as np
+from src.progress import ProgressIndex
+from src.spatial_index import UniformGrid
+
+# Dimensions par défaut de la zone de jeu (taille du canvas de l'App)
+ARENA_WIDTH = 800
+ARENA_HEIGHT = 610
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Circuit utilisé par défaut pour l'entraînement
+DEFAULT_TRACK_PATH = os.path.join(ROOT_DIR, 'saves', 'circuit01.txt')
+# Coin supérieur gauche de la voiture au départ (voiture orientée vers le haut)
+DEFAULT_START_POSITION = (125, 300)
+
+
+def read_track_file(file_path):
+    """
+    Lit un fichier de sauvegarde texte (une ligne 'ax, ay, bx, by' par segment)
+    et retourne la liste des segments
+    """
+    segments = []
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                segments.append(tuple(float(coord) for coord in line.split(",")))
+    return segments
+
+
+class CompiledTrack:
+    """
+    Géométrie du circuit compilée en tableaux contigus, valable pour une version donnée du circuit
+    """
+
+    def __init__(self, segments, width, height, version):
+        self.version = version
+        # Un tableau déjà numérique (par exemple le memmap float32 d'un circuit binaire) est utilisé sans copie
+        segments = np.asarray(segments)
+        if segments.dtype.kind != 'f':
+            segments = segments.astype(float)
+        self.segments = np.ascontiguousarray(segments.reshape(-1, 4))
+        self.directions = self.segments[:, 2:4] - self.segments[:, 0:2]
+        self.lengths = np.hypot(self.directions[:, 0], self.directions[:, 1])
+        # Boîtes englobantes (min_x, min_y, max_x, max_y) de chaque segment
+        self.bounding_boxes = np.column_stack((
+            np.minimum(self.segments[:, 0], self.segments[:, 2]),
+            np.minimum(self.segments[:, 1], self.segments[:, 3]),
+            np.maximum(self.segments[:, 0], self.segments[:, 2]),
+            np.maximum(self.segments[:, 1], self.segments[:, 3]),
+        ))
+        self.spatial_index = UniformGrid(self.segments, width, height)
+        # Construit à la demande : tous les circuits n'ont pas deux bords
+        self.progress_index = None
+        # Champs de distance déjà construits, par résolution
+        self.distance_fields = {}
+
+
+class Track:
+    """
+    Circuit en mémoire : segments (ax, ay, bx, by) et limites de la zone de jeu.
+    Les segments sont une liste de tuples, ou un tableau N x 4 en lecture seule pour un circuit binaire
+    tant qu'il n'est pas modifié.
+    Chaque modification incrémente la version, ce qui permet aux consommateurs de ne recompiler
+    la géométrie que lorsqu'elle a réellement changé
+    """
+
+    def __init__(self, width=ARENA_WIDTH, height=ARENA_HEIGHT, segments=None, start_position=DEFAULT_START_POSITION):
+        self.width = width
+        self.height = height
+        self.start_position = start_position
+        # Fichier d'origine du circuit, à côté duquel sont mis en cache les champs de distance
+        self.file_path = None
+        self.segments = []
+        self.version = 0
+        self._compiled = None
+        if segments is not None:
+            self.extend(segments)
+
+    @classmethod
+    def from_file(cls, file_path, width=ARENA_WIDTH, height=ARENA_HEIGHT):
+        """
+        Charge un circuit texte ou binaire (.trk) ; les dimensions d'un circuit binaire sont lues dans son en-tête,
+        et sa position de départ dans ses métadonnées si elle y figure
+        """
+        # Import local : track_format dépend lui-même de ce module
+        from src.track_format import is_binary_track, load_binary_track, get_start_position
+
+        if is_binary_track(file_path):
+            segments, header = load_binary_track(file_path)
+            track = cls(header['width'], header['height'], segments, get_start_position(header))
+        else:
+            track = cls(width, height, read_track_file(file_path))
+        track.file_path = file_path
+        return track
+
+    def add_segment(self, segment):
+        self.file_path = None
+        self.make_editable()
+        self.segments.append(self.to_segment(segment))
+        self.version += 1
+
+    def extend(self, segments):
+        if isinstance(segments, np.ndarray) and len(self.segments) == 0:
+            # Pas de copie : le tableau (éventuellement un memmap) est utilisé tel quel
+            self.segments = segments.reshape(-1, 4)
+        else:
+            self.make_editable()
+            self.segments.extend(self.to_segment(segment) for segment in segments)
+        self.file_path = None
+        self.version += 1
+
+    def make_editable(self):
+        if isinstance(self.segments, np.ndarray):
+            self.segments = [self.to_segment(segment) for segment in self.segments]
+
+    def clear(self):
+        self.file_path = None
+        self.segments = []
+        self.version += 1
+
+    @staticmethod
+    def to_segment(segment):
+        ax, ay, bx, by = segment
+        return float(ax), float(ay), float(bx), float(by)
+
+    def compile(self):
+        """
+        Retourne la géométrie compilée, reconstruite seulement si le circuit a changé depuis le dernier appel
+        """
+        if self._compiled is None or self._compiled.version != self.version:
+            self._compiled = CompiledTrack(self.segments, self.width, self.height, self.version)
+        return self._compiled
+
+    def get_segments_array(self):
+        """
+        Retourne les segments sous forme de tableau S x 4
+        """
+        return self.compile().segments
+
+    def get_spatial_index(self):
+        return self.compile().spatial_index
+
+    def get_progress_index(self):
+        """
+        Ligne médiane du circuit pour mesurer l'avancement des voitures, construite une fois par version
+        """
+        compiled = self.compile()
+        if compiled.progress_index is None:
+            compiled.progress_index = ProgressIndex(compiled.segments, self.width, self.height, self.start_position)
+        return compiled.progress_index
+
+    def get_distance_field(self, resolution):
+        """
+        Champ de distance du circuit à la résolution donnée, mis en cache à côté du fichier du circuit s'il en a un
+        """
+        # Import local : distance_field dépend de track_format, qui dépend de ce module
+        from src.distance_field import DistanceField, get_cache_path
+
+        compiled = self.compile()
+        if resolution not in compiled.distance_fields:
+            cache_path = get_cache_path(self.file_path, resolution) if self.file_path is not None else None
+            compiled.distance_fields[resolution] = DistanceField.build(self, resolution, cache_path)
+        return compiled.distance_fields[resolution]
+
+    def is_position_out_of_bound(self, coord):
+        return coord[0] < 0 or coord[0] > self.width or coord[1] < 0 or coord[1] > self.height
@@ -0,0 +1,138 @@
+"""
+Format binaire des circuits (.trk), chargé par numpy.memmap sans copie ni analyse de texte.
+
+Structure du fichier :
+- en-tête fixe : signature, version du format, nombre de segments, dimensions de la zone de jeu,
+  position des données, taille des métadonnées et empreinte SHA-256 des segments
+- métadonnées JSON (utf-8)
+- segments : tableau float32 N x 4 (ax, ay, bx, by), aligné sur DATA_ALIGNMENT octets
+
+Usage : python -m src.track_format saves/circuit01.txt [...]  (convertit les sauvegardes texte)
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import numpy as np
+from src.track import ARENA_WIDTH, ARENA_HEIGHT, DEFAULT_START_POSITION, read_track_file
+
+MAGIC = b'RCTRACK\0'
+FORMAT_VERSION = 1
+BINARY_EXTENSION = '.trk'
+# signature, version, nombre de segments, largeur, hauteur, position des données, taille des métadonnées, empreinte
+HEADER = struct.Struct('<8sIIffII32s')
+DATA_ALIGNMENT = 64
+SEGMENT_DTYPE = np.dtype('<f4')
+
+
+def compute_segments_hash(segments):
+    """
+    Empreinte SHA-256 des segments, calculée sur leur représentation float32 : identique pour un circuit
+    chargé depuis un fichier texte ou binaire
+    """
+    data = np.ascontiguousarray(np.asarray(segments).reshape(-1, 4), dtype=SEGMENT_DTYPE)
+    return hashlib.sha256(data.tobytes()).hexdigest()
+
+
+def write_binary_track(file_path, segments, width=ARENA_WIDTH, height=ARENA_HEIGHT, metadata=None):
+    data = np.ascontiguousarray(np.asarray(segments).reshape(-1, 4), dtype=SEGMENT_DTYPE)
+    digest = hashlib.sha256(data.tobytes()).digest()
+    metadata_bytes = json.dumps(metadata or {}).encode('utf-8')
+    data_offset = HEADER.size + len(metadata_bytes)
+    data_offset += -data_offset % DATA_ALIGNMENT
+
+    # Écriture dans un fichier temporaire puis renommage, pour ne jamais laisser de fichier à moitié écrit
+    temporary_path = file_path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(data), width, height, data_offset, len(metadata_bytes),
+                               digest))
+        file.write(metadata_bytes)
+        file.write(b'\0' * (data_offset - HEADER.size - len(metadata_bytes)))
+        file.write(data.tobytes())
+    os.replace(temporary_path, file_path)
+    return file_path
+
+
+def read_binary_track_header(file_path):
+    with open(file_path, 'rb') as file:
+        magic, version, count, width, height, data_offset, metadata_size, digest = HEADER.unpack(
+            file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("{path} n'est pas un circuit binaire".format(path=file_path))
+        if version != FORMAT_VERSION:
+            raise ValueError("Version de format {version} non supportée".format(version=version))
+        metadata = json.loads(file.read(metadata_size).decode('utf-8'))
+    return {
+        'segment_count': count,
+        'width': width,
+        'height': height,
+        'data_offset': data_offset,
+        'hash': digest.hex(),
+        'metadata': metadata,
+    }
+
+
+def load_binary_track(file_path, verify=False):
+    """
+    Retourne (segments, en-tête) ; les segments sont une vue numpy.memmap en lecture seule sur le fichier :
+    rien n'est copié, et les processus qui chargent le même circuit partagent les mêmes pages mémoire.
+    La taille du fichier est toujours vérifiée (fichier tronqué) ; avec verify, l'empreinte des segments aussi,
+    ce qui les lit en entier
+    """
+    header = read_binary_track_header(file_path)
+    expected_size = header['data_offset'] + header['segment_count'] * 4 * SEGMENT_DTYPE.itemsize
+    if os.path.getsize(file_path) < expected_size:
+        raise ValueError("{path} est tronqué".format(path=file_path))
+    if header['segment_count'] == 0:
+        segments = np.empty((0, 4), dtype=SEGMENT_DTYPE)
+    else:
+        segments = np.memmap(file_path, dtype=SEGMENT_DTYPE, mode='r', offset=header['data_offset'],
+                             shape=(header['segment_count'], 4))
+    if verify and compute_segments_hash(segments) != header['hash']:
+        raise ValueError("Empreinte invalide pour {path}".format(path=file_path))
+    return segments, header
+
+
+def is_binary_track(file_path):
+    return file_path.endswith(BINARY_EXTENSION)
+
+
+def get_start_position(header):
+    """
+    Position de départ enregistrée dans les métadonnées d'un circuit binaire (circuits générés),
+    position par défaut sinon
+    """
+    return tuple(header['metadata'].get('start_position', DEFAULT_START_POSITION))
+
+
+def load_track_file(file_path, verify=True):
+    """
+    Charge un circuit, binaire (.trk) ou texte : retourne (segments, position de départ).
+    Les sauvegardes texte n'ont que des segments et partent de la position par défaut.
+    L'empreinte d'un circuit binaire est vérifiée par défaut : le fichier vient d'être choisi, un circuit abîmé
+    doit être signalé plutôt que dessiné
+    """
+    if is_binary_track(file_path):
+        segments, header = load_binary_track(file_path, verify)
+        return segments, get_start_position(header)
+    return read_track_file(file_path), DEFAULT_START_POSITION
+
+
+def convert_text_track(text_path, binary_path=None, width=ARENA_WIDTH, height=ARENA_HEIGHT):
+    """
+    Convertit une sauvegarde texte en circuit binaire, à côté du fichier d'origine par défaut
+    """
+    if binary_path is None:
+        binary_path = os.path.splitext(text_path)[0] + BINARY_EXTENSION
+    metadata = {'source': os.path.basename(text_path)}
+    return write_binary_track(binary_path, read_track_file(text_path), width, height, metadata)
+
+
+def main():
+    for text_path in sys.argv[1:]:
+        print(convert_text_track(text_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Génération procédurale de circuits, adaptée de CarRacing._create_track() (tests/gym_car.py) sans Box2D.
+
+Comme dans gym, une ligne médiane suit des points de passage tirés au hasard autour d'un cercle déformé ;
+mais plusieurs candidats sont tracés en même temps (tableaux NumPy de taille CANDIDATES_PER_BATCH) au lieu
+de recommencer en boucle jusqu'au succès. Le premier candidat valide est gardé : pour une graine donnée,
+le résultat est toujours le même.
+
+Les circuits sont mis à l'échelle de la zone de jeu, orientés pour que la voiture démarre vers le haut,
+et enregistrés au format binaire (.trk) dans un cache indexé par la graine et les paramètres.
+
+Usage : python -m src.track_generator --count 1000 --seed 0 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.raycast import get_intersection_parameters
+from src.track import ARENA_WIDTH, ARENA_HEIGHT, ROOT_DIR
+from src.track_format import BINARY_EXTENSION, write_binary_track
+
+# Change à chaque modification de l'algorithme, pour invalider les circuits déjà en cache
+GENERATOR_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(ROOT_DIR, 'saves', 'generated')
+
+# Paramètres de gym (en unités de gym) : cercle déformé de rayon TRACK_RAD
+CHECKPOINTS = 12
+TRACK_RAD = 150
+TRACK_DETAIL_STEP = 3.5
+TRACK_TURN_RATE = 0.31
+MAX_TRACE_STEPS = 2500
+LAPS = 4
+# Le virage dépend de la projection de la destination multipliée par SCALE dans gym
+TURN_SCALE = 6.0
+
+# Candidats tracés ensemble, et nombre maximal de lots avant d'abandonner une graine
+CANDIDATES_PER_BATCH = 8
+MAX_BATCHES = 50
+
+# Dimensions par défaut de Car, pour placer le coin supérieur gauche de la voiture au départ
+CAR_WIDTH = 12
+CAR_LENGTH = 24
+
+DEFAULT_PARAMETERS = {
+    # Rotation maximale de la ligne médiane par pas : la piste est proportionnellement bien plus large que
+    # dans gym (comme les circuits dessinés à la main), les virages doivent donc être moins serrés
+    'turn_rate': 0.15,
+    # Demi-largeur de la piste et marge autour du circuit, en pixels
+    'half_width': 30.0,
+    'margin': 10.0,
+    # Un point de la ligne médiane sur point_step est conservé
+    'point_step': 3,
+    'width': ARENA_WIDTH,
+    'height': ARENA_HEIGHT,
+}
+
+
+def get_parameters(**overrides):
+    unknown = set(overrides) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError("Paramètres inconnus : " + ", ".join(sorted(unknown)))
+    parameters = dict(DEFAULT_PARAMETERS)
+    parameters.update(overrides)
+    return parameters
+
+
+def create_checkpoints(rng, count):
+    """
+    Points de passage de count candidats : angles croissants autour du cercle, rayons aléatoires.
+    Le premier et le dernier sont fixés comme dans gym
+    """
+    indices = np.arange(CHECKPOINTS)
+    alphas = 2 * math.pi * indices / CHECKPOINTS + rng.uniform(0, 2 * math.pi / CHECKPOINTS, (count, CHECKPOINTS))
+    radii = rng.uniform(TRACK_RAD / 3, TRACK_RAD, (count, CHECKPOINTS))
+    alphas[:, 0] = 0
+    radii[:, 0] = 1.5 * TRACK_RAD
+    alphas[:, -1] = 2 * math.pi * (CHECKPOINTS - 1) / CHECKPOINTS
+    radii[:, -1] = 1.5 * TRACK_RAD
+    return alphas, radii * np.cos(alphas), radii * np.sin(alphas)
+
+
+def trace_centerlines(checkpoint_alphas, checkpoint_x, checkpoint_y, turn_rate=TRACK_TURN_RATE):
+    """
+    Suit les points de passage pour tous les candidats en même temps, pas à pas.
+    Retourne les tableaux K x MAX_TRACE_STEPS (alpha, beta, x, y) et le nombre de pas valides de chaque candidat
+    """
+    count = len(checkpoint_alphas)
+    rows = np.arange(count)
+    x = np.full(count, 1.5 * TRACK_RAD)
+    y = np.zeros(count)
+    beta = np.zeros(count)
+    destination = np.zeros(count, dtype=np.int64)
+    laps = np.zeros(count, dtype=np.int64)
+    visited_other_side = np.zeros(count, dtype=bool)
+    lengths = np.full(count, MAX_TRACE_STEPS)
+    running = np.ones(count, dtype=bool)
+    trace = np.empty((4, count, MAX_TRACE_STEPS))
+
+    for step in range(MAX_TRACE_STEPS):
+        alpha = np.arctan2(y, x)
+        new_lap = visited_other_side & (alpha > 0)
+        laps += new_lap
+        visited_other_side &= ~new_lap
+        negative = alpha < 0
+        visited_other_side |= negative
+        alpha[negative] += 2 * math.pi
+
+        # Prochain point de passage : le premier, à partir de la destination courante, dont l'angle dépasse alpha.
+        # Les angles des points de passage sont croissants : un simple comptage suffit
+        current = destination % CHECKPOINTS
+        first_ahead = np.maximum(current, (checkpoint_alphas < alpha[:, None]).sum(axis=1))
+        wrapped = first_ahead >= CHECKPOINTS
+        destination += np.where(wrapped, CHECKPOINTS - current, first_ahead - current)
+        alpha[wrapped] -= 2 * math.pi
+        target = destination % CHECKPOINTS
+
+        r1x = np.cos(beta)
+        r1y = np.sin(beta)
+        projection = r1x * (checkpoint_x[rows, target] - x) + r1y * (checkpoint_y[rows, target] - y)
+        beta -= 2 * math.pi * np.maximum(0, np.ceil((beta - alpha - 1.5 * math.pi) / (2 * math.pi)))
+        beta += 2 * math.pi * np.maximum(0, np.ceil((alpha - beta - 1.5 * math.pi) / (2 * math.pi)))
+        previous_beta = beta.copy()
+        projection *= TURN_SCALE
+        turn = np.minimum(turn_rate, np.abs(0.001 * projection))
+        beta -= np.where(projection > 0.3, turn, 0)
+        beta += np.where(projection < -0.3, turn, 0)
+        x -= r1y * TRACK_DETAIL_STEP
+        y += r1x * TRACK_DETAIL_STEP
+
+        trace[0, :, step] = alpha
+        trace[1, :, step] = previous_beta * 0.5 + beta * 0.5
+        trace[2, :, step] = x
+        trace[3, :, step] = y
+        finished = running & (laps > LAPS)
+        lengths[finished] = step + 1
+        running &= ~finished
+        if not running.any():
+            break
+    return trace, lengths
+
+
+def extract_loop(trace, length):
+    """
+    Garde un tour complet entre deux passages par la ligne de départ (le premier tour est ignoré, comme dans gym).
+    Retourne le tableau L x 4 (alpha, beta, x, y), ou None si le tracé ne se referme pas proprement
+    """
+    alphas = trace[0, :length]
+    start_alpha = 2 * math.pi * -0.5 / CHECKPOINTS
+    passes = np.flatnonzero((alphas[1:] > start_alpha) & (alphas[:-1] <= start_alpha)) + 1
+    if len(passes) < 2:
+        return None
+    first, last = passes[-2], passes[-1]
+    loop = trace[:, first:last - 1].T
+    if len(loop) < 3:
+        return None
+
+    # Écart entre la fin et le début du tour, perpendiculairement à la piste
+    perpendicular_x = math.cos(loop[0, 1])
+    perpendicular_y = math.sin(loop[0, 1])
+    gap = math.hypot(perpendicular_x * (loop[0, 2] - loop[-1, 2]), perpendicular_y * (loop[0, 3] - loop[-1, 3]))
+    if gap > TRACK_DETAIL_STEP:
+        return None
+    return loop
+
+
+def build_boundaries(loop, parameters):
+    """
+    Oriente la ligne médiane pour que le départ se fasse vers le haut, la met à l'échelle de la zone de jeu
+    et retourne (segments des bords intérieur puis extérieur, coin supérieur gauche de la voiture au départ)
+    """
+    loop = loop[::parameters['point_step']]
+    betas = loop[:, 1]
+    points = loop[:, 2:4]
+
+    # Sens de déplacement au départ (-sin beta, cos beta), tourné vers (0, -1)
+    rotation = -math.pi / 2 - math.atan2(math.cos(betas[0]), -math.sin(betas[0]))
+    cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+    matrix = np.array(((cos_r, sin_r), (-sin_r, cos_r)))
+    points = points @ matrix
+    normals = np.column_stack((np.cos(betas), np.sin(betas))) @ matrix
+
+    half_width = parameters['half_width']
+    padding = parameters['margin'] + half_width
+    low, high = points.min(axis=0), points.max(axis=0)
+    available = np.array((parameters['width'], parameters['height'])) - 2 * padding
+    scale = np.min(available / (high - low))
+    if scale <= 0:
+        return None
+    offset = (np.array((parameters['width'], parameters['height'])) - (high - low) * scale) / 2
+    points = (points - low) * scale + offset
+
+    borders = points - half_width * normals, points + half_width * normals
+    segments = np.concatenate([np.hstack((border, np.roll(border, -1, axis=0))) for border in borders])
+    start = points[0] - (CAR_WIDTH / 2, CAR_LENGTH / 2)
+    return segments, (float(start[0]), float(start[1]))
+
+
+def has_crossing_borders(segments):
+    """
+    Vrai si deux segments non consécutifs des bords se croisent (virage trop serré pour la largeur de la piste)
+    """
+    count = len(segments)
+    _, hit = get_intersection_parameters(segments, segments)
+    # Les segments consécutifs d'un même bord partagent une extrémité
+    loop_size = count // 2
+    indices = np.arange(count)
+    loop_start = indices - indices % loop_size
+    following = loop_start + (indices + 1 - loop_start) % loop_size
+    hit[indices, indices] = False
+    hit[indices, following] = False
+    hit[following, indices] = False
+    return bool(hit.any())
+
+
+def generate_track(seed, **overrides):
+    """
+    Génère le circuit de la graine donnée.
+    Retourne (segments S x 4, coin supérieur gauche de la voiture au départ)
+    """
+    parameters = get_parameters(**overrides)
+    rng = np.random.default_rng(seed)
+    for _ in range(MAX_BATCHES):
+        trace, lengths = trace_centerlines(*create_checkpoints(rng, CANDIDATES_PER_BATCH), parameters['turn_rate'])
+        for candidate in range(CANDIDATES_PER_BATCH):
+            loop = extract_loop(trace[:, candidate], lengths[candidate])
+            if loop is None:
+                continue
+            result = build_boundaries(loop, parameters)
+            if result is not None and not has_crossing_borders(result[0]):
+                return result
+    raise RuntimeError("Aucun circuit valide pour la graine {seed}".format(seed=seed))
+
+
+def get_cache_key(seed, parameters):
+    description = json.dumps({'version': GENERATOR_VERSION, 'seed': seed, 'parameters': parameters}, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()[:16]
+
+
+def get_cache_path(seed, parameters, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, 'track_{seed}_{key}{extension}'.format(
+        seed=seed, key=get_cache_key(seed, parameters), extension=BINARY_EXTENSION))
+
+
+def write_generated_track(seed, parameters, path):
+    segments, start_position = generate_track(seed, **parameters)
+    metadata = {'generator_version': GENERATOR_VERSION, 'seed': seed, 'parameters': parameters,
+                'start_position': start_position}
+    return write_binary_track(path, segments, parameters['width'], parameters['height'], metadata)
+
+
+def _write_generated_track(arguments):
+    return write_generated_track(*arguments)
+
+
+def generate_tracks(seeds, workers=None, cache_dir=DEFAULT_CACHE_DIR, **overrides):
+    """
+    Retourne les chemins des circuits .trk des graines données, en ne générant que ceux absents du cache.
+    La génération est répartie sur un pool de processus
+    """
+    parameters = get_parameters(**overrides)
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = [get_cache_path(seed, parameters, cache_dir) for seed in seeds]
+    missing = [(seed, parameters, path) for seed, path in zip(seeds, paths) if not os.path.exists(path)]
+    if missing:
+        workers = workers if workers is not None else os.cpu_count()
+        if workers <= 1 or len(missing) == 1:
+            for arguments in missing:
+                _write_generated_track(arguments)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_size = max(1, len(missing) // (workers * 4))
+                list(executor.map(_write_generated_track, missing, chunksize=chunk_size))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des circuits procéduraux au format .trk")
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help="première graine")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--turn-rate', type=float, default=DEFAULT_PARAMETERS['turn_rate'])
+    parser.add_argument('--half-width', type=float, default=DEFAULT_PARAMETERS['half_width'])
+    parser.add_argument('--point-step', type=int, default=DEFAULT_PARAMETERS['point_step'])
+    args = parser.parse_args()
+
+    paths = generate_tracks(range(args.seed, args.seed + args.count), args.workers, args.cache_dir,
+                            turn_rate=args.turn_rate, half_width=args.half_width, point_step=args.point_step)
+    for path in paths:
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
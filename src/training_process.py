@@ -0,0 +1,192 @@
+"""
+Entraînement génétique dans un processus séparé, suivi en direct par l'App.
+
+Le processus d'entraînement envoie après chaque génération ses statistiques et le génome du champion
+dans une file ; l'App la vide sans jamais attendre (after()) et fait conduire sa voiture par le dernier
+champion reçu. L'entraînement n'attend jamais l'App : sa vitesse ne dépend pas de l'affichage.
+
+L'arrêt ne bloque pas non plus l'App : stop() lève un événement, sur lequel le processus d'entraînement
+annule les évaluations restantes de son pool, puis l'App vérifie avec poll_stop() que le processus est terminé
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import CancelledError
+import numpy as np
+from src.genetic import GeneticTrainer
+from src.network import NeuralNetwork
+
+# Intervalle entre deux lectures de la file par l'App, en millisecondes
+POLL_INTERVAL = 200
+# Un processus est laissé libre pour l'App
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# Délai au-delà duquel un entraînement qui ne s'est pas arrêté de lui-même est tué (dernier recours),
+# en secondes : en temps normal, il s'arrête dès que les évaluations en cours sont finies
+STOP_TIMEOUT = 30.0
+# Pas de simulation avant de remettre au départ la voiture d'un champion qui ne s'écrase pas
+DEFAULT_MAX_STEPS = 1000
+
+
+def get_generation_message(trainer, elapsed):
+    best = int(np.argmax(trainer.fitness))
+    return {
+        'type': 'generation',
+        'generation': trainer.generation,
+        'best_fitness': float(trainer.fitness[best]),
+        'mean_fitness': float(trainer.fitness.mean()),
+        'elapsed': elapsed,
+        'layer_sizes': trainer.layer_sizes,
+        'genome': trainer.population[best].copy(),
+    }
+
+
+def cancel_on_stop(stop_event, trainer):
+    stop_event.wait()
+    trainer.cancel()
+
+
+def run_training(messages, stop_event, generations, trainer_options):
+    """
+    Corps du processus d'entraînement : une génération après l'autre jusqu'à generations (None : sans fin)
+    ou jusqu'à ce que stop_event soit levé. Un thread surveille l'événement pour interrompre la génération
+    en cours : les paquets de génomes qui n'ont pas commencé sont annulés, seuls ceux en cours sont attendus
+    """
+    try:
+        with GeneticTrainer(**trainer_options) as trainer:
+            watcher = threading.Thread(target=cancel_on_stop, args=(stop_event, trainer), daemon=True)
+            watcher.start()
+            try:
+                while not stop_event.is_set() and (generations is None or trainer.generation < generations):
+                    start = time.perf_counter()
+                    try:
+                        trainer.evaluate()
+                    except CancelledError:
+                        break
+                    messages.put(get_generation_message(trainer, time.perf_counter() - start))
+                    trainer.next_generation()
+            finally:
+                # Le thread de surveillance est réveillé avant la fin du processus : un processus qui se termine
+                # pendant qu'il attend encore l'événement bloquerait ensuite stop_event.set() dans l'App
+                stop_event.set()
+                watcher.join()
+        messages.put({'type': 'finished', 'generation': trainer.generation})
+    except Exception:
+        messages.put({'type': 'error', 'message': traceback.format_exc()})
+
+
+class TrainingProcess:
+    """
+    Côté App : démarre l'entraînement et lit ses messages sans bloquer.
+    Le processus est lancé avec spawn pour ne pas hériter de la connexion Tk de l'App ;
+    il n'est pas démon, car le GeneticTrainer crée lui-même son pool de processus
+    """
+
+    def __init__(self, generations=None, workers=DEFAULT_WORKERS, **trainer_options):
+        context = multiprocessing.get_context('spawn')
+        self.messages = context.Queue()
+        self.stop_event = context.Event()
+        trainer_options['workers'] = workers
+        # Le processus d'entraînement a des threads (file des messages, surveillance de l'arrêt)
+        trainer_options.setdefault('start_method', 'spawn')
+        self.process = context.Process(target=run_training,
+                                       args=(self.messages, self.stop_event, generations, trainer_options))
+        self.last_stats = None
+        self.champion = None
+        self.layer_sizes = None
+        self.error = None
+        self.finished = False
+        # Instant de la demande d'arrêt
+        self.stop_time = None
+
+    def start(self):
+        self.process.start()
+
+    def poll(self):
+        """
+        Vide la file sans attendre. Retourne True si un nouveau champion est arrivé
+        """
+        has_new_champion = False
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message['type'] == 'generation':
+                self.last_stats = message
+                self.champion = message['genome']
+                self.layer_sizes = message['layer_sizes']
+                has_new_champion = True
+            elif message['type'] == 'error':
+                self.error = message['message']
+                self.finished = True
+            else:
+                self.finished = True
+        return has_new_champion
+
+    @property
+    def is_running(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        """
+        Demande l'arrêt sans attendre ; poll_stop() dit ensuite si le processus est terminé
+        """
+        if self.process.is_alive():
+            self.stop_event.set()
+        if self.stop_time is None:
+            self.stop_time = time.monotonic()
+
+    def poll_stop(self):
+        """
+        Après stop() : retourne True une fois le processus terminé et ses ressources libérées.
+        La file est vidée d'abord, un processus qui a encore des messages à y écrire ne pouvant pas se terminer
+        """
+        if self.process.pid is None:
+            return True
+        self.poll()
+        if self.process.is_alive():
+            if time.monotonic() - self.stop_time < STOP_TIMEOUT:
+                return False
+            self.process.terminate()
+        self.process.join()
+        self.messages.close()
+        return True
+
+
+class ChampionDriver:
+    """
+    Fait conduire la voiture de l'App par un génome, avec le même réseau que pendant l'évaluation.
+    La voiture repart du départ à chaque nouveau champion, après un accident ou après max_steps pas
+    """
+
+    def __init__(self, car, max_steps=DEFAULT_MAX_STEPS):
+        self.car = car
+        self.max_steps = max_steps
+        self.network = None
+        self.steps = 0
+
+    def set_genome(self, layer_sizes, genome):
+        self.network = NeuralNetwork(layer_sizes, genome)
+        self.restart()
+
+    def restart(self):
+        self.car.reset()
+        self.car.get_radar_segment()
+        self.steps = 0
+
+    def update(self, step_dt):
+        if self.network is None:
+            return
+        if self.car.crashed or self.steps >= self.max_steps:
+            self.restart()
+        inputs = np.asarray(self.car.radar_distances) / self.car.radar.max_range
+        acceleration, steering = self.network.forward(inputs)
+        self.car.apply_controls(acceleration, steering)
+        self.car.update(step_dt)
+        self.steps += 1
+
+    def render(self, alpha=1.0):
+        self.car.render(alpha)
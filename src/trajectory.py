@@ -0,0 +1,154 @@
+"""
+Enregistrement compact des trajectoires : une ligne float32 par pas de simulation
+(position, angle, vitesse, commandes, collision et distances du radar), écrite par blocs.
+
+Structure du fichier (.traj) :
+- en-tête fixe : signature, version du format, nombre de faisceaux du radar, taille des métadonnées
+- métadonnées JSON (utf-8)
+- blocs : nombre de pas, taille des données, compression (zlib ou non), puis les données
+"""
+import json
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b'RCTRAJ\0\0'
+FORMAT_VERSION = 1
+TRAJECTORY_EXTENSION = '.traj'
+# signature, version, nombre de faisceaux, taille des métadonnées
+HEADER = struct.Struct('<8sIII')
+# nombre de pas, taille des données, données compressées
+CHUNK_HEADER = struct.Struct('<II?')
+ROW_DTYPE = np.dtype('<f4')
+DEFAULT_CHUNK_SIZE = 1024
+# Colonnes fixes d'une ligne, suivies des distances du radar
+COLUMNS = ('x', 'y', 'angle', 'velocity', 'acceleration', 'steering', 'crashed')
+
+
+def get_column_count(beam_count):
+    return len(COLUMNS) + beam_count
+
+
+class TrajectoryRecorder:
+    """
+    Accumule les pas dans un bloc préalloué et l'écrit dans le fichier quand il est plein.
+    À utiliser comme gestionnaire de contexte, ou appeler close() pour écrire le dernier bloc
+    """
+
+    def __init__(self, file_path, beam_count, chunk_size=DEFAULT_CHUNK_SIZE, compress=True, metadata=None):
+        self.file_path = file_path
+        self.beam_count = beam_count
+        self.compress = compress
+        self.chunk = np.zeros((chunk_size, get_column_count(beam_count)), dtype=ROW_DTYPE)
+        self.row_count = 0
+        self.tick_count = 0
+        metadata_bytes = json.dumps(metadata or {}).encode('utf-8')
+        self.file = open(file_path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, beam_count, len(metadata_bytes)))
+        self.file.write(metadata_bytes)
+
+    def record(self, x, y, angle, velocity, acceleration, steering, crashed, radar_distances):
+        row = self.chunk[self.row_count]
+        row[0:len(COLUMNS)] = x, y, angle, velocity, acceleration, steering, crashed
+        row[len(COLUMNS):] = radar_distances
+        self.row_count += 1
+        self.tick_count += 1
+        if self.row_count == len(self.chunk):
+            self.flush()
+
+    def record_car(self, car, acceleration, steering):
+        """
+        Enregistre l'état d'une voiture après un pas ; acceleration et steering sont les commandes
+        appliquées pendant ce pas (entre -1 et 1)
+        """
+        self.record(car.center.x, car.center.y, car.angle, car.velocity.y, acceleration, steering, car.crashed,
+                    car.radar_distances)
+
+    def flush(self):
+        if self.row_count == 0:
+            return
+        data = self.chunk[:self.row_count].tobytes()
+        if self.compress:
+            data = zlib.compress(data)
+        self.file.write(CHUNK_HEADER.pack(self.row_count, len(data), self.compress))
+        self.file.write(data)
+        self.row_count = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Trajectory:
+    """
+    Trajectoire chargée en mémoire : data est le tableau T x C des pas enregistrés
+    """
+
+    def __init__(self, data, beam_count, metadata=None):
+        self.data = data
+        self.beam_count = beam_count
+        self.metadata = metadata or {}
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def centers(self):
+        return self.data[:, 0:2]
+
+    @property
+    def angles(self):
+        return self.data[:, 2]
+
+    @property
+    def velocities(self):
+        return self.data[:, 3]
+
+    @property
+    def actions(self):
+        return self.data[:, 4:6]
+
+    @property
+    def crashed(self):
+        return self.data[:, 6] > 0
+
+    @property
+    def radar_distances(self):
+        return self.data[:, len(COLUMNS):]
+
+
+def load_trajectory(file_path):
+    """
+    Lit tous les blocs d'un fichier .traj en une seule lecture
+    """
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    magic, version, beam_count, metadata_size = HEADER.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError("{path} n'est pas une trajectoire".format(path=file_path))
+    if version != FORMAT_VERSION:
+        raise ValueError("Version de format {version} non supportée".format(version=version))
+    offset = HEADER.size
+    metadata = json.loads(content[offset:offset + metadata_size].decode('utf-8'))
+    offset += metadata_size
+
+    column_count = get_column_count(beam_count)
+    chunks = []
+    while offset < len(content):
+        row_count, size, compressed = CHUNK_HEADER.unpack_from(content, offset)
+        offset += CHUNK_HEADER.size
+        data = content[offset:offset + size]
+        offset += size
+        if compressed:
+            data = zlib.decompress(data)
+        chunks.append(np.frombuffer(data, dtype=ROW_DTYPE).reshape(row_count, column_count))
+    data = np.concatenate(chunks) if chunks else np.empty((0, column_count), dtype=ROW_DTYPE)
+    return Trajectory(data, beam_count, metadata)
@@ -0,0 +1,221 @@
+"""
+Environnement vectorisé façon gym autour du modèle de la voiture : N environnements avancent en même temps,
+observations, récompenses et fins d'épisode sont des tableaux NumPy
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from src.car import dt
+from src.population import Population
+from src.progress import find_progress_index, create_progress_tracker
+from src.radar import Radar
+from src.track import Track, DEFAULT_TRACK_PATH
+
+DEFAULT_MAX_STEPS = 1000
+
+
+def get_buffer_specs(num_envs, beam_count):
+    """
+    Tableaux échangés à chaque pas : nom -> (forme, type)
+    """
+    return {
+        'observations': ((num_envs, beam_count), np.float32),
+        'terminal_observations': ((num_envs, beam_count), np.float32),
+        'actions': ((num_envs, 2), np.float64),
+        'rewards': ((num_envs,), np.float64),
+        'dones': ((num_envs,), np.bool_),
+        'episode_returns': ((num_envs,), np.float64),
+    }
+
+
+class VecCarEnv:
+    """
+    reset() retourne les observations N x B (distances du radar divisées par sa portée).
+    step(actions) prend les commandes N x 2 (accélération, direction entre -1 et 1) et retourne
+    (observations, rewards, dones, infos). Les environnements terminés sont remis à zéro automatiquement :
+    leur dernière observation et la somme de leurs récompenses sont dans infos.
+    Les tableaux retournés sont des copies : le pas suivant ne les modifie pas
+    """
+
+    def __init__(self, num_envs, track=None, radar=None, max_steps=DEFAULT_MAX_STEPS, step_dt=dt, buffers=None):
+        self.num_envs = num_envs
+        self.track = track if track is not None else Track.from_file(DEFAULT_TRACK_PATH)
+        self.radar = radar if radar is not None else Radar()
+        self.max_steps = max_steps
+        self.step_dt = step_dt
+        self.population = Population(num_envs, self.track)
+        # Sans ligne médiane, la récompense est la distance parcourue
+        self.progress = create_progress_tracker(find_progress_index(self.track), num_envs)
+
+        # Les tableaux de sortie peuvent être fournis (mémoire partagée du backend multiprocessus)
+        specs = get_buffer_specs(num_envs, self.radar.beam_count)
+        if buffers is None:
+            buffers = {name: np.zeros(shape, dtype) for name, (shape, dtype) in specs.items()}
+        self.observations = buffers['observations']
+        self.terminal_observations = buffers['terminal_observations']
+        self.actions = buffers['actions']
+        self.rewards = buffers['rewards']
+        self.dones = buffers['dones']
+        self.episode_returns = buffers['episode_returns']
+
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.returns = np.zeros(num_envs)
+
+    def observe(self, indices=None):
+        if indices is None:
+            distances, _, _ = self.radar.sense(self.population.centers, self.population.angles, self.track)
+            self.observations[:] = distances / self.radar.max_range
+        elif len(indices):
+            distances, _, _ = self.radar.sense(self.population.centers[indices], self.population.angles[indices],
+                                               self.track)
+            self.observations[indices] = distances / self.radar.max_range
+        return self.observations
+
+    def reset(self):
+        self.population.reset()
+        self.progress.reset(self.population.centers)
+        self.steps[:] = 0
+        self.returns[:] = 0
+        self.dones[:] = False
+        return self.observe().copy()
+
+    def step(self, actions=None):
+        """
+        Sans argument, utilise les actions déjà écrites dans self.actions
+        """
+        if actions is not None:
+            self.actions[:] = actions
+        previous_progress = self.progress.progress.copy()
+        self.population.apply_controls(self.actions)
+        self.population.step(self.step_dt)
+        self.steps += 1
+
+        # Récompense : avancement le long du circuit pendant le pas (négatif à contresens)
+        self.rewards[:] = self.progress.update(self.population.centers) - previous_progress
+        self.returns += self.rewards
+        self.dones[:] = self.population.crashed | (self.steps >= self.max_steps)
+        self.observe()
+
+        # Remise à zéro automatique des environnements terminés
+        done_indices = np.flatnonzero(self.dones)
+        self.episode_returns[:] = np.nan
+        if len(done_indices):
+            self.terminal_observations[done_indices] = self.observations[done_indices]
+            self.episode_returns[done_indices] = self.returns[done_indices]
+            self.population.reset(done_indices)
+            self.progress.reset(self.population.centers[done_indices], done_indices)
+            self.steps[done_indices] = 0
+            self.returns[done_indices] = 0
+            self.observe(done_indices)
+        return self.get_results(self.observations, self.rewards, self.dones, self.terminal_observations,
+                                self.episode_returns)
+
+    @staticmethod
+    def get_results(observations, rewards, dones, terminal_observations, episode_returns):
+        infos = {'terminal_observations': terminal_observations.copy(), 'episode_returns': episode_returns.copy()}
+        return observations.copy(), rewards.copy(), dones.copy(), infos
+
+    def close(self):
+        pass
+
+
+def run_worker(remote, buffer_names, num_envs, start, end, beam_angles, max_range, track_path, max_steps):
+    """
+    Processus d'un SubprocVecCarEnv : fait tourner les environnements [start, end) directement sur
+    les tableaux en mémoire partagée. Seules de courtes commandes transitent par le pipe
+    """
+    specs = get_buffer_specs(num_envs, len(beam_angles))
+    memories = {name: shared_memory.SharedMemory(name=buffer_names[name]) for name in specs}
+    buffers = {name: np.ndarray(shape, dtype, buffer=memories[name].buf)[start:end]
+               for name, (shape, dtype) in specs.items()}
+    env = VecCarEnv(end - start, Track.from_file(track_path), Radar(beam_angles, max_range), max_steps,
+                    buffers=buffers)
+    try:
+        while True:
+            command = remote.recv()
+            if command == 'step':
+                env.step()
+            elif command == 'reset':
+                env.reset()
+            elif command == 'close':
+                break
+            remote.send(None)
+    finally:
+        del env, buffers
+        for memory in memories.values():
+            memory.close()
+        remote.close()
+
+
+class SubprocVecCarEnv:
+    """
+    Même interface que VecCarEnv, les environnements étant répartis entre plusieurs processus.
+    Observations, actions, récompenses et fins d'épisode vivent en mémoire partagée : un pas n'envoie
+    qu'une commande de quelques octets à chaque processus, aucune donnée n'est sérialisée.
+    Les tableaux retournés sont copiés hors de la mémoire partagée : ils restent valides après le pas suivant
+    et après close()
+    """
+
+    def __init__(self, num_envs, workers=2, radar=None, track_path=DEFAULT_TRACK_PATH, max_steps=DEFAULT_MAX_STEPS):
+        self.num_envs = num_envs
+        self.radar = radar if radar is not None else Radar()
+        specs = get_buffer_specs(num_envs, self.radar.beam_count)
+
+        self.memories = {}
+        self.buffers = {}
+        for name, (shape, dtype) in specs.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            self.memories[name] = shared_memory.SharedMemory(create=True, size=size)
+            self.buffers[name] = np.ndarray(shape, dtype, buffer=self.memories[name].buf)
+            self.buffers[name][...] = 0
+        buffer_names = {name: memory.name for name, memory in self.memories.items()}
+
+        bounds = np.linspace(0, num_envs, min(workers, num_envs) + 1).astype(int)
+        self.remotes = []
+        self.processes = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            remote, worker_remote = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(worker_remote, buffer_names, num_envs, start, end, tuple(self.radar.beam_angles),
+                      self.radar.max_range, track_path, max_steps),
+                daemon=True)
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+    def send_command(self, command):
+        for remote in self.remotes:
+            remote.send(command)
+        for remote in self.remotes:
+            remote.recv()
+
+    def reset(self):
+        self.send_command('reset')
+        return self.buffers['observations'].copy()
+
+    def step(self, actions):
+        self.buffers['actions'][:] = actions
+        self.send_command('step')
+        return VecCarEnv.get_results(self.buffers['observations'], self.buffers['rewards'], self.buffers['dones'],
+                                     self.buffers['terminal_observations'], self.buffers['episode_returns'])
+
+    def close(self):
+        if not self.processes:
+            return
+        for remote in self.remotes:
+            remote.send('close')
+        for process in self.processes:
+            process.join()
+        self.buffers = {}
+        for memory in self.memories.values():
+            memory.close()
+            memory.unlink()
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,81 @@
+"""
+Points de reprise : aller-retour sur disque, reprise d'un entraînement, évaluation depuis le fichier
+et enregistrement du champion d'un entraînement repris déjà terminé
+"""
+import sys
+import numpy as np
+from src.checkpoint import write_checkpoint, load_checkpoint, HISTORY_COLUMNS
+from src.genetic import GeneticTrainer, evaluate_checkpoint_rows, evaluate_genome, init_worker, main
+from src.radar import Radar
+from src.track import Track, DEFAULT_TRACK_PATH
+from src.trajectory import TrajectoryRecorder, load_trajectory
+
+TRAINER_OPTIONS = {'population_size': 6, 'max_steps': 60, 'workers': 1, 'seed': 0}
+
+
+def test_write_and_load(tmp_path):
+    path = str(tmp_path / 'population.ckpt')
+    rng = np.random.default_rng(0)
+    population = rng.normal(0, 1, (7, 13))
+    history = rng.normal(0, 1, (3, len(HISTORY_COLUMNS)))
+    write_checkpoint(path, population, 3, history, 'ab' * 32, {'layer_sizes': [5, 4, 2]})
+
+    weights, loaded_history, header = load_checkpoint(path)
+    assert isinstance(weights, np.memmap)
+    assert not weights.flags.writeable
+    np.testing.assert_array_equal(weights, population.astype(np.float32))
+    np.testing.assert_array_equal(loaded_history, history.astype(np.float32))
+    assert header['generation'] == 3
+    assert header['track_hash'] == 'ab' * 32
+    assert header['metadata'] == {'layer_sizes': [5, 4, 2]}
+    assert not (tmp_path / 'population.ckpt.tmp').exists()
+
+
+def test_resume_reproduces_training(tmp_path):
+    path = str(tmp_path / 'training.ckpt')
+    with GeneticTrainer(checkpoint_path=path, checkpoint_interval=2, **TRAINER_OPTIONS) as trainer:
+        trainer.train(4)
+        expected_history = trainer.history
+
+    with GeneticTrainer(checkpoint_path=str(tmp_path / 'other.ckpt'), checkpoint_interval=2,
+                        **TRAINER_OPTIONS) as trainer:
+        trainer.train(2)
+    with GeneticTrainer(**TRAINER_OPTIONS) as trainer:
+        trainer.resume(str(tmp_path / 'other.ckpt'))
+        assert trainer.generation == 2
+        trainer.train(2)
+        np.testing.assert_allclose(trainer.history, expected_history)
+
+
+def test_evaluate_checkpoint_rows(tmp_path):
+    path = str(tmp_path / 'rows.ckpt')
+    trainer = GeneticTrainer(**TRAINER_OPTIONS)
+    trainer.save_checkpoint(path)
+    weights, _, _ = load_checkpoint(path)
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    expected = [evaluate_genome(genome, trainer.layer_sizes, trainer.max_steps, track) for genome in weights[2:5]]
+
+    init_worker(DEFAULT_TRACK_PATH)
+    assert evaluate_checkpoint_rows(path, 0, 2, 5, trainer.layer_sizes, trainer.max_steps) == expected
+
+
+def test_record_after_resuming_finished_training(tmp_path, monkeypatch):
+    # Le point de reprise a déjà atteint --generations : la population reprise est évaluée pour l'enregistrement
+    path = str(tmp_path / 'finished.ckpt')
+    with GeneticTrainer(checkpoint_path=path, checkpoint_interval=1, **TRAINER_OPTIONS) as trainer:
+        trainer.train(2)
+    trajectory_path = str(tmp_path / 'champion.traj')
+    monkeypatch.setattr(sys, 'argv', ['genetic', '--generations', '2', '--population', '6', '--workers', '1',
+                                      '--max-steps', '60', '--checkpoint', path, '--resume',
+                                      '--record', trajectory_path])
+    main()
+
+    weights, _, _ = load_checkpoint(path)
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    fitness = [evaluate_genome(genome, trainer.layer_sizes, 60, track) for genome in weights]
+    expected_path = str(tmp_path / 'expected.traj')
+    with TrajectoryRecorder(expected_path, Radar().beam_count) as recorder:
+        evaluate_genome(weights[int(np.argmax(fitness))], trainer.layer_sizes, 60, track, recorder)
+    trajectory = load_trajectory(trajectory_path)
+    assert trajectory.metadata['generation'] == 2
+    np.testing.assert_array_equal(trajectory.data, load_trajectory(expected_path).data)
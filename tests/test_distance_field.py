@@ -0,0 +1,63 @@
+"""
+Champ de distance : valeurs exactes aux nœuds, et le radar par sphere tracing comme les collisions qui s'en servent
+donnent les mêmes résultats que le lancer de rayons exact sur le circuit par défaut et sur un circuit généré
+"""
+import numpy as np
+import pytest
+from src.collision import find_collisions
+from src.distance_field import get_point_segment_distances
+from src.population import Population
+from src.radar import Radar
+from src.track import Track, DEFAULT_TRACK_PATH
+from src.track_generator import generate_track
+
+RESOLUTION = 2.0
+CAR_COUNT = 32
+STEP_COUNT = 100
+
+
+def create_generated_track():
+    segments, start_position = generate_track(0)
+    return Track(segments=segments, start_position=start_position)
+
+
+TRACKS = [lambda: Track.from_file(DEFAULT_TRACK_PATH), create_generated_track]
+
+
+@pytest.mark.parametrize('create_track', TRACKS)
+def test_field_matches_exact_distances(create_track):
+    track = create_track()
+    field = track.get_distance_field(RESOLUTION)
+    rows, columns = np.mgrid[0:field.rows, 0:field.columns]
+    nodes = np.column_stack((columns.ravel(), rows.ravel())) * RESOLUTION
+    expected = get_point_segment_distances(nodes, track.get_segments_array()).min(axis=1)
+    # Le champ est stocké en float32
+    np.testing.assert_allclose(field.distances.ravel(), expected, atol=1e-4)
+
+
+@pytest.mark.parametrize('create_track', TRACKS)
+def test_traced_radar_and_collisions_match_exact(create_track):
+    track = create_track()
+    field = track.get_distance_field(RESOLUTION)
+    radar = Radar()
+    traced_radar = Radar(field_resolution=RESOLUTION)
+    population = Population(CAR_COUNT, track)
+    rng = np.random.default_rng(0)
+    for _ in range(STEP_COUNT):
+        distances, points, indices = radar.sense(population.centers, population.angles, track)
+        traced_distances, traced_points, traced_indices = traced_radar.sense(population.centers, population.angles,
+                                                                             track)
+        np.testing.assert_array_equal(traced_indices, indices)
+        np.testing.assert_allclose(traced_distances, distances, atol=1e-6)
+        np.testing.assert_allclose(traced_points, points, atol=1e-6)
+
+        corners = population.get_corners()
+        crashed, contact_points = find_collisions(corners, track)
+        field_crashed, field_contact_points = field.find_collisions(corners, track)
+        np.testing.assert_array_equal(field_crashed, crashed)
+        np.testing.assert_allclose(field_contact_points, contact_points)
+
+        actions = np.column_stack((rng.uniform(-1, 0.2, CAR_COUNT), rng.uniform(-0.5, 0.5, CAR_COUNT)))
+        population.apply_controls(actions)
+        population.step()
+        population.reset(np.flatnonzero(population.crashed))
@@ -0,0 +1,83 @@
+"""
+Budgets d'évaluation adaptatifs : mêmes fitness que evaluate_genome() à budget unique, promotion des meilleurs
+d'un échelon au suivant, et raisons d'arrêt des évaluations
+"""
+import math
+import numpy as np
+from src.evaluation import EvaluationScheduler, TerminationRules, get_budgets, RUNNING, CRASHED, STALLED, FINISHED
+from src.genetic import evaluate_genome, get_layer_sizes, get_genome_size, DEFAULT_HIDDEN_LAYERS
+from src.radar import Radar
+from src.track import Track, DEFAULT_TRACK_PATH
+
+POPULATION_SIZE = 60
+
+
+def get_genomes(seed=0):
+    layer_sizes = get_layer_sizes(Radar().beam_count, DEFAULT_HIDDEN_LAYERS)
+    # Même tirage que la population initiale de GeneticTrainer
+    return layer_sizes, np.random.default_rng(seed).normal(0, 1, (POPULATION_SIZE, get_genome_size(layer_sizes)))
+
+
+def test_single_budget_matches_evaluate_genome():
+    layer_sizes, genomes = get_genomes()
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    budget = 300
+    fitness = EvaluationScheduler(layer_sizes, [track], budgets=(budget,)).evaluate(genomes)
+    expected = [evaluate_genome(genome, layer_sizes, budget, track) for genome in genomes]
+    np.testing.assert_allclose(fitness, expected, rtol=0, atol=1e-9)
+
+
+def test_promotion_keeps_best_fraction():
+    layer_sizes, genomes = get_genomes(1)
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    budgets = (10, 60)
+    keep_fraction = 1 / 3
+    first_rung = EvaluationScheduler(layer_sizes, [track], budgets=budgets[:1]).evaluate(genomes)
+    full = EvaluationScheduler(layer_sizes, [track], budgets=budgets[1:]).evaluate(genomes)
+    scheduler = EvaluationScheduler(layer_sizes, [track], budgets=budgets, keep_fraction=keep_fraction)
+    fitness = scheduler.evaluate(genomes)
+
+    # Les promus finissent leur évaluation comme sans échelon, les autres gardent leur fitness du premier échelon
+    keep_count = int(math.ceil(len(genomes) * keep_fraction))
+    promoted = np.zeros(len(genomes), dtype=bool)
+    promoted[np.argsort(-first_rung, kind='stable')[:keep_count]] = True
+    np.testing.assert_allclose(fitness[promoted], full[promoted], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(fitness[~promoted], first_rung[~promoted], rtol=0, atol=1e-9)
+    assert scheduler.stats['eliminated'] > 0
+    assert sum(scheduler.stats[name] for name in ('crashed', 'stalled', 'finished', 'out_of_budget',
+                                                  'eliminated')) == len(genomes)
+
+
+def test_halving_saves_steps():
+    layer_sizes, genomes = get_genomes(2)
+    scheduler = EvaluationScheduler(layer_sizes, [Track.from_file(DEFAULT_TRACK_PATH)], budgets=get_budgets(2000))
+    scheduler.evaluate(genomes)
+    # Au moins un ordre de grandeur de pas simulés en moins qu'avec le budget complet pour tous
+    assert scheduler.stats['steps'] * 10 < scheduler.stats['full_steps']
+
+
+def test_get_budgets():
+    assert get_budgets(1000) == (111, 333, 1000)
+    assert get_budgets(10, rung_count=4, keep_fraction=0.5) == (1, 2, 5, 10)
+    assert get_budgets(1000, rung_count=1) == (1000,)
+
+
+def test_termination_reasons():
+    rules = TerminationRules(4, track_length=100.0, stall_ticks=5, laps=1)
+    rules.reset(np.zeros(4))
+    crashed = np.array([False, True, False, False])
+    for tick in range(1, 5):
+        progress = np.array([2.0 * tick, 2.0 * tick, 0.1 * tick, 2.0 * tick])
+        assert (rules.update(progress, crashed, tick) == [RUNNING, CRASHED, RUNNING, RUNNING]).all()
+    # Moins de min_improvement en stall_ticks pas : arrêtée ; un tour fini : terminée ; l'accident l'emporte
+    progress = np.array([10.0, 100.0, 0.5, 100.0])
+    assert (rules.update(progress, crashed, 5) == [RUNNING, CRASHED, STALLED, FINISHED]).all()
+
+
+def test_termination_without_track_length():
+    rules = TerminationRules(1, track_length=None, stall_ticks=3)
+    rules.reset([0.0])
+    assert rules.max_progress == np.inf
+    for tick in range(1, 3):
+        assert rules.update(np.array([1e6 * tick]), np.array([False]), tick)[0] == RUNNING
+    assert rules.update(np.array([2e6]), np.array([False]), 5)[0] == STALLED
@@ -0,0 +1,27 @@
+"""
+Entraînement génétique : le génome retourné par train() est bien le champion de la dernière génération,
+et --record enregistre un champion même sans génération entraînée
+"""
+import sys
+import numpy as np
+from src.genetic import GeneticTrainer, evaluate_genome, main
+from src.track import Track, DEFAULT_TRACK_PATH
+from src.trajectory import load_trajectory
+
+
+def test_train_returns_champion():
+    with GeneticTrainer(population_size=8, max_steps=100, workers=1, seed=0) as trainer:
+        best_genome = trainer.train(2)
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    assert evaluate_genome(best_genome, trainer.layer_sizes, trainer.max_steps, track) == trainer.fitness.max()
+
+
+def test_record_without_training(tmp_path, monkeypatch):
+    # --generations 0 : le meilleur génome de la population initiale est enregistré
+    path = str(tmp_path / 'champion.traj')
+    monkeypatch.setattr(sys, 'argv', ['genetic', '--generations', '0', '--population', '4', '--workers', '1',
+                                      '--max-steps', '10', '--seed', '0', '--record', path])
+    main()
+    trajectory = load_trajectory(path)
+    assert 2 <= len(trajectory) <= 11
+    assert trajectory.metadata['generation'] == 0
@@ -0,0 +1,59 @@
+"""
+La population vectorisée reproduit le modèle bicyclette de Car : mêmes positions, angles et vitesses
+pas après pas, et mêmes accidents
+"""
+import numpy as np
+from src.car import Car
+from src.population import Population
+from src.track import Track, DEFAULT_TRACK_PATH
+
+CAR_COUNT = 8
+STEP_COUNT = 150
+
+
+def get_random_actions(rng):
+    # Surtout en avant, avec des braquages francs dans les deux sens
+    actions = rng.uniform(-1, 1, (STEP_COUNT, CAR_COUNT, 2))
+    actions[:, :, 0] = rng.uniform(-1, 0.3, (STEP_COUNT, CAR_COUNT))
+    return actions
+
+
+def run_cars(track, actions):
+    cars = [Car(track=track) for _ in range(CAR_COUNT)]
+    states = []
+    for step_actions in actions:
+        for car, (acceleration, steering) in zip(cars, step_actions):
+            if not car.crashed:
+                car.apply_controls(acceleration, steering)
+                car.update()
+        states.append([(car.center.x, car.center.y, car.angle, car.velocity.y, car.crashed) for car in cars])
+    return np.array(states)
+
+
+def run_population(track, actions):
+    population = Population(CAR_COUNT, track)
+    states = []
+    for step_actions in actions:
+        population.apply_controls(step_actions)
+        population.step()
+        states.append(np.column_stack((population.centers, population.angles, population.velocities,
+                                       population.crashed)))
+    return np.array(states)
+
+
+def test_kinematics_match_car_without_track():
+    actions = get_random_actions(np.random.default_rng(0))
+    track = Track()
+    np.testing.assert_allclose(run_population(track, actions), run_cars(track, actions), atol=1e-6)
+
+
+def test_crashes_match_car():
+    actions = get_random_actions(np.random.default_rng(1))
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    car_states = run_cars(track, actions)
+    population_states = run_population(track, actions)
+    assert car_states[-1, :, 4].any()
+    np.testing.assert_array_equal(population_states[:, :, 4], car_states[:, :, 4])
+    # Une voiture accidentée reste en place : seules les poses des voitures en course sont comparées
+    running = car_states[:, :, 4] == 0
+    np.testing.assert_allclose(population_states[:, :, :3][running], car_states[:, :, :3][running], atol=1e-6)
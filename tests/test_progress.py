@@ -0,0 +1,50 @@
+"""
+Avancement le long de la ligne médiane : projection cohérente avec get_points(), et tours comptés
+au passage de la ligne de départ dans un sens comme dans l'autre
+"""
+import numpy as np
+from src.progress import ProgressTracker, DistanceTracker, create_progress_tracker, find_progress_index
+from src.track import Track, DEFAULT_TRACK_PATH
+
+
+def get_index():
+    return find_progress_index(Track.from_file(DEFAULT_TRACK_PATH))
+
+
+def test_project_inverts_get_points():
+    index = get_index()
+    distances = np.linspace(0, index.length, 200, endpoint=False)
+    projected, offsets = index.project(index.get_points(distances))
+    # Au départ, la distance peut revenir à length au lieu de 0
+    np.testing.assert_allclose((projected - distances + index.length / 2) % index.length - index.length / 2, 0,
+                               atol=1e-6)
+    np.testing.assert_allclose(offsets, 0, atol=1e-6)
+
+
+def test_laps_wrap_at_start_line():
+    index = get_index()
+    tracker = create_progress_tracker(index, 2)
+    assert isinstance(tracker, ProgressTracker)
+    # Deux voitures partent du départ, l'une en avant sur deux tours et demi, l'autre à reculons
+    step = 20.0
+    distances = np.arange(0, 2.5 * index.length, step)
+    tracker.reset(index.get_points([0.0, 0.0]))
+    for distance in distances[1:]:
+        tracker.update(index.get_points([distance, -distance]))
+    np.testing.assert_allclose(tracker.progress, [distances[-1], -distances[-1]], atol=1e-6)
+    np.testing.assert_array_equal(tracker.laps, [2, -3])
+    np.testing.assert_allclose(tracker.best_progress, [distances[-1], 0], atol=1e-6)
+    np.testing.assert_allclose(tracker.positions, np.array([distances[-1], -distances[-1]]) % index.length,
+                               atol=1e-6)
+
+
+def test_distance_tracker_without_centerline():
+    track = Track()
+    assert find_progress_index(track) is None
+    tracker = create_progress_tracker(None, 1)
+    assert isinstance(tracker, DistanceTracker)
+    tracker.reset([[0.0, 0.0]])
+    tracker.update([[3.0, 4.0]])
+    tracker.update([[3.0, 0.0]])
+    np.testing.assert_allclose(tracker.progress, [9.0])
+    np.testing.assert_array_equal(tracker.laps, [0])
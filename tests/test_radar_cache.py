@@ -0,0 +1,37 @@
+"""
+Le cache de cohérence temporelle du radar donne exactement les mesures de Radar.sense(), pas après pas,
+y compris quand des voitures s'écrasent et sont remises au départ
+"""
+import numpy as np
+from src.population import Population
+from src.radar import Radar
+from src.radar_cache import RadarCache, MIN_CACHED_SEGMENTS
+from src.track import Track
+from src.track_generator import generate_track
+
+CAR_COUNT = 16
+STEP_COUNT = 120
+
+
+def test_cache_matches_radar():
+    segments, start_position = generate_track(0)
+    track = Track(segments=segments, start_position=start_position)
+    assert len(track.get_segments_array()) >= MIN_CACHED_SEGMENTS
+    radar = Radar()
+    cache = RadarCache(radar)
+    population = Population(CAR_COUNT, track)
+    rng = np.random.default_rng(0)
+    for _ in range(STEP_COUNT):
+        distances, points, indices = cache.sense(population.centers, population.angles, track)
+        expected_distances, expected_points, expected_indices = radar.sense(population.centers, population.angles,
+                                                                            track)
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(points, expected_points, rtol=1e-9, atol=1e-9)
+
+        actions = np.column_stack((rng.uniform(-1, 0.2, CAR_COUNT), rng.uniform(-0.5, 0.5, CAR_COUNT)))
+        population.apply_controls(actions)
+        population.step()
+        population.reset(np.flatnonzero(population.crashed))
+    # La plupart des faisceaux sont résolus par le cache
+    assert cache.cache_hits > cache.full_queries
@@ -0,0 +1,82 @@
+"""
+Validation du noyau vectorisé de src/raycast.py contre l'implémentation de référence basée sur shapely
+"""
+import numpy as np
+from src.raycast import cast_rays, cast_rays_reference, find_intersections
+from src.utils import get_segments_intersection_point
+
+# Cas limites : (rayon, segment, touché)
+EDGE_CASES = [
+    # Parallèles
+    ([0, 0, 10, 0], [0, 5, 10, 5], False),
+    # Colinéaires et superposés : shapely renvoie une ligne, le noyau un dénominateur nul
+    ([0, 0, 10, 0], [2, 0, 8, 0], False),
+    # Extrémité du rayon sur le segment
+    ([0, 0, 10, 0], [10, -5, 10, 5], True),
+    # Extrémité du segment sur le rayon
+    ([0, 0, 10, 0], [5, 0, 5, 5], True),
+    # Extrémités communes
+    ([0, 0, 10, 0], [10, 0, 15, 5], True),
+    # Origine du rayon sur le segment
+    ([0, 0, 10, 0], [0, -5, 0, 5], True),
+    # Sans contact
+    ([0, 0, 10, 0], [11, -5, 11, 5], False),
+    ([0, 0, 10, 0], [5, 1, 5, 5], False),
+]
+
+
+def get_random_lines(rng, count, size=100.0):
+    return rng.uniform(0, size, (count, 4))
+
+
+def assert_same_results(rays, segments):
+    distances, points, indices = cast_rays(rays, segments)
+    reference_distances, reference_points, reference_indices = cast_rays_reference(rays, segments)
+    np.testing.assert_array_equal(indices, reference_indices)
+    np.testing.assert_allclose(distances, reference_distances, atol=1e-9)
+    np.testing.assert_allclose(points, reference_points, atol=1e-9)
+
+
+def test_cast_rays_edge_cases():
+    for ray, segment, expected_hit in EDGE_CASES:
+        rays, segments = np.array([ray], dtype=float), np.array([segment], dtype=float)
+        assert_same_results(rays, segments)
+        _, _, indices = cast_rays(rays, segments)
+        assert (indices[0] >= 0) == expected_hit, (ray, segment)
+
+
+def test_cast_rays_random():
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        assert_same_results(get_random_lines(rng, 50), get_random_lines(rng, 40))
+
+
+def test_cast_rays_closest_hit():
+    # Trois murs sur le chemin du rayon : seul le plus proche compte, quel que soit l'ordre des segments
+    rays = np.array([[0, 0, 100, 0]], dtype=float)
+    segments = np.array([[70, -5, 70, 5], [30, -5, 30, 5], [50, -5, 50, 5]], dtype=float)
+    distances, points, indices = cast_rays(rays, segments)
+    assert indices[0] == 1
+    assert distances[0] == 30
+    np.testing.assert_array_equal(points[0], [30, 0])
+    assert_same_results(rays, segments)
+
+
+def test_cast_rays_empty():
+    distances, points, indices = cast_rays(np.empty((3, 4)), np.empty((0, 4)))
+    assert np.isinf(distances).all() and np.isnan(points).all() and (indices == -1).all()
+    distances, points, indices = cast_rays(np.empty((0, 4)), get_random_lines(np.random.default_rng(1), 5))
+    assert distances.shape == (0,) and points.shape == (0, 2) and indices.shape == (0,)
+
+
+def test_find_intersections():
+    rng = np.random.default_rng(2)
+    lines = np.vstack((get_random_lines(rng, 30), [case[0] for case in EDGE_CASES]))
+    segments = np.vstack((get_random_lines(rng, 30), [case[1] for case in EDGE_CASES]))
+    expected = []
+    for line in lines:
+        for segment in segments:
+            intersection_point = get_segments_intersection_point(line, segment)
+            if intersection_point:
+                expected.append(intersection_point)
+    np.testing.assert_allclose(find_intersections(lines, segments), np.array(expected).reshape(-1, 2), atol=1e-9)
@@ -0,0 +1,73 @@
+"""
+Instantanés de simulation : la sérialisation ne perd rien, et une simulation restaurée reprend
+avec la même horloge et les mêmes trajectoires que l'originale
+"""
+import numpy as np
+from src.progress import create_progress_tracker, find_progress_index
+from src.simulation import Simulation
+from src.snapshot import SimulationState, capture_simulation, restore_simulation
+from src.track import Track, DEFAULT_TRACK_PATH
+
+CONTROLS = [(-0.6, 0.0), (-1.0, 0.2), (-0.3, -0.4)]
+
+
+def create_simulation(track):
+    simulation = Simulation(track)
+    for acceleration, steering in CONTROLS:
+        simulation.add_car().apply_controls(acceleration, steering)
+    return simulation
+
+
+def get_centers(simulation):
+    return np.array([(car.center.x, car.center.y) for car in simulation.cars])
+
+
+def test_state_bytes_round_trip():
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    simulation = create_simulation(track)
+    simulation.run(30)
+    progress = create_progress_tracker(find_progress_index(track), len(simulation.cars))
+    progress.reset(get_centers(simulation))
+    rng = np.random.default_rng(0)
+    rng.random(5)
+    state = capture_simulation(simulation, progress, rng)
+
+    copy = SimulationState.from_bytes(state.to_bytes())
+    np.testing.assert_array_equal(copy.data, state.data)
+    assert (copy.beam_count, copy.tick, copy.time, copy.rng_state) == \
+        (state.beam_count, state.tick, state.time, state.rng_state)
+    assert (copy.tick, copy.time) == (30, simulation.time)
+
+
+def test_restored_simulation_continues_identically():
+    track = Track.from_file(DEFAULT_TRACK_PATH)
+    simulation = create_simulation(track)
+    simulation.run(20)
+    rng = np.random.default_rng(1)
+    state = SimulationState.from_bytes(capture_simulation(simulation, rng=rng).to_bytes())
+    expected_draw = rng.random()
+
+    restored = Simulation(track)
+    restored.add_car()
+    restored_rng = np.random.default_rng(2)
+    assert restore_simulation(restored, state, rng=restored_rng) == 20
+    assert (restored.tick, restored.time) == (simulation.tick, simulation.time)
+    assert restored_rng.random() == expected_draw
+
+    # Le braquage est remis à zéro à chaque pas : seule l'accélération continue d'agir
+    simulation.run(20)
+    restored.run(20)
+    assert (restored.tick, restored.time) == (simulation.tick, simulation.time)
+    np.testing.assert_allclose(get_centers(restored), get_centers(simulation), atol=1e-9)
+    assert [car.crashed for car in restored.cars] == [car.crashed for car in simulation.cars]
+
+
+def test_restore_forked_state():
+    simulation = create_simulation(Track.from_file(DEFAULT_TRACK_PATH))
+    simulation.run(10)
+    state = capture_simulation(simulation).fork(2)
+    restored = Simulation(simulation.track)
+    restore_simulation(restored, state)
+    assert len(restored.cars) == 2 * len(CONTROLS)
+    np.testing.assert_allclose(get_centers(restored), np.repeat(get_centers(simulation), 2, axis=0))
+    assert restored.tick == simulation.tick
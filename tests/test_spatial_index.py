@@ -0,0 +1,84 @@
+"""
+La grille uniforme ne doit jamais perdre un segment touché : ses candidats contiennent tous les impacts
+trouvés en testant tous les segments, et le radar qui s'en sert donne exactement le même résultat
+"""
+import numpy as np
+from src.radar import Radar, cast_rays_indexed
+from src.raycast import get_intersection_parameters, cast_rays
+from src.spatial_index import UniformGrid
+
+
+def get_random_segments(rng, count, width=800, height=610):
+    starts = rng.uniform((0, 0), (width, height), (count, 2))
+    angles = rng.uniform(0, 2 * np.pi, count)
+    lengths = rng.uniform(5, 3000 / np.sqrt(count), count)
+    return np.hstack((starts, starts + np.column_stack((np.cos(angles), np.sin(angles))) * lengths[:, None]))
+
+
+def get_random_rays(rng, count):
+    # Quelques rayons sortent de la zone de jeu, d'autres sont horizontaux ou verticaux
+    rays = rng.uniform(-100, 900, (count, 4))
+    rays[:count // 8, 3] = rays[:count // 8, 1]
+    rays[count // 8:count // 4, 2] = rays[count // 8:count // 4, 0]
+    return rays
+
+
+def test_ray_candidates_contain_all_hits():
+    rng = np.random.default_rng(0)
+    segments = get_random_segments(rng, 3000)
+    grid = UniformGrid(segments, 800, 610, brute_force_threshold=0)
+    rays = get_random_rays(rng, 400)
+    _, hit = get_intersection_parameters(rays, segments)
+    expected = set(zip(*np.nonzero(hit)))
+
+    ray_indices, segment_indices = grid.query_ray_pairs(rays)
+    assert expected <= set(zip(ray_indices, segment_indices))
+    # Triés par rayon puis par segment, sans doublon
+    keys = ray_indices * len(segments) + segment_indices
+    assert np.all(np.diff(keys) > 0)
+
+    union = set(grid.query_rays(rays))
+    assert {segment for _, segment in expected} <= union
+
+
+def test_box_candidates_contain_all_overlaps():
+    rng = np.random.default_rng(1)
+    segments = get_random_segments(rng, 3000)
+    grid = UniformGrid(segments, 800, 610, brute_force_threshold=0)
+    corners = rng.uniform(0, 800, (200, 2))
+    boxes = np.hstack((corners, corners + rng.uniform(1, 40, (200, 2))))
+    box_indices, segment_indices = grid.query_boxes(boxes)
+    pairs = set(zip(box_indices, segment_indices))
+    for box_index, box in enumerate(boxes):
+        # Segments dont une extrémité est dans la boîte : ils la traversent forcément
+        inside = np.flatnonzero(np.any((segments[:, 0::2] >= box[0]) & (segments[:, 0::2] <= box[2])
+                                       & (segments[:, 1::2] >= box[1]) & (segments[:, 1::2] <= box[3]), axis=1))
+        assert {(box_index, segment) for segment in inside} <= pairs
+        assert set(inside) <= set(grid.query_box(*box))
+
+
+def test_indexed_cast_matches_brute_force():
+    rng = np.random.default_rng(2)
+    segments = get_random_segments(rng, 3000)
+    rays = get_random_rays(rng, 2000)
+    distances, points, indices = cast_rays(rays, segments)
+    for threshold in (0, len(segments)):
+        grid = UniformGrid(segments, 800, 610, brute_force_threshold=threshold)
+        indexed_distances, indexed_points, indexed_indices = cast_rays_indexed(rays, segments, grid, 1500)
+        np.testing.assert_array_equal(indexed_indices, indices)
+        np.testing.assert_allclose(indexed_distances, distances)
+        np.testing.assert_allclose(indexed_points, points)
+
+
+def test_radar_population_matches_brute_force():
+    rng = np.random.default_rng(3)
+    segments = get_random_segments(rng, 5000)
+    radar = Radar()
+    origins = rng.uniform((0, 0), (800, 610), (300, 2))
+    angles = rng.uniform(0, 360, 300)
+    rays = radar.get_rays(origins, angles).reshape(-1, 4)
+    distances, _, indices = cast_rays(rays, segments)
+    grid = UniformGrid(segments, 800, 610)
+    indexed_distances, _, indexed_indices = cast_rays_indexed(rays, segments, grid, radar.max_range)
+    np.testing.assert_array_equal(indexed_indices, indices)
+    np.testing.assert_allclose(indexed_distances, distances)
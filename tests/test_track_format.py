@@ -0,0 +1,67 @@
+"""
+Circuits binaires (.trk) : aller-retour écriture / conversion et chargement sans copie, et fichiers abîmés refusés
+"""
+import numpy as np
+import pytest
+from src.track import Track, DEFAULT_TRACK_PATH, DEFAULT_START_POSITION, read_track_file
+from src.track_format import write_binary_track, convert_text_track, load_binary_track, load_track_file, \
+    compute_segments_hash, HEADER
+
+
+def write_track(tmp_path, segment_count=50):
+    path = str(tmp_path / 'track.trk')
+    segments = np.random.default_rng(0).uniform(0, 600, (segment_count, 4))
+    write_binary_track(path, segments, 700, 500, {'start_position': [10, 20]})
+    return path, segments
+
+
+def test_write_and_load(tmp_path):
+    path, segments = write_track(tmp_path)
+    loaded, header = load_binary_track(path, verify=True)
+    np.testing.assert_array_equal(loaded, segments.astype(np.float32))
+    assert (header['width'], header['height']) == (700, 500)
+    assert header['hash'] == compute_segments_hash(segments)
+    assert load_track_file(path)[1] == (10, 20)
+
+
+def test_convert_text_track(tmp_path):
+    path = convert_text_track(DEFAULT_TRACK_PATH, str(tmp_path / 'circuit01.trk'))
+    segments, start_position = load_track_file(path)
+    np.testing.assert_array_equal(segments, np.array(read_track_file(DEFAULT_TRACK_PATH), dtype=np.float32))
+    assert start_position == DEFAULT_START_POSITION
+    assert compute_segments_hash(segments) == compute_segments_hash(Track.from_file(DEFAULT_TRACK_PATH)
+                                                                    .get_segments_array())
+
+
+def test_memmap_without_copy(tmp_path):
+    path, _ = write_track(tmp_path)
+    segments, _ = load_binary_track(path)
+    assert isinstance(segments, np.memmap)
+    assert not segments.flags.writeable
+    # La géométrie compilée du circuit lit directement les pages du fichier
+    track = Track.from_file(path)
+    assert isinstance(track.segments, np.memmap)
+    assert np.shares_memory(track.get_segments_array(), track.segments)
+
+
+def test_corrupted_track(tmp_path):
+    path, _ = write_track(tmp_path)
+    with open(path, 'r+b') as file:
+        file.seek(-8, 2)
+        file.write(b'\xff' * 8)
+    # Le chargement rapide ne lit pas les segments ; load_track_file vérifie l'empreinte
+    load_binary_track(path)
+    with pytest.raises(ValueError):
+        load_binary_track(path, verify=True)
+    with pytest.raises(ValueError):
+        load_track_file(path)
+
+
+def test_truncated_track(tmp_path):
+    path, _ = write_track(tmp_path)
+    with open(path, 'r+b') as file:
+        file.truncate(HEADER.size + 200)
+    with pytest.raises(ValueError):
+        load_binary_track(path)
+    with pytest.raises(ValueError):
+        Track.from_file(path)
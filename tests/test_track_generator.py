@@ -0,0 +1,44 @@
+"""
+Circuits générés : une graine donne toujours le même circuit, deux graines des circuits différents,
+et le cache .trk est indexé par la graine et les paramètres
+"""
+import os
+import numpy as np
+from src import track_generator
+from src.track_format import load_track_file
+from src.track_generator import generate_track, generate_tracks, get_cache_path, get_parameters
+
+
+def test_same_seed_same_track():
+    segments, start_position = generate_track(0)
+    other_segments, other_start_position = generate_track(0)
+    np.testing.assert_array_equal(segments, other_segments)
+    assert start_position == other_start_position
+
+
+def test_different_seeds_different_tracks():
+    tracks = [generate_track(seed)[0] for seed in range(3)]
+    for index, segments in enumerate(tracks):
+        for other in tracks[index + 1:]:
+            assert segments.shape != other.shape or not np.array_equal(segments, other)
+
+
+def test_cache(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    paths = generate_tracks([0, 1], workers=1, cache_dir=cache_dir)
+    assert all(os.path.exists(path) for path in paths)
+    segments, start_position = load_track_file(paths[0])
+    expected_segments, expected_start_position = generate_track(0)
+    np.testing.assert_array_equal(segments, np.asarray(expected_segments, dtype=np.float32))
+    assert start_position == tuple(expected_start_position)
+
+    # Deuxième appel : tout vient du cache, rien n'est régénéré
+    def fail(*arguments):
+        raise AssertionError("circuit régénéré malgré le cache")
+    monkeypatch.setattr(track_generator, 'write_generated_track', fail)
+    assert generate_tracks([0, 1], workers=1, cache_dir=cache_dir) == paths
+
+    # Un autre paramètre ou une autre graine donne une autre entrée du cache
+    parameters = get_parameters()
+    assert get_cache_path(0, get_parameters(half_width=25.0), cache_dir) != get_cache_path(0, parameters, cache_dir)
+    assert get_cache_path(2, parameters, cache_dir) not in paths
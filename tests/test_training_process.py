@@ -0,0 +1,41 @@
+"""
+Arrêt de l'entraînement en arrière-plan : stop() rend la main tout de suite et le processus se termine
+de lui-même, sans attendre STOP_TIMEOUT
+"""
+import time
+from src.training_process import TrainingProcess, STOP_TIMEOUT
+
+TRAINING_OPTIONS = {'workers': 2, 'population_size': 8, 'max_steps': 2000}
+
+
+def wait_until(condition, timeout):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.05)
+
+
+def stop(training):
+    start = time.monotonic()
+    training.stop()
+    assert time.monotonic() - start < 0.5
+    wait_until(training.poll_stop, STOP_TIMEOUT / 2)
+    assert training.process.exitcode == 0
+
+
+def test_stop_and_restart():
+    for _ in range(2):
+        training = TrainingProcess(**TRAINING_OPTIONS)
+        training.start()
+        wait_until(training.poll, 60)
+        assert training.champion is not None
+        stop(training)
+
+
+def test_stop_after_finishing():
+    # Le processus s'est terminé seul : stop() ne doit pas attendre le thread qui surveillait l'arrêt
+    training = TrainingProcess(generations=1, **TRAINING_OPTIONS)
+    training.start()
+    wait_until(lambda: training.poll() or training.finished, 60)
+    wait_until(lambda: not training.is_running, 60)
+    stop(training)
@@ -0,0 +1,107 @@
+"""
+Trajectoires : aller-retour enregistrement / relecture sur plusieurs blocs, compressés ou non,
+et déplacements dans la relecture (avance, vitesse, pause)
+"""
+import numpy as np
+import pytest
+from src.car import Car
+from src.replay import Replay, SEEK_STEP, MAX_SPEED, MIN_SPEED
+from src.track import Track
+from src.trajectory import TrajectoryRecorder, Trajectory, load_trajectory, get_column_count, ROW_DTYPE
+
+BEAM_COUNT = 5
+TICK_COUNT = 250
+
+
+def get_rows(tick_count=TICK_COUNT):
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(0, 300, (tick_count, get_column_count(BEAM_COUNT))).astype(ROW_DTYPE)
+    rows[:, 6] = rng.integers(0, 2, tick_count)
+    return rows
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_recorder_round_trip(tmp_path, compress):
+    path = str(tmp_path / 'run.traj')
+    rows = get_rows()
+    # 250 pas en blocs de 64 : trois blocs pleins et un dernier partiel
+    with TrajectoryRecorder(path, BEAM_COUNT, chunk_size=64, compress=compress, metadata={'seed': 3}) as recorder:
+        for row in rows:
+            recorder.record(*row[:7], row[7:])
+    trajectory = load_trajectory(path)
+    assert len(trajectory) == TICK_COUNT
+    assert trajectory.beam_count == BEAM_COUNT
+    assert trajectory.metadata == {'seed': 3}
+    np.testing.assert_array_equal(trajectory.data, rows)
+    np.testing.assert_array_equal(trajectory.crashed, rows[:, 6] > 0)
+    np.testing.assert_array_equal(trajectory.radar_distances, rows[:, 7:])
+
+
+def test_empty_recording(tmp_path):
+    path = str(tmp_path / 'empty.traj')
+    TrajectoryRecorder(path, BEAM_COUNT).close()
+    trajectory = load_trajectory(path)
+    assert trajectory.data.shape == (0, get_column_count(BEAM_COUNT))
+    with pytest.raises(ValueError):
+        Replay(Car(track=Track()), trajectory)
+
+
+def test_not_a_trajectory(tmp_path):
+    path = tmp_path / 'other.traj'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        load_trajectory(str(path))
+
+
+def create_replay():
+    rows = get_rows()
+    rows[:, 0:2] = np.column_stack((np.arange(TICK_COUNT), np.full(TICK_COUNT, 100)))
+    rows[:, 2] = 0
+    rows[:, 7:] = 50
+    return Replay(Car(track=Track()), Trajectory(rows, BEAM_COUNT))
+
+
+def test_replay_seek():
+    replay = create_replay()
+    assert replay.tick == 0 and replay.car.center.x == 0
+    replay.forward()
+    assert replay.tick == SEEK_STEP and replay.car.center.x == SEEK_STEP
+    # Ni avant le début, ni après la fin
+    replay.backward()
+    replay.backward()
+    assert replay.tick == 0
+    replay.seek(10 * TICK_COUNT)
+    assert replay.tick == TICK_COUNT - 1 and replay.is_finished
+    replay.restart()
+    assert replay.tick == 0 and not replay.is_finished
+    assert replay.car.radar_distances == [50.0] * BEAM_COUNT
+
+
+def test_replay_speed_and_pause():
+    replay = create_replay()
+    replay.slower()
+    for _ in range(4):
+        replay.update()
+    # À vitesse 1/2, deux pas de la boucle par pas enregistré
+    assert replay.tick == 2
+    for _ in range(3):
+        replay.faster()
+    replay.update()
+    assert replay.tick == 6 and replay.car.center.x == 6
+    replay.toggle_pause()
+    replay.update()
+    assert replay.tick == 6 and replay.car.previous_center == replay.car.center
+    replay.toggle_pause()
+    replay.update()
+    assert replay.tick == 10
+    for _ in range(20):
+        replay.faster()
+        replay.slower()
+        replay.slower()
+    assert replay.speed == MIN_SPEED
+    for _ in range(20):
+        replay.faster()
+    assert replay.speed == MAX_SPEED
+    for _ in range(10):
+        replay.update()
+    assert replay.tick == TICK_COUNT - 1 and replay.is_finished
@@ -0,0 +1,62 @@
+"""
+Environnement vectorisé : les environnements terminés repartent seuls du départ, leur dernière observation
+et la somme de leurs récompenses étant rendues dans infos
+"""
+import numpy as np
+from src.vec_env import VecCarEnv, SubprocVecCarEnv
+
+MAX_STEPS = 60
+
+
+def get_actions(num_envs):
+    # Les environnements pairs foncent dans le mur, les impairs roulent doucement jusqu'à max_steps
+    actions = np.zeros((num_envs, 2))
+    actions[0::2] = (-1.0, 0.0)
+    actions[1::2] = (-0.1, 0.0)
+    return actions
+
+
+def test_auto_reset():
+    env = VecCarEnv(4, max_steps=MAX_STEPS)
+    initial_observations = env.reset()
+    actions = get_actions(env.num_envs)
+    total_rewards = np.zeros(env.num_envs)
+    end_steps = np.zeros(env.num_envs, dtype=np.int64)
+    for step in range(1, MAX_STEPS + 1):
+        observations, rewards, dones, infos = env.step(actions)
+        total_rewards += rewards
+        assert np.isnan(infos['episode_returns'][~dones]).all()
+        for index in np.flatnonzero(dones & (end_steps == 0)):
+            end_steps[index] = step
+            np.testing.assert_allclose(infos['episode_returns'][index], total_rewards[index])
+            # L'observation retournée est celle du départ, la dernière de l'épisode est dans infos
+            np.testing.assert_array_equal(observations[index], initial_observations[index])
+            assert not np.array_equal(infos['terminal_observations'][index], initial_observations[index])
+            assert env.steps[index] == 0 and env.returns[index] == 0
+            assert not env.population.crashed[index]
+    # Les voitures qui foncent s'écrasent avant max_steps, les autres sont arrêtées à max_steps
+    assert (end_steps[0::2] > 0).all() and (end_steps[0::2] < MAX_STEPS).all()
+    assert (end_steps[1::2] == MAX_STEPS).all()
+
+
+def test_results_are_copies():
+    env = VecCarEnv(2, max_steps=MAX_STEPS)
+    observations = env.reset()
+    step_results = env.step(get_actions(2))
+    saved = [observations.copy(), *(array.copy() for array in step_results[:3])]
+    env.step(get_actions(2))
+    for array, expected in zip([observations, *step_results[:3]], saved):
+        np.testing.assert_array_equal(array, expected)
+
+
+def test_subprocess_env_matches_single_process():
+    actions = get_actions(4)
+    env = VecCarEnv(4, max_steps=MAX_STEPS)
+    with SubprocVecCarEnv(4, workers=2, max_steps=MAX_STEPS) as subprocess_env:
+        np.testing.assert_allclose(subprocess_env.reset(), env.reset())
+        for _ in range(MAX_STEPS):
+            results = subprocess_env.step(actions)
+            expected = env.step(actions)
+            for array, expected_array in zip(results[:3], expected[:3]):
+                np.testing.assert_allclose(array, expected_array)
+            np.testing.assert_allclose(results[3]['episode_returns'], expected[3]['episode_returns'])